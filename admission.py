@@ -0,0 +1,241 @@
+"""
+Admission control: decide quickly whether a request may run, instead of
+letting bursts pile up blocked threads.
+
+  - ClientRateLimiter: one token bucket per client (refilled at `rate`
+    tokens/s up to `burst`); an empty bucket means HTTP 429
+  - ConcurrencyLimit: at most `limit` holders at once (e.g. upstream
+    fetches); whoever cannot get in within `timeout` gets HTTP 503
+  - PriorityGate: at most `capacity` requests in flight, the others wait in
+    a bounded priority queue for at most `max_wait`. A full queue sheds its
+    lowest-priority waiter for a more important newcomer, or rejects the
+    newcomer (HTTP 503)
+
+Every refusal is raised as Rejected, which carries the status, a
+client-facing message and the Retry-After seconds, and is counted in
+playerzone_admission_rejections_total{reason}.
+"""
+import asyncio
+from collections import OrderedDict
+import heapq
+import itertools
+import math
+import threading
+import time
+
+import metrics
+
+REJECTIONS = metrics.REGISTRY.counter(
+    'playerzone_admission_rejections_total',
+    'Requests refused by admission control, by reason.',
+    ('reason',)
+)
+
+
+class Rejected(Exception):
+    """A request refused by admission control; answer with `status` and Retry-After."""
+
+    def __init__(self, status, reason, retry_after, message):
+        super().__init__(message)
+        self.status = status
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+        REJECTIONS.inc(reason)
+
+
+def client_key(environ, header=None):
+    """
+    The client a request is accounted to: the first address in `header`
+    (e.g. 'X-Forwarded-For' behind a trusted proxy) if set, else the peer
+    address.
+    """
+    if header:
+        forwarded = environ.get('HTTP_' + header.upper().replace('-', '_'))
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return environ.get('REMOTE_ADDR') or 'unknown'
+
+
+# ----------------------------------------------------------------------------
+# Per-client token buckets
+# ----------------------------------------------------------------------------
+class ClientRateLimiter:
+    """
+    Token buckets keyed by client, at most `max_clients` of them (the least
+    recently seen client's bucket is dropped first). rate <= 0 disables it.
+    """
+
+    def __init__(self, rate, burst, max_clients=10000, reason='client_rate'):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_clients = max_clients
+        self.reason = reason
+        self._buckets = OrderedDict()  # client => [tokens, updated_at]
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def take(self, client, cost=1.0):
+        """Spend `cost` tokens of `client`'s bucket or raise Rejected (429)."""
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = [self.burst, now]
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return
+            wait = (cost - bucket[0]) / self.rate
+        raise Rejected(429, self.reason, wait, f'Too many requests. Retry in {math.ceil(wait)} s.')
+
+
+# ----------------------------------------------------------------------------
+# Bounded concurrency
+# ----------------------------------------------------------------------------
+class ConcurrencyLimit:
+    """
+    At most `limit` concurrent holders; limit <= 0 disables it. Use it as a
+    context manager, or acquire() / release() for holders that outlive a
+    block (e.g. streamed responses). Coroutines share the same slots through
+    acquire_async() / `async with`.
+    """
+
+    def __init__(self, limit, timeout, reason='upstream_busy', message='Upstream is busy. Please retry shortly.'):
+        self.limit = limit
+        self.timeout = timeout
+        self.reason = reason
+        self.message = message
+        self._semaphore = threading.BoundedSemaphore(limit) if limit > 0 else None
+        self._lock = threading.Lock()
+        self.active = 0
+
+    def acquire(self):
+        """Take a slot within `timeout` seconds or raise Rejected (503)."""
+        if self._semaphore is None:
+            return
+        if not self._semaphore.acquire(timeout=self.timeout):
+            raise Rejected(503, self.reason, self.timeout, self.message)
+        with self._lock:
+            self.active += 1
+
+    async def acquire_async(self):
+        """acquire() for coroutines; waits by polling, so no thread is held."""
+        if self._semaphore is None:
+            return
+        deadline = time.monotonic() + self.timeout
+        delay = 0.005
+        while not self._semaphore.acquire(blocking=False):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise Rejected(503, self.reason, self.timeout, self.message)
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.05)
+        with self._lock:
+            self.active += 1
+
+    def release(self):
+        if self._semaphore is not None:
+            with self._lock:
+                self.active -= 1
+            self._semaphore.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    async def __aenter__(self):
+        await self.acquire_async()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+
+# ----------------------------------------------------------------------------
+# Priority gate
+# ----------------------------------------------------------------------------
+class _Waiter:
+    __slots__ = ('event', 'state')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.state = 'waiting'  # => 'admitted' or 'shed'
+
+
+class PriorityGate:
+    """
+    At most `capacity` requests inside; capacity <= 0 disables it.
+    Lower priority numbers are served first, in arrival order within a
+    priority.
+    """
+
+    def __init__(self, capacity, max_queue, max_wait):
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self._queue = []  # heap of (priority, sequence, _Waiter)
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.capacity > 0
+
+    @property
+    def queued(self):
+        return len(self._queue)
+
+    def enter(self, priority):
+        """Wait for a slot or raise Rejected (503); call leave() once done."""
+        with self._lock:
+            if self.active < self.capacity and not self._queue:
+                self.active += 1
+                return
+            if len(self._queue) >= self.max_queue:
+                worst = max(self._queue) if self._queue else None
+                if worst is None or worst[0] <= priority:
+                    raise Rejected(503, 'queue_full', self.max_wait, 'Server is busy. Please retry shortly.')
+                # Make room by shedding the least important, most recent waiter
+                self._queue.remove(worst)
+                heapq.heapify(self._queue)
+                worst[2].state = 'shed'
+                worst[2].event.set()
+            entry = (priority, next(self._sequence), _Waiter())
+            heapq.heappush(self._queue, entry)
+
+        waiter = entry[2]
+        waiter.event.wait(self.max_wait)
+        with self._lock:
+            if waiter.state == 'admitted':
+                return
+            if waiter.state == 'waiting':
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                reason = 'queue_timeout'
+            else:
+                reason = 'shed'
+        raise Rejected(503, reason, self.max_wait, 'Server is busy. Please retry shortly.')
+
+    def leave(self):
+        """Free a slot, handing it straight to the best waiter if there is one."""
+        with self._lock:
+            if self._queue:
+                _, _, waiter = heapq.heappop(self._queue)
+                waiter.state = 'admitted'
+                waiter.event.set()
+            else:
+                self.active -= 1
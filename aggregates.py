@@ -0,0 +1,286 @@
+"""
+Club, city and trend aggregates, materialized once per snapshot.
+
+AggregateTables holds, for one snapshot:
+  - clubs / cities   lowercased name => (summary, members)
+  - trends           division => players with a 90-day trend, best first
+
+Building the tables for a new snapshot starts from the previous snapshot's
+tables: players are compared by their aggregated fields, and only the clubs
+and cities that gained, lost or changed a player are summarized again. An
+unchanged scrape costs one pass of dict comparisons; a scrape that changed a
+handful of players re-summarizes a handful of groups. Requests then only
+look up and slice the materialized tables (sorted orders are memoized on
+the snapshot as well).
+"""
+from bisect import insort
+from collections import Counter
+
+from roster_query import DEFAULT_LIMIT, MAX_LIMIT, QueryError, _int_arg
+
+# Fields of a player kept in the tables (and shown in member lists)
+AGGREGATE_FIELDS = (
+    'name', 'player_id', 'division', 'rank', 'club', 'city', 'games', 'elo_rating',
+    'trend_90_days', 'pro_status'
+)
+DIVISIONS = ('open', 'women')
+GROUP_FIELDS = ('club', 'city')
+# Response key of the /clubs and /cities lists
+GROUP_LISTS = {'club': 'clubs', 'city': 'cities'}
+GROUP_SORTS = ('players', 'average_elo', 'pro_players', 'name')
+TOP_PLAYERS = 5
+# More changed trends than this are merged by sorting instead of insort
+INSERT_LIMIT = 64
+TRENDS_DEFAULT_LIMIT = 10
+TRENDS_MAX_LIMIT = 100
+
+
+def _entry(player):
+    return {f: player.get(f) for f in AGGREGATE_FIELDS}
+
+
+def _entry_key(entry):
+    return entry['division'].lower(), entry['player_id']
+
+
+def _group_key(value):
+    return (value or '').strip().lower()
+
+
+def _mean(values):
+    return round(sum(values) / len(values), 1) if values else None
+
+
+def _elo_order(entry):
+    # Highest rating first, players without one last, then by rank
+    elo, rank = entry['elo_rating'], entry['rank']
+    return (elo is None, -(elo or 0), rank is None, rank or 0, entry['player_id'])
+
+
+def _trend_order(entry):
+    return -entry['trend_90_days'], entry['player_id']
+
+
+def summarize_group(field, members):
+    """Summary of one club/city from the entries of its members."""
+    spellings = Counter(m[field].strip() for m in members)
+    # Most common spelling wins; ties go to the alphabetically first
+    display = min(spellings, key=lambda s: (-spellings[s], s))
+    elos = [m['elo_rating'] for m in members if m['elo_rating'] is not None]
+    trends = [m['trend_90_days'] for m in members if m['trend_90_days'] is not None]
+
+    divisions = {}
+    for division in DIVISIONS:
+        in_division = [m for m in members if m['division'].lower() == division]
+        if not in_division:
+            continue
+        ranks = [m['rank'] for m in in_division if m['rank'] is not None]
+        divisions[division] = {
+            'players': len(in_division),
+            'pro_players': sum(1 for m in in_division if m['pro_status']),
+            'average_elo': _mean([m['elo_rating'] for m in in_division if m['elo_rating'] is not None]),
+            'best_rank': min(ranks) if ranks else None,
+        }
+
+    return {
+        field: display,
+        # Distinct players; someone ranked in both divisions counts once
+        'players': len({m['player_id'] for m in members}),
+        'pro_players': len({m['player_id'] for m in members if m['pro_status']}),
+        'average_elo': _mean(elos),
+        'average_trend_90_days': _mean(trends),
+        'divisions': divisions,
+        'top_players': members[:TOP_PLAYERS],
+    }
+
+
+class AggregateTables:
+    """Materialized aggregates of one snapshot; never mutated once built."""
+
+    def __init__(self, entries, members, groups, trends):
+        self.entries = entries      # (division, player_id) => entry
+        self.members = members      # field => group key => set of entry keys
+        self.groups = groups        # field => group key => (summary, members)
+        self.trends = trends        # division => [(order, entry key)], best first
+
+    @classmethod
+    def build(cls, players, previous=None):
+        """
+        Tables for `players`. With `previous` (the tables of an older
+        snapshot), only the groups touched by changed players are rebuilt.
+        """
+        entries = {}
+        for player in players:
+            entry = _entry(player)
+            entries[_entry_key(entry)] = entry
+
+        if previous is None:
+            old_entries = {}
+            members = {field: {} for field in GROUP_FIELDS}
+            groups = {field: {} for field in GROUP_FIELDS}
+            trends = {division: [] for division in DIVISIONS}
+        else:
+            old_entries = previous.entries
+            # Shallow copies: only touched groups / divisions get new objects
+            members = {field: dict(previous.members[field]) for field in GROUP_FIELDS}
+            groups = {field: dict(previous.groups[field]) for field in GROUP_FIELDS}
+            trends = dict(previous.trends)
+
+        changed = [key for key, entry in entries.items() if old_entries.get(key) != entry]
+        changed.extend(key for key in old_entries if key not in entries)
+        if not changed:
+            return previous if previous is not None else cls(entries, members, groups, trends)
+
+        for field in GROUP_FIELDS:
+            touched = set()
+            for key in changed:
+                old, new = old_entries.get(key), entries.get(key)
+                old_group = _group_key(old[field]) if old else ''
+                new_group = _group_key(new[field]) if new else ''
+                for group, add in ((old_group, False), (new_group, True)):
+                    if not group:
+                        continue
+                    if group not in touched:
+                        members[field][group] = set(members[field].get(group, ()))
+                        touched.add(group)
+                    if add:
+                        members[field][group].add(key)
+                    else:
+                        members[field][group].discard(key)
+            for group in touched:
+                if members[field][group]:
+                    group_entries = sorted((entries[key] for key in members[field][group]), key=_elo_order)
+                    groups[field][group] = (summarize_group(field, group_entries), group_entries)
+                else:
+                    del members[field][group]
+                    groups[field].pop(group, None)
+
+        for division in DIVISIONS:
+            moved = [key for key in changed if key[0] == division]
+            if not moved:
+                continue
+            order = list(trends[division])
+            stale = {key for key in moved if key in old_entries and old_entries[key]['trend_90_days'] is not None}
+            if stale:
+                order = [item for item in order if item[1] not in stale]
+            added = [(_trend_order(entries[key]), key) for key in moved
+                     if key in entries and entries[key]['trend_90_days'] is not None]
+            if len(added) > INSERT_LIMIT:
+                # Full rebuild (first snapshot, or most players changed)
+                order.extend(added)
+                order.sort()
+            else:
+                for item in added:
+                    insort(order, item)
+            trends[division] = order
+
+        return cls(entries, members, groups, trends)
+
+
+# ----------------------------------------------------------------------------
+# Per-snapshot access
+# ----------------------------------------------------------------------------
+def aggregate_tables(snapshot, previous_snapshot=None):
+    """
+    The snapshot's AggregateTables, built on first use. Pass the snapshot it
+    replaced to build incrementally from that one's tables (if it has them).
+    """
+    def build():
+        previous = previous_snapshot.memoized('aggregates') if previous_snapshot is not None else None
+        return AggregateTables.build(snapshot.players, previous)
+
+    return snapshot.memo('aggregates', build)
+
+
+def _group_order(snapshot, field, division, sort, descending):
+    """Group keys of `field` with members in `division` (None = any), sorted."""
+    def build():
+        groups = aggregate_tables(snapshot).groups[field]
+        keys = [key for key, (summary, _) in groups.items()
+                if division is None or division in summary['divisions']]
+        stats = (lambda s: s) if division is None else (lambda s: s['divisions'][division])  # noqa: E731
+        if sort == 'name':
+            keys.sort(key=lambda k: groups[k][0][field].lower(), reverse=descending)
+        else:
+            # Groups without a value last, ties by name
+            def order(key):
+                value = stats(groups[key][0])[sort]
+                if value is None:
+                    return (1, 0, key)
+                return (0, -value if descending else value, key)
+            keys.sort(key=order)
+        return keys
+
+    return snapshot.memo(('group_order', field, division, sort, descending), build)
+
+
+def _division_arg(args):
+    division = (args.get('division') or '').lower() or None
+    if division not in (None,) + DIVISIONS:
+        raise QueryError("'division' must be 'open' or 'women'.")
+    return division
+
+
+def _limit_args(args, default, maximum):
+    limit = _int_arg(args, 'limit')
+    limit = default if limit is None else max(1, min(limit, maximum))
+    offset = max(_int_arg(args, 'offset') or 0, 0)
+    return limit, offset
+
+
+def query_groups(snapshot, field, args):
+    """
+    /clubs or /cities: summaries sorted by `sort` (players, average_elo,
+    pro_players, name; prefix '-' for descending, default '-players'),
+    optionally only groups with players in `division`, which then also
+    sorts by that division's figures.
+    """
+    division = _division_arg(args)
+    sort = args.get('sort') or '-players'
+    descending = sort.startswith('-')
+    sort_field = sort.lstrip('-')
+    if sort_field not in GROUP_SORTS:
+        raise QueryError(f"'sort' must be one of {', '.join(GROUP_SORTS)} (prefix '-' for descending).")
+    limit, offset = _limit_args(args, DEFAULT_LIMIT, MAX_LIMIT)
+
+    keys = _group_order(snapshot, field, division, sort_field, descending)
+    groups = aggregate_tables(snapshot).groups[field]
+    return {
+        'total': len(keys),
+        'offset': offset,
+        'limit': limit,
+        'generation': snapshot.generation,
+        GROUP_LISTS[field]: [groups[key][0] for key in keys[offset:offset + limit]],
+    }
+
+
+def group_detail(snapshot, field, name):
+    """Summary plus all members (highest rating first) of one club/city, or None."""
+    found = aggregate_tables(snapshot).groups[field].get(_group_key(name))
+    if found is None:
+        return None
+    summary, members = found
+    return dict(summary, members=members, generation=snapshot.generation)
+
+
+def query_trends(snapshot, args):
+    """
+    /trends: the biggest 90-day risers and fallers per division.
+    { "generation", "divisions": {"open": {"risers", "fallers"}, "women": ...} }
+    """
+    division = _division_arg(args)
+    limit, _ = _limit_args(args, TRENDS_DEFAULT_LIMIT, TRENDS_MAX_LIMIT)
+    tables = aggregate_tables(snapshot)
+
+    result = {}
+    for name in (division,) if division else DIVISIONS:
+        order = tables.trends[name]
+        risers = [tables.entries[key] for _, key in order[:limit]]
+        fallers = [tables.entries[key] for _, key in reversed(order[-limit:])]
+        result[name] = {
+            'players_with_trend': len(order),
+            # Only players who actually moved in that direction
+            'risers': [e for e in risers if e['trend_90_days'] > 0],
+            'fallers': [e for e in fallers if e['trend_90_days'] < 0],
+        }
+    return {'generation': snapshot.generation, 'divisions': result}
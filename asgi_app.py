@@ -0,0 +1,277 @@
+"""
+ASGI serving mode:
+
+    uvicorn asgi_app:app --workers 4
+
+Serves exactly the routes and responses of flask_app. Every request still
+runs through the Flask app (so status codes, headers and JSON are the same),
+but on a bounded thread pool, and only for the time the handler computes:
+
+  - GET /history/<player> goes through admission control (per-client
+    request rate, request gate) first, resolves the player, then fetches a
+    history page that has to come from playerzone with the non-blocking
+    client (async_http_client) while no thread is held. The fetch obeys the
+    per-client upstream rate and the global cap on upstream fetches
+    (PLAYERZONE_UPSTREAM_CONCURRENCY, PLAYERZONE_UPSTREAM_QUEUE_TIMEOUT)
+    like the sync app's. Concurrent requests for the same player share one
+    fetch, and successful fetches land in the same history cache the sync
+    app uses. The Flask handler then gets the fetched result (or the
+    refusal) handed in and only renders it.
+  - Streamed responses (/match/batch) are passed on chunk by chunk.
+  - GET /events runs the Flask handler for its checks and opening frames
+    only; the stream itself then waits for changes on the event loop, so
+    idle subscribers hold no thread either.
+
+A slow playerzone therefore only costs open sockets and coroutines, not
+worker threads: thousands of /history requests can wait concurrently while
+the other routes keep being served. PLAYERZONE_ASGI_THREADS (default 32)
+sizes the thread pool.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import io
+import itertools
+import os
+import sys
+
+import admission
+from async_http_client import close_async_client
+import flask_app
+from history import HistoryError
+
+HISTORY_PREFIX = '/history/'
+HISTORY_ENDPOINT = 'get_elo_history'
+EVENTS_PATH = '/events'
+
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('PLAYERZONE_ASGI_THREADS', '32')),
+    thread_name_prefix='asgi-wsgi'
+)
+
+
+def build_environ(scope, body):
+    """WSGI environ (PEP 3333) for an ASGI http scope and its request body."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for raw_name, raw_value in scope.get('headers', []):
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name == 'CONTENT_LENGTH':
+            environ['CONTENT_LENGTH'] = value
+        else:
+            key = f'HTTP_{name}'
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def _prefetch_history(player_query, environ):
+    """Fetch the history GET /history/<player_query> needs from upstream, if any."""
+    loop = asyncio.get_running_loop()
+    # Resolving the player (fuzzy matching) is CPU work: keep it off the loop
+    key = await loop.run_in_executor(_executor, flask_app.history_fetch_key, player_query)
+    if key is None:
+        return None
+    try:
+        if not flask_app.history_cache.cached(key):
+            flask_app.upstream_rate_limiter.take(admission.client_key(environ, flask_app.CLIENT_IP_HEADER))
+        history = await flask_app.history_cache.get_or_load_async(
+            key, lambda: flask_app.fetch_history_admitted_async(*key)
+        )
+    except (HistoryError, admission.Rejected) as e:
+        return key, None, e
+    return key, history, None
+
+
+def _start_wsgi(environ):
+    """
+    Run the Flask app up to its first body chunk.
+    Returns (status, headers, iterable, iterator, first_chunk or None).
+    """
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = status
+        started['headers'] = headers
+
+    iterable = flask_app.app(environ, start_response)
+    iterator = iter(iterable)
+    first = next(iterator, None)
+    return started['status'], started['headers'], iterable, iterator, first
+
+
+def _next_chunk(iterator):
+    return next(iterator, None)
+
+
+def _run_wsgi(environ):
+    """Run the Flask app to completion; returns (status, headers, body)."""
+    status, headers, iterable, iterator, first = _start_wsgi(environ)
+    try:
+        body = b''.join(itertools.chain([first] if first is not None else [], iterator))
+    finally:
+        if hasattr(iterable, 'close'):
+            iterable.close()
+    return status, headers, body
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+def _close_subscription(holder):
+    subscription = holder.pop('subscription', None)
+    if subscription is not None:
+        flask_app.close_event_subscription(subscription)
+
+
+async def _serve_events(environ, receive, send):
+    holder = environ[flask_app.EVENTS_ASYNC_ENVIRON] = {}
+    loop = asyncio.get_running_loop()
+    handled = loop.run_in_executor(_executor, contextvars.copy_context().run, _run_wsgi, environ)
+    disconnected = None
+    try:
+        # Shielded: if we are cancelled, `handled` still tells when the handler is done
+        status, headers, body = await asyncio.shield(handled)
+        await send({
+            'type': 'http.response.start',
+            'status': int(status.split(' ', 1)[0]),
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+        })
+        subscription = holder.get('subscription')
+        if subscription is None:
+            # Refused (400/429/503): a plain response
+            await send({'type': 'http.response.body', 'body': body, 'more_body': False})
+            return
+
+        feed = flask_app.change_feed
+        disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+        await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+        while True:
+            waiting = asyncio.ensure_future(feed.wait_async(subscription.sequence, flask_app.EVENTS_HEARTBEAT))
+            await asyncio.wait({waiting, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                waiting.cancel()
+                return
+            frames = subscription.pending() or ': keepalive\n\n'
+            await send({'type': 'http.response.body', 'body': frames.encode('utf-8'), 'more_body': True})
+    except OSError:
+        # Client gone mid-send
+        pass
+    finally:
+        if disconnected is not None:
+            disconnected.cancel()
+        if handled.done():
+            _close_subscription(holder)
+        else:
+            # Cancelled while the handler runs: close what it subscribes
+            handled.add_done_callback(lambda _: _close_subscription(holder))
+
+
+async def _serve_http(scope, receive, send):
+    body = await _read_body(receive)
+    if body is None:
+        return
+    environ = build_environ(scope, body)
+
+    path = scope['path']
+    if scope['method'] == 'GET' and path == EVENTS_PATH:
+        await _serve_events(environ, receive, send)
+        return
+
+    loop = asyncio.get_running_loop()
+    gated = False
+    if scope['method'] == 'GET' and path.startswith(HISTORY_PREFIX) and '/' not in path[len(HISTORY_PREFIX):]:
+        # Admit before anything goes upstream; the Flask app then skips its own
+        # check and renders a refusal. A queued request waits on a pool thread.
+        try:
+            gated = await loop.run_in_executor(_executor, flask_app.admit, environ, HISTORY_ENDPOINT)
+            environ[flask_app.ADMITTED_ENVIRON] = True
+        except admission.Rejected as e:
+            environ[flask_app.ADMITTED_ENVIRON] = e
+    try:
+        if environ.get(flask_app.ADMITTED_ENVIRON) is True:
+            prefetched = await _prefetch_history(path[len(HISTORY_PREFIX):], environ)
+            if prefetched is not None:
+                environ[flask_app.HISTORY_PREFETCH_ENVIRON] = prefetched
+        await _respond(environ, send)
+    finally:
+        if gated:
+            flask_app.request_gate.leave()
+
+
+async def _respond(environ, send):
+    """Run the Flask app on the pool and pass its response on."""
+    loop = asyncio.get_running_loop()
+    # One context for all steps of the response: Flask keeps the request
+    # context of streamed responses in context variables, and the steps may
+    # run on different pool threads
+    context = contextvars.copy_context()
+    status, headers, iterable, iterator, chunk = await loop.run_in_executor(
+        _executor, context.run, _start_wsgi, environ
+    )
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': int(status.split(' ', 1)[0]),
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+        })
+        if chunk is None:
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        while chunk is not None:
+            following = await loop.run_in_executor(_executor, context.run, _next_chunk, iterator)
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': following is not None})
+            chunk = following
+    finally:
+        if hasattr(iterable, 'close'):
+            await loop.run_in_executor(_executor, context.run, iterable.close)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_async_client()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'http':
+        await _serve_http(scope, receive, send)
+    elif scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
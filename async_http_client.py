@@ -0,0 +1,142 @@
+"""
+Non-blocking counterpart of http_client.HttpClient for the ASGI app.
+
+Same behaviour on top of httpx.AsyncClient: the retry, backoff and circuit
+breaker policy is http_client.BaseHttpClient's, and so are the `metrics`
+counters. Failures are raised as the requests exceptions HttpClient raises,
+so callers handle both clients alike.
+"""
+import asyncio
+import os
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+from http_client import DEFAULT_HEADERS, BaseHttpClient, track_client_metrics
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - only the ASGI app needs httpx
+    httpx = None
+
+
+def _as_request_error(error):
+    """The requests exception HttpClient would raise for httpx `error`."""
+    if isinstance(error, httpx.TimeoutException):
+        return requests.Timeout(str(error) or type(error).__name__)
+    if isinstance(error, httpx.TransportError):
+        return requests.ConnectionError(str(error) or type(error).__name__)
+    if isinstance(error, httpx.TooManyRedirects):
+        return requests.TooManyRedirects(str(error) or type(error).__name__)
+    if isinstance(error, httpx.DecodingError):
+        return requests.exceptions.ContentDecodingError(str(error) or type(error).__name__)
+    return requests.RequestException(str(error) or type(error).__name__)
+
+
+class AsyncHttpClient(BaseHttpClient):
+    """
+    One httpx.AsyncClient (keep-alive pool) per event loop. Waiting for a
+    response holds no thread, so thousands of requests can be in flight;
+    at most `per_host_limit` of them talk to one host at a time.
+    """
+
+    def __init__(self, timeout=(3.05, 10.0), retries=2, backoff=0.5, max_backoff=8.0,
+                 per_host_limit=8, failure_threshold=5, reset_timeout=30.0, pool_size=16,
+                 headers=None, transport=None):
+        if httpx is None:
+            raise RuntimeError("The async HTTP client requires httpx (pip install httpx).")
+        super().__init__(timeout, retries, backoff, max_backoff, per_host_limit, failure_threshold, reset_timeout)
+        connect, read = timeout
+        self.client = httpx.AsyncClient(
+            headers=headers or DEFAULT_HEADERS,
+            timeout=httpx.Timeout(read, connect=connect),
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=pool_size),
+            transport=transport,
+        )
+
+    def _new_semaphore(self):
+        return asyncio.Semaphore(self.per_host_limit)
+
+    async def get(self, url, **kwargs):
+        """GET `url`; raises requests.RequestException once retries are exhausted."""
+        return await self.request('GET', url, **kwargs)
+
+    async def request(self, method, url, **kwargs):
+        host = urlsplit(url).netloc
+        semaphore, breaker = self._host_state(host)
+
+        attempt = 0
+        while True:
+            try:
+                await asyncio.wait_for(semaphore.acquire(), self._slot_timeout(self.timeout))
+            except asyncio.TimeoutError:
+                raise self._busy(host)
+            allowed = self._allow(host, breaker, semaphore.release)
+
+            response, error = None, None
+            settled = False
+            started = time.monotonic()
+            try:
+                try:
+                    response = await self.client.request(method, url, **kwargs)
+                except httpx.TimeoutException as e:
+                    self._count('timeouts')
+                    error = _as_request_error(e)
+                except httpx.TransportError as e:
+                    error = _as_request_error(e)
+                except httpx.HTTPError as e:
+                    # Not worth retrying (redirect loops, undecodable bodies, ...),
+                    # but still a failed call to this host
+                    self._failed(breaker)
+                    settled = True
+                    raise _as_request_error(e) from e
+                finally:
+                    semaphore.release()
+                    self._record_attempt(started, response)
+                delay = self._next_delay(breaker, attempt, response, error)
+                settled = True
+            finally:
+                # Also reached when the task is cancelled mid-request
+                if not settled and allowed == 'trial':
+                    breaker.abandon_trial()
+
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def close(self):
+        await self.client.aclose()
+
+
+# Everything a request through AsyncHttpClient may raise for upstream trouble
+UPSTREAM_ERRORS = (requests.RequestException, httpx.HTTPError) if httpx is not None else (requests.RequestException,)
+
+_clients = {}
+track_client_metrics('async', lambda: list(_clients.values()))
+
+
+def get_async_client():
+    """The AsyncHttpClient of the running event loop, configured like http_client.get_client()."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = AsyncHttpClient(
+            timeout=(
+                float(os.environ.get('PLAYERZONE_HTTP_CONNECT_TIMEOUT', '3.05')),
+                float(os.environ.get('PLAYERZONE_HTTP_READ_TIMEOUT', '10'))
+            ),
+            retries=int(os.environ.get('PLAYERZONE_HTTP_RETRIES', '2')),
+            per_host_limit=int(os.environ.get('PLAYERZONE_HTTP_PER_HOST_LIMIT', '8')),
+        )
+    return client
+
+
+async def close_async_client():
+    """Close the running loop's client (ASGI lifespan shutdown)."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
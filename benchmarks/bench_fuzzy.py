@@ -0,0 +1,76 @@
+"""
+Compare NameSearchIndex against fuzzywuzzy's process.extractOne.
+
+    python benchmarks/bench_fuzzy.py --names 50000 --queries 200
+
+The extractOne baseline is pure Python and takes seconds per query on a large
+roster, so it only runs on the first --baseline-queries queries.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from search_index import HAVE_RAPIDFUZZ, NameSearchIndex  # noqa: E402
+from synthetic import synthetic_names, with_typo  # noqa: E402
+
+
+def make_queries(names, count, seed):
+    rng = random.Random(seed)
+    queries = []
+    for i in range(count):
+        name = rng.choice(names)
+        kind = i % 3
+        if kind == 0:
+            queries.append(name.lower())
+        elif kind == 1:
+            queries.append(with_typo(name, rng))
+        else:
+            queries.append(name.split(' ')[-1])
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--names', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--baseline-queries', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    names = synthetic_names(args.names, seed=args.seed)
+    queries = make_queries(names, args.queries, args.seed)
+
+    start = time.perf_counter()
+    index = NameSearchIndex(names)
+    build_s = time.perf_counter() - start
+    print(f"roster: {len(names)} names, rapidfuzz: {HAVE_RAPIDFUZZ}")
+    print(f"index build: {build_s * 1000:.1f} ms")
+
+    start = time.perf_counter()
+    results = [index.extract_one(q) for q in queries]
+    index_s = time.perf_counter() - start
+    print(f"NameSearchIndex.extract_one: {index_s / len(queries) * 1000:.3f} ms/query ({len(queries)} queries)")
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        from fuzzywuzzy import process
+
+    baseline_queries = queries[:args.baseline_queries]
+    start = time.perf_counter()
+    baseline = [process.extractOne(q, names) for q in baseline_queries]
+    baseline_s = time.perf_counter() - start
+    per_query = baseline_s / max(len(baseline_queries), 1)
+    print(f"fuzzywuzzy extractOne: {per_query * 1000:.3f} ms/query ({len(baseline_queries)} queries)")
+    print(f"speedup: {per_query / (index_s / len(queries)):.0f}x")
+
+    agree = sum(1 for a, b in zip(baseline, results) if a == b)
+    print(f"identical to extractOne (name and score): {agree}/{len(baseline)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Time matchmaking.suggest_games() across pool sizes and compare the summed
+squared rating difference with sorted blocks of four (the starting point),
+random games and, for pools of up to twelve players, the exact optimum.
+
+    python benchmarks/bench_matchmaking.py --players 8,12,16,32,64,128,256 --time-limit 0.2
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matchmaking  # noqa: E402
+
+
+def _cost(ratings, groups):
+    return sum(matchmaking._group_cost(ratings, group) for group in groups)
+
+
+def _blocks(order):
+    return [order[i:i + 4] for i in range(0, len(order) - len(order) % 4, 4)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', default='8,12,16,32,64,128,256', help="Comma-separated pool sizes")
+    parser.add_argument('--time-limit', type=float, default=0.2, help="Search time per pool in seconds")
+    parser.add_argument('--pools', type=int, default=5, help="Random pools per size")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'players':>7} {'time ms':>8} {'max ms':>7} {'cost':>9} {'sorted':>9} {'random':>9} "
+          f"{'optimum':>9} {'converged':>9}")
+    for n in (int(p) for p in args.players.split(',')):
+        times, costs, sorted_costs, random_costs, optimum_costs, converged = [], [], [], [], [], 0
+        for _ in range(args.pools):
+            ratings = [rng.randint(800, 2200) for _ in range(n)]
+            start = time.perf_counter()
+            result = matchmaking.suggest_games(ratings, time_limit=args.time_limit)
+            times.append((time.perf_counter() - start) * 1000)
+            costs.append(sum(diff * diff for _, _, diff in result['games']))
+            converged += result['converged']
+
+            sorted_costs.append(_cost(ratings, _blocks(sorted(range(n), key=lambda i: -ratings[i]))))
+            shuffled = list(range(n))
+            rng.shuffle(shuffled)
+            random_costs.append(_cost(ratings, _blocks(shuffled)))
+            if matchmaking._partition_count(n) <= matchmaking.EXACT_LIMIT:
+                optimum_costs.append(_cost(ratings, matchmaking._exact(ratings)))
+
+        def mean(values):
+            return f"{sum(values) / len(values):9.0f}" if values else f"{'-':>9}"
+
+        print(f"{n:>7} {sum(times) / len(times):8.1f} {max(times):7.1f} {mean(costs)} {mean(sorted_costs)} "
+              f"{mean(random_costs)} {mean(optimum_costs)} {converged:>5}/{args.pools}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Check that every ranking parser backend produces the golden output, then
+time them on a synthetic ranking page.
+
+    python benchmarks/bench_parser.py --players 5000
+
+The golden file (fixtures/ranking_sample.json) is the output of the original
+BeautifulSoup parser on fixtures/ranking_sample.html. A backend that differs
+from it, or from the bs4 backend on the synthetic page, fails the run.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import ranking_parser  # noqa: E402
+from synthetic import ranking_page_html, synthetic_players  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures')
+
+
+def available_backends():
+    return [name for name in ranking_parser.BACKENDS
+            if name != 'lxml' or ranking_parser.lxml is not None]
+
+
+def check_golden(backends):
+    with open(os.path.join(FIXTURES, 'ranking_sample.html'), 'r', encoding='utf-8') as f:
+        html = f.read()
+    with open(os.path.join(FIXTURES, 'ranking_sample.json'), 'r', encoding='utf-8') as f:
+        expected = json.load(f)
+
+    ok = True
+    for name in backends:
+        outputs = [ranking_parser.parse_players(html, 'Open', name)]
+        if name == 'stream':
+            # Text split across chunk boundaries must not change the result
+            outputs += [ranking_parser.parse_players_stream(html, 'Open', chunk_size=size) for size in (1, 13)]
+        same = all(output == expected for output in outputs)
+        ok = ok and same
+        print(f"golden {name:<6} {'ok' if same else 'MISMATCH'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    backends = available_backends()
+    if not check_golden(backends):
+        sys.exit(1)
+
+    players = synthetic_players(args.players, 'Open', seed=args.seed)
+    html = ranking_page_html(players)
+    print(f"synthetic page: {args.players} players, {len(html) / 1e6:.1f} MB, default backend: "
+          f"{ranking_parser.default_backend()}")
+
+    reference = None
+    baseline_s = None
+    for name in ['bs4'] + [b for b in backends if b != 'bs4']:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = ranking_parser.parse_players(html, 'Open', name)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        if reference is None:
+            reference, baseline_s = result, best
+        elif result != reference:
+            print(f"{name}: output differs from bs4")
+            sys.exit(1)
+        print(f"{name:<6} {best * 1000:8.1f} ms  {len(result) / best:9.0f} rows/s  {baseline_s / best:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
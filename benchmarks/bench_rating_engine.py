@@ -0,0 +1,60 @@
+"""
+Replay a synthetic season with RatingEngine: bulk replay() against applying
+the same games one by one, checked to end at the same ratings.
+
+    python benchmarks/bench_rating_engine.py --players 2000 --games 10000,100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from rating_engine import RatingEngine  # noqa: E402
+import rgx  # noqa: E402
+
+
+def season(rng, player_count, game_count):
+    games = []
+    for _ in range(game_count):
+        a, b, c, d = rng.sample(range(player_count), 4)
+        b_val, p_val = rng.choice(rgx.COMBOS_B_P)
+        games.append(([f'p{a}', f'p{b}'], [f'p{c}', f'p{d}'], b_val, p_val))
+    return games
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, default=2000)
+    parser.add_argument('--games', default='10000,100000', help="Comma-separated season lengths")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for game_count in (int(g) for g in args.games.split(',')):
+        games = season(rng, args.players, game_count)
+
+        bulk = RatingEngine()
+        start = time.perf_counter()
+        bulk.replay(games)
+        bulk_elapsed = time.perf_counter() - start
+
+        single = RatingEngine()
+        start = time.perf_counter()
+        for game in games:
+            single.apply(*game)
+        single_elapsed = time.perf_counter() - start
+
+        ratings = np.array([single.rating(key) for key in bulk.keys])
+        deviation = float(np.max(np.abs(bulk.ratings - ratings)))
+        print(f"{game_count:>8} games: replay {bulk_elapsed:6.2f} s ({game_count / bulk_elapsed:9.0f}/s), "
+              f"one by one {single_elapsed:6.2f} s ({game_count / single_elapsed:9.0f}/s), "
+              f"max deviation {deviation:.1e}")
+
+
+if __name__ == '__main__':
+    main()
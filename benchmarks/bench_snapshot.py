@@ -0,0 +1,82 @@
+"""
+Compare the JSON division files with the columnar snapshot (players.pzc):
+file size, load time and memory held by the loaded rosters.
+
+    python benchmarks/bench_snapshot.py --players 50000
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import snapshot_format  # noqa: E402
+from synthetic import synthetic_players  # noqa: E402
+
+
+def load_json_rosters(data_dir):
+    rosters = []
+    for roster in snapshot_format.ROSTERS:
+        with open(os.path.join(data_dir, f'{roster}.json'), 'r', encoding='utf-8') as f:
+            rosters.append(json.load(f))
+    return tuple(rosters)
+
+
+def measure(label, load, repeat):
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = load()
+        timings.append(time.perf_counter() - start)
+        del result
+
+    gc.collect()
+    tracemalloc.start()
+    result = load()
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<9} load {min(timings) * 1000:8.1f} ms   held {held / 1e6:7.1f} MB")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, default=50000, help="Players per division")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    men = synthetic_players(args.players, 'Open', seed=args.seed)
+    women = synthetic_players(args.players, 'Women', seed=args.seed, start_id=args.players + 1)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        for roster, players in zip(snapshot_format.ROSTERS, (men, women)):
+            with open(os.path.join(data_dir, f'{roster}.json'), 'w', encoding='utf-8') as f:
+                json.dump(players, f, ensure_ascii=False, indent=4)
+        columnar_path = os.path.join(data_dir, snapshot_format.SNAPSHOT_FILENAME)
+        start = time.perf_counter()
+        snapshot_format.write_snapshot(columnar_path, {'men_players': men, 'women_players': women})
+        print(f"columnar write: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        json_size = sum(os.path.getsize(os.path.join(data_dir, f'{r}.json')) for r in snapshot_format.ROSTERS)
+        print(f"size      json {json_size / 1e6:.1f} MB   columnar "
+              f"{os.path.getsize(columnar_path) / 1e6:.1f} MB ({2 * args.players} players)")
+
+        from_json = measure('json', lambda: load_json_rosters(data_dir), args.repeat)
+        from_columnar = measure('columnar', lambda: snapshot_format.load_rosters(columnar_path), args.repeat)
+        measure('columns', lambda: snapshot_format.read_snapshot(columnar_path), args.repeat)
+
+        if from_json != from_columnar:
+            print("columnar rosters differ from the JSON files")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
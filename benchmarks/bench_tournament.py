@@ -0,0 +1,39 @@
+"""
+Time tournament.simulate() for every format and a range of field sizes.
+
+    python benchmarks/bench_tournament.py --simulations 100000 --teams 8,16,32,64
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tournament  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--simulations', type=int, default=100000)
+    parser.add_argument('--teams', default='8,16,32,64', help="Comma-separated team counts")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for team_count in (int(t) for t in args.teams.split(',')):
+        # Team ratings = sum of two synthetic player ratings
+        ratings = [rng.randint(800, 2200) + rng.randint(800, 2200) for _ in range(team_count)]
+        for fmt in tournament.FORMATS:
+            start = time.perf_counter()
+            results = tournament.simulate(ratings, fmt, args.simulations, seed=args.seed)
+            elapsed = time.perf_counter() - start
+            favourite = max(results, key=lambda r: r['placement_probabilities'].get('1', 0))
+            print(f"{fmt:<6} {team_count:>4} teams: {elapsed:6.2f} s for {args.simulations} tournaments "
+                  f"({args.simulations / elapsed:9.0f}/s), favourite wins "
+                  f"{favourite['placement_probabilities']['1']:.1%}")
+
+
+if __name__ == '__main__':
+    main()
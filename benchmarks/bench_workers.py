@@ -0,0 +1,98 @@
+"""
+Memory of N forked worker processes each loading the roster, with the JSON
+files vs. the memory-mapped players.pzc (PLAYERZONE_SNAPSHOT_FORMAT=mapped).
+
+    python benchmarks/bench_workers.py --players 50000 --workers 8
+
+Every worker loads the snapshot the way an API worker does, answers a few
+id/name lookups and a /players range query, then reports its proportional
+set size (PSS: shared pages are split among the processes mapping them).
+Linux only, as PSS is read from /proc/<pid>/smaps_rollup.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from player_store import PlayerStore  # noqa: E402
+from roster_query import query_players  # noqa: E402
+import snapshot_format  # noqa: E402
+from synthetic import synthetic_players  # noqa: E402
+
+
+def pss_kb(pid):
+    with open(f'/proc/{pid}/smaps_rollup', 'r') as f:
+        for line in f:
+            if line.startswith('Pss:'):
+                return int(line.split()[1])
+    return 0
+
+
+def worker(data_dir, snapshot_format, lookups, ready, done):
+    start = time.perf_counter()
+    snapshot = PlayerStore(data_dir, snapshot_format=snapshot_format).get_snapshot()
+    load_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for player_id, name in lookups:
+        snapshot.find_by_id(player_id)
+        snapshot.find_by_exact_name(name)
+    query_players(snapshot, {'division': 'open', 'min_elo': '1500', 'max_elo': '1600', 'sort': '-elo'})
+    lookup_s = time.perf_counter() - start
+    ready.put((os.getpid(), load_s, lookup_s))
+    done.wait()
+
+
+def run(mode, data_dir, workers, lookups):
+    ctx = multiprocessing.get_context('fork')
+    ready, done = ctx.Queue(), ctx.Event()
+    procs = [ctx.Process(target=worker, args=(data_dir, mode, lookups, ready, done)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    results = [ready.get() for _ in procs]
+    total_pss = sum(pss_kb(pid) for pid, _, _ in results)
+    done.set()
+    for p in procs:
+        p.join()
+
+    load_ms = max(r[1] for r in results) * 1000
+    lookup_us = max(r[2] for r in results) / (2 * len(lookups)) * 1e6
+    print(f"{mode:<7} {workers} workers: PSS total {total_pss / 1024:7.1f} MB "
+          f"({total_pss / 1024 / workers:6.1f} MB/worker), load {load_ms:7.1f} ms, "
+          f"lookup ~{lookup_us:5.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, default=50000, help="Players per division")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--lookups', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        sys.exit("This benchmark needs Linux (/proc/<pid>/smaps_rollup).")
+
+    men = synthetic_players(args.players, 'Open', seed=args.seed)
+    women = synthetic_players(args.players, 'Women', seed=args.seed, start_id=args.players + 1)
+    lookups = [(p['player_id'], p['name']) for p in (men + women)[::max(1, 2 * args.players // args.lookups)]]
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        for roster, players in zip(snapshot_format.ROSTERS, (men, women)):
+            with open(os.path.join(data_dir, f'{roster}.json'), 'w', encoding='utf-8') as f:
+                json.dump(players, f, ensure_ascii=False, indent=4)
+        snapshot_format.write_snapshot(os.path.join(data_dir, snapshot_format.SNAPSHOT_FILENAME),
+                                       {'men_players': men, 'women_players': women})
+        del men, women
+
+        for mode in ('json', 'mapped'):
+            run(mode, data_dir, args.workers, lookups)
+
+
+if __name__ == '__main__':
+    main()
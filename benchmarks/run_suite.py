@@ -0,0 +1,465 @@
+"""
+Benchmark and load-test suite, run entirely against local synthetic data.
+
+    python benchmarks/run_suite.py run --players 2000 --output results.json
+    python benchmarks/run_suite.py compare baseline.json results.json
+
+`run` starts the playerzone stub (stub_server.py) in place of the live site,
+scrapes it with scraper.py into a temporary data directory, then
+
+  - micro: times the hot functions in-process (ranking parse per backend,
+    scrape over HTTP, history parse and fetch, exact / fuzzy / ID player
+    matching, match calculations), reporting ops/s and per-call
+    percentiles
+  - load: starts the API in a separate process (--server werkzeug or
+    uvicorn) and drives every route with --concurrency keep-alive clients
+    for --duration seconds each, reporting throughput, errors and latency
+    percentiles. Routes of the app without a scenario are listed as
+    uncovered.
+
+Results go to --output as JSON (environment, arguments, git commit and the
+numbers above). `compare` prints the change of every metric between two
+result files and, with --fail-above, exits 1 when one got worse by more than
+that many percent.
+"""
+import argparse
+from contextlib import contextmanager
+import http.client
+import json
+import math
+import os
+import platform
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_server import StubSite, start_in_thread  # noqa: E402
+from synthetic import with_typo  # noqa: E402
+
+# Routes the load tests leave out on purpose (/events streams never finish a request)
+UNTESTED_ROUTES = {'/admin/reload', '/admin/profile', '/static/<path:filename>', '/events'}
+
+
+# ----------------------------------------------------------------------------
+# Measuring
+# ----------------------------------------------------------------------------
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def summarize(durations, scale):
+    """Latency figures of `durations` (seconds), multiplied by `scale` (1e3 => ms, 1e6 => us)."""
+    values = sorted(durations)
+    return {
+        'mean': round(sum(values) / len(values) * scale, 3) if values else None,
+        'p50': round(percentile(values, 0.50) * scale, 3) if values else None,
+        'p90': round(percentile(values, 0.90) * scale, 3) if values else None,
+        'p99': round(percentile(values, 0.99) * scale, 3) if values else None,
+        'max': round(values[-1] * scale, 3) if values else None,
+    }
+
+
+def time_calls(func, min_time):
+    """Call func() repeatedly for at least `min_time` seconds (and at least 3 times)."""
+    func()  # warm up caches and lazy imports
+    durations = []
+    started = time.perf_counter()
+    while len(durations) < 3 or time.perf_counter() - started < min_time:
+        t = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - t)
+    result = {'iterations': len(durations), 'ops_per_s': round(len(durations) / sum(durations), 1)}
+    result.update({f'{key}_us': value for key, value in summarize(durations, 1e6).items()})
+    return result
+
+
+# ----------------------------------------------------------------------------
+# Environment: stub, data directory, API server
+# ----------------------------------------------------------------------------
+def prepare_data(data_dir, base_url):
+    """Scrape the stub into `data_dir` with scraper.py, plus an older shifted scrape for /movers."""
+    env = dict(os.environ, PLAYERZONE_DATA_DIR=data_dir, PLAYERZONE_BASE_URL=base_url)
+    subprocess.run([sys.executable, os.path.join(REPO, 'scraper.py')], env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+    with open(os.path.join(data_dir, 'men_players.json'), encoding='utf-8') as f:
+        men = json.load(f)
+    with open(os.path.join(data_dir, 'women_players.json'), encoding='utf-8') as f:
+        women = json.load(f)
+
+    import timeseries
+    rng = random.Random(0)
+    earlier = [[dict(p, elo_rating=p['elo_rating'] - rng.randint(-60, 60)) for p in players]
+               for players in (men, women)]
+    for players in earlier:
+        for rank, p in enumerate(sorted(players, key=lambda p: -p['elo_rating']), 1):
+            p['rank'] = rank
+    timeseries.record_scrape(timeseries.default_path(data_dir), *earlier, taken_at=time.time() - 30 * 86400)
+    return men, women
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def api_server(kind, data_dir, base_url):
+    """Run the API in a child process; yields its base URL."""
+    port = free_port()
+    env = dict(os.environ, PLAYERZONE_DATA_DIR=data_dir, PLAYERZONE_BASE_URL=base_url,
+               PLAYERZONE_RELOAD_INTERVAL='3600')
+    if kind == 'uvicorn':
+        command = [sys.executable, '-m', 'uvicorn', 'asgi_app:app', '--port', str(port), '--log-level', 'warning']
+    else:
+        command = [sys.executable, '-c',
+                   'import flask_app; from werkzeug.serving import run_simple; '
+                   f'run_simple("127.0.0.1", {port}, flask_app.app, threaded=True)']
+    process = subprocess.Popen(command, cwd=REPO, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"{kind} server exited with code {process.returncode}")
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"{kind} server did not start within 60 s")
+                time.sleep(0.1)
+        yield port
+    finally:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+# ----------------------------------------------------------------------------
+# Microbenchmarks
+# ----------------------------------------------------------------------------
+def run_micro(args, site, base_url, data_dir, men):
+    os.environ['PLAYERZONE_DATA_DIR'] = data_dir
+    os.environ['PLAYERZONE_BASE_URL'] = base_url
+    import flask_app
+    import history
+    import ranking_parser
+    import rgx
+    import scraper
+
+    snapshot = flask_app.player_store.get_snapshot()
+    rng = random.Random(args.seed)
+    sample = [rng.choice(men) for _ in range(200)]
+    ranking_html = site.ranking_page(1)[0].decode('utf-8')
+    history_html = site.history_page(sample[0]['player_id'], 1).decode('utf-8')
+    typos = [with_typo(p['name'], rng) for p in sample]
+    ratings = [(rng.randint(1600, 4400), rng.randint(1600, 4400)) for _ in range(1000)]
+
+    def cycle(items):
+        position = [0]
+
+        def next_item():
+            position[0] = (position[0] + 1) % len(items)
+            return items[position[0]]
+        return next_item
+
+    next_name, next_typo, next_player = cycle([p['name'] for p in sample]), cycle(typos), cycle(sample)
+    next_rating = cycle(ratings)
+    r1, r2 = [a for a, _ in ratings], [b for _, b in ratings]
+
+    benchmarks = {}
+    for backend in ranking_parser.BACKENDS:
+        if backend == 'lxml' and ranking_parser.lxml is None:
+            continue
+        benchmarks[f'parse_ranking_{backend}'] = lambda backend=backend: scraper.parse_players(ranking_html, 'Open', backend)
+    benchmarks.update({
+        'scrape_ranking_http': lambda: scraper.scrape_players(base_url + scraper.DIVISIONS[0][1], 'Open'),
+        'parse_history': lambda: history.parse_history_html(history_html),
+        'fetch_history_http': lambda: history.fetch_history(next_player()['player_id'], 1, base_url),
+        'match_player_id': lambda: flask_app.get_matched_player(str(next_player()['player_id']), snapshot),
+        'match_player_exact_name': lambda: flask_app.get_matched_player(next_name(), snapshot),
+        'match_player_fuzzy_name': lambda: flask_app.get_matched_player(next_typo(), snapshot),
+        'match_combinations': lambda: rgx.combination_results(*next_rating()),
+        'match_resolve_and_calculate': lambda: rgx.combination_results(
+            sum(flask_app.resolve_player_info(p, snapshot)[0] for p in (next_name(), next_typo())),
+            sum(flask_app.resolve_player_info(p, snapshot)[0] for p in (str(next_player()['player_id']), '(1650)'))
+        ),
+        'match_batch_outcomes_1000': lambda: rgx.batch_outcomes(r1, r2),
+    })
+
+    results = {}
+    for name, func in benchmarks.items():
+        if args.filter and not re.search(args.filter, name):
+            continue
+        results[name] = time_calls(func, args.min_time)
+        print(f"  {name:<32} {results[name]['ops_per_s']:>12.1f} ops/s   "
+              f"p50 {results[name]['p50_us']:>10.1f} us   p99 {results[name]['p99_us']:>10.1f} us", flush=True)
+    return results
+
+
+# ----------------------------------------------------------------------------
+# Load tests
+# ----------------------------------------------------------------------------
+def scenarios(men, women, rng):
+    """(name, route rule, method, request factory) per load scenario; factories return (path, JSON body)."""
+    players = men + women
+    ids = sorted({str(p['player_id']) for p in players})
+    names = [p['name'] for p in players]
+    clubs = sorted({p['club'] for p in players if p['club']})
+    cities = sorted({p['city'] for p in players if p['city']})
+
+    def identifiers(count):
+        return [rng.choice(ids) if rng.random() < 0.5 else rng.choice(names) for _ in range(count)]
+
+    def team():
+        return identifiers(2)
+
+    def game():
+        a, b, c, d = rng.sample(ids, 4)
+        return {'team1': [a, b], 'team2': [c, d], 'p': rng.choice([0, 0.33, 0.67, 1])}
+
+    return [
+        ('elo_id', '/elo/<player_query>', 'GET', lambda: (f'/elo/{rng.choice(ids)}', None)),
+        ('elo_name', '/elo/<player_query>', 'GET', lambda: (f'/elo/{quote(rng.choice(names).replace(" ", "_"))}', None)),
+        ('elo_fuzzy', '/elo/<player_query>', 'GET', lambda: (f'/elo/{quote(with_typo(rng.choice(names), rng))}', None)),
+        ('elo_batch_100', '/elo/batch', 'POST', lambda: ('/elo/batch', {'players': identifiers(100)})),
+        ('history', '/history/<player_query>', 'GET', lambda: (f'/history/{rng.choice(ids)}', None)),
+        ('rank_history', '/rank-history/<player_query>', 'GET', lambda: (f'/rank-history/{rng.choice(ids)}', None)),
+        ('players_full', '/players', 'GET', lambda: ('/players', None)),
+        ('players_query', '/players', 'GET',
+         lambda: (f'/players?division=open&min_elo={rng.randint(800, 2000)}&sort=-elo&limit=50', None)),
+        ('search', '/search', 'GET', lambda: (f'/search?q={quote(rng.choice(names)[:rng.randint(2, 6)])}&limit=10', None)),
+        ('match_get', '/match', 'GET',
+         lambda: ('/match?players=' + quote(','.join(team()) + ' vs ' + ','.join(team())), None)),
+        ('match_post', '/match', 'POST', lambda: ('/match', {'team1': team(), 'team2': team()})),
+        ('match_batch_100', '/match/batch', 'POST',
+         lambda: ('/match/batch', {'pairings': [{'team1': team(), 'team2': team()} for _ in range(100)]})),
+        ('tournament_16_teams', '/tournament/simulate', 'POST',
+         lambda: ('/tournament/simulate', {'format': 'double', 'teams': [team() for _ in range(16)],
+                                           'simulations': 2000, 'seed': 1})),
+        ('matchmaking_32', '/matchmaking', 'POST',
+         lambda: ('/matchmaking', {'players': rng.sample(ids, 32), 'time_limit_ms': 50})),
+        ('ratings_project_50', '/ratings/project', 'POST',
+         lambda: ('/ratings/project', {'games': [game() for _ in range(50)]})),
+        ('clubs', '/clubs', 'GET', lambda: ('/clubs?sort=-average_elo', None)),
+        ('club', '/clubs/<path:club>', 'GET', lambda: (f'/clubs/{quote(rng.choice(clubs))}', None)),
+        ('cities', '/cities', 'GET', lambda: ('/cities', None)),
+        ('city', '/cities/<path:city>', 'GET', lambda: (f'/cities/{quote(rng.choice(cities))}', None)),
+        ('trends', '/trends', 'GET', lambda: ('/trends?limit=20', None)),
+        ('leaderboard', '/leaderboard', 'GET',
+         lambda: (f'/leaderboard?division={rng.choice(["open", "women"])}&limit=50&offset={rng.randint(0, 500)}', None)),
+        # prepare_data() records the older scrape 30 days back
+        ('movers', '/movers', 'GET', lambda: (f'/movers?from={days_ago(10)}&limit=20', None)),
+        ('metrics', '/metrics', 'GET', lambda: ('/metrics', None)),
+    ]
+
+
+def days_ago(days):
+    return time.strftime('%Y-%m-%d', time.gmtime(time.time() - days * 86400))
+
+
+def load_worker(port, method, factory, lock, stop_at, latencies, statuses):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    own_latencies, own_statuses = [], {}
+    while time.perf_counter() < stop_at:
+        with lock:
+            path, body = factory()
+        headers = {'Accept-Encoding': 'identity'}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        started = time.perf_counter()
+        try:
+            connection.request(method, path, body=payload, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            status = 'connection_error'
+        own_latencies.append(time.perf_counter() - started)
+        own_statuses[status] = own_statuses.get(status, 0) + 1
+    connection.close()
+    with lock:
+        latencies.extend(own_latencies)
+        for status, count in own_statuses.items():
+            statuses[str(status)] = statuses.get(str(status), 0) + count
+
+
+def run_scenario(port, method, factory, concurrency, duration):
+    lock = threading.Lock()
+    latencies, statuses = [], {}
+    # Short warm-up, not recorded (first history fetches, memoized aggregates)
+    load_worker(port, method, factory, lock, time.perf_counter() + min(0.2, duration), [], {})
+    started = time.perf_counter()
+    threads = [
+        threading.Thread(target=load_worker,
+                         args=(port, method, factory, lock, started + duration, latencies, statuses))
+        for _ in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    errors = sum(count for status, count in statuses.items() if not status.isdigit() or int(status) >= 400)
+    result = {'requests': len(latencies), 'errors': errors, 'statuses': statuses,
+              'requests_per_s': round(len(latencies) / elapsed, 1)}
+    result.update({f'{key}_ms': value for key, value in summarize(latencies, 1e3).items()})
+    return result
+
+
+def app_routes(data_dir, base_url):
+    """Route rules of flask_app, read in a child process so this one stays free of its state."""
+    env = dict(os.environ, PLAYERZONE_DATA_DIR=data_dir, PLAYERZONE_BASE_URL=base_url)
+    output = subprocess.run(
+        [sys.executable, '-c', 'import flask_app, json; print(json.dumps(sorted({r.rule for r in flask_app.app.url_map.iter_rules()})))'],
+        cwd=REPO, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_load(args, data_dir, base_url, men, women):
+    rng = random.Random(args.seed)
+    selected = [s for s in scenarios(men, women, rng) if not args.filter or re.search(args.filter, s[0])]
+    covered = {rule for _, rule, _, _ in scenarios(men, women, rng)}
+    uncovered = [rule for rule in app_routes(data_dir, base_url) if rule not in covered and rule not in UNTESTED_ROUTES]
+
+    results = {}
+    with api_server(args.server, data_dir, base_url) as port:
+        for name, rule, method, factory in selected:
+            results[name] = dict(run_scenario(port, method, factory, args.concurrency, args.duration),
+                                 route=rule, method=method)
+            r = results[name]
+            print(f"  {name:<22} {r['requests_per_s']:>9.1f} req/s  p50 {r['p50_ms']:>8.2f} ms  "
+                  f"p90 {r['p90_ms']:>8.2f} ms  p99 {r['p99_ms']:>8.2f} ms  errors {r['errors']}", flush=True)
+    if uncovered:
+        print(f"  routes without a load scenario: {', '.join(uncovered)}")
+    return results, uncovered
+
+
+# ----------------------------------------------------------------------------
+# Commands
+# ----------------------------------------------------------------------------
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def command_run(args):
+    site = StubSite(args.players, args.history_points, args.seed)
+    stub, base_url = start_in_thread(site, latency=args.upstream_latency_ms / 1000)
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'git_commit': git_commit(),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpus': os.cpu_count()},
+        'arguments': vars(args),
+    }
+    try:
+        with tempfile.TemporaryDirectory(prefix='playerzone-bench-') as data_dir:
+            print(f"Scraping the stub ({args.players} players per division)...", flush=True)
+            men, women = prepare_data(data_dir, base_url)
+            if args.only in (None, 'micro'):
+                print("Microbenchmarks:", flush=True)
+                report['micro'] = run_micro(args, site, base_url, data_dir, men)
+            if args.only in (None, 'load'):
+                print(f"Load tests ({args.server}, {args.concurrency} clients, {args.duration:g} s per scenario):",
+                      flush=True)
+                report['load'], report['uncovered_routes'] = run_load(args, data_dir, base_url, men, women)
+    finally:
+        stub.shutdown()
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write('\n')
+    print(f"Results written to {args.output}")
+
+
+# (section, metric, True if higher is better)
+COMPARED_METRICS = [
+    ('micro', 'ops_per_s', True),
+    ('micro', 'p99_us', False),
+    ('load', 'requests_per_s', True),
+    ('load', 'p50_ms', False),
+    ('load', 'p99_ms', False),
+]
+
+
+def command_compare(args):
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(args.current, encoding='utf-8') as f:
+        current = json.load(f)
+
+    regressions = 0
+    for section, metric, higher_is_better in COMPARED_METRICS:
+        before_section, after_section = baseline.get(section, {}), current.get(section, {})
+        for name in sorted(set(before_section) & set(after_section)):
+            before, after = before_section[name].get(metric), after_section[name].get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before * 100
+            worse = -change if higher_is_better else change
+            flag = ''
+            if args.fail_above is not None and worse > args.fail_above:
+                flag = '  REGRESSION'
+                regressions += 1
+            print(f"{section:<5} {name:<32} {metric:<15} {before:>12.3f} -> {after:>12.3f}  {change:+7.1f}%{flag}")
+    if regressions:
+        print(f"{regressions} metric(s) worse by more than {args.fail_above:g}%.")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help="Run the suite and write a result file")
+    run.add_argument('--players', type=int, default=2000, help="Players per division on the stub")
+    run.add_argument('--history-points', type=int, default=100, help="Points per stub history chart")
+    run.add_argument('--upstream-latency-ms', type=float, default=0.0, help="Delay of every stub response")
+    run.add_argument('--only', choices=('micro', 'load'), help="Run one half of the suite")
+    run.add_argument('--filter', help="Regex on benchmark / scenario names")
+    run.add_argument('--min-time', type=float, default=0.5, help="Seconds per microbenchmark")
+    run.add_argument('--server', choices=('werkzeug', 'uvicorn'), default='werkzeug',
+                     help="How the API is served for the load tests")
+    run.add_argument('--concurrency', type=int, default=8, help="Concurrent load-test clients")
+    run.add_argument('--duration', type=float, default=3.0, help="Seconds per load scenario")
+    run.add_argument('--seed', type=int, default=0)
+    run.add_argument('--output', default='benchmark-results.json')
+
+    compare = sub.add_parser('compare', help="Compare two result files")
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--fail-above', type=float, help="Exit 1 if a metric got worse by more than this percentage")
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        command_run(args)
+    else:
+        command_compare(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Local stand-in for playerzone.roundnetgermany.de, serving synthetic pages:
+
+  /ranking/rg-index/1, /ranking/rg-index/2       Open / Women ranking pages
+  /ranking/rg-rating/history?player_id=&ranking_id=   RGX history charts
+
+    python benchmarks/stub_server.py --players 2000 --port 8765
+    PLAYERZONE_BASE_URL=http://127.0.0.1:8765 python scraper.py
+
+Ranking pages are rendered once at startup and carry an ETag (conditional
+requests get 304). History pages are rendered per request from a seeded
+random walk, so every player has the same history on every run.
+--latency-ms delays every response, to stand in for a slow upstream.
+"""
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import hashlib
+import os
+import sys
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import history_page_html, ranking_page_html, synthetic_history, synthetic_players  # noqa: E402
+
+RANKING_PATH = '/ranking/rg-index/'
+HISTORY_PATH = '/ranking/rg-rating/history'
+
+
+class StubSite:
+    """The synthetic pages of one stub run."""
+
+    def __init__(self, players=2000, history_points=100, seed=0):
+        self.history_points = history_points
+        self.seed = seed
+        # Women ids overlap the upper half of the Open ids: those players are in both divisions
+        self.rosters = {
+            1: synthetic_players(players, 'Open', seed=seed),
+            2: synthetic_players(players, 'Women', seed=seed, start_id=players // 2 + 1),
+        }
+        self.pages = {}
+        for ranking_id, roster in self.rosters.items():
+            body = ranking_page_html(roster, ranking_id).encode('utf-8')
+            self.pages[ranking_id] = (body, '"%s"' % hashlib.sha1(body).hexdigest())
+
+    def ranking_page(self, ranking_id):
+        """(body, etag) or None."""
+        return self.pages.get(ranking_id)
+
+    def history_page(self, player_id, ranking_id):
+        history = synthetic_history(f'{ranking_id}-{player_id}', self.history_points, self.seed)
+        return history_page_html(history).encode('utf-8')
+
+
+def _handler(site, latency):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body go out in separate writes; without this every
+        # response waits for the client's delayed ACK
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            if latency:
+                time.sleep(latency)
+            url = urlsplit(self.path)
+            if url.path.startswith(RANKING_PATH):
+                page = site.ranking_page(_int(url.path[len(RANKING_PATH):]))
+                if page is None:
+                    return self._send(404, b'Not found')
+                body, etag = page
+                if self.headers.get('If-None-Match') == etag:
+                    return self._send(304, b'', etag)
+                return self._send(200, body, etag)
+            if url.path == HISTORY_PATH:
+                query = parse_qs(url.query)
+                player_id = _int(query.get('player_id', [''])[0])
+                ranking_id = _int(query.get('ranking_id', [''])[0])
+                if player_id is None or ranking_id not in site.rosters:
+                    return self._send(404, b'Not found')
+                return self._send(200, site.history_page(player_id, ranking_id))
+            self._send(404, b'Not found')
+
+        def _send(self, status, body, etag=None):
+            self.send_response(status)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            if etag:
+                self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def _int(text):
+    try:
+        return int(text)
+    except ValueError:
+        return None
+
+
+def make_server(site, host='127.0.0.1', port=0, latency=0.0):
+    """A ThreadingHTTPServer for `site`; port 0 picks a free port (see server.server_port)."""
+    server = ThreadingHTTPServer((host, port), _handler(site, latency))
+    server.daemon_threads = True
+    return server
+
+
+def start_in_thread(site, host='127.0.0.1', port=0, latency=0.0):
+    """Serve `site` from a daemon thread; returns (server, base_url)."""
+    server = make_server(site, host, port, latency)
+    threading.Thread(target=server.serve_forever, name='playerzone-stub', daemon=True).start()
+    return server, f'http://{host}:{server.server_port}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, default=2000, help="Players per division")
+    parser.add_argument('--history-points', type=int, default=100, help="Points per history chart")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Delay of every response")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    site = StubSite(args.players, args.history_points, args.seed)
+    server = make_server(site, args.host, args.port, args.latency_ms / 1000)
+    print(f"playerzone stub on http://{args.host}:{server.server_port} "
+          f"({args.players} players per division)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
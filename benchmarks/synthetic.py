@@ -0,0 +1,160 @@
+"""
+Synthetic roster data for the benchmarks. Everything is seeded, so two runs
+with the same arguments see the same players.
+"""
+from datetime import date, timedelta
+import random
+
+FIRST_NAMES = [
+    "Paul", "Anna", "Lena", "Max", "Jonas", "Lea", "Tim", "Mia", "Felix", "Sophie",
+    "Luca", "Emma", "Finn", "Marie", "Ben", "Clara", "Noah", "Hannah", "Elias", "Lina",
+    "Leon", "Emilia", "Moritz", "Johanna", "Jakob", "Greta", "Niklas", "Ida", "Julian", "Frieda",
+]
+LAST_NAMES = [
+    "Siemer", "Müller", "Schmidt", "Schneider", "Fischer", "Weber", "Meyer", "Wagner",
+    "Becker", "Schulz", "Hoffmann", "Schäfer", "Koch", "Bauer", "Richter", "Klein",
+    "Wolf", "Schröder", "Neumann", "Schwarz", "Zimmermann", "Braun", "Krüger", "Hofmann",
+    "Hartmann", "Lange", "Schmitt", "Werner", "Krause", "Meier", "Lehmann", "Köhler",
+]
+CLUBS = [
+    "1. Roundnet Club Köln", "Roundnet Berlin", "Spikeball Hamburg", "RC München",
+    "Roundnet Leipzig", "Roundnet Frankfurt", "Roundnet Stuttgart", "",
+]
+CITIES = ["Köln", "Berlin", "Hamburg", "München", "Leipzig", "Frankfurt", "Stuttgart", ""]
+# Last point of every synthetic history
+HISTORY_END = date(2024, 12, 30)
+
+
+def synthetic_names(count, seed=0):
+    """`count` distinct player names built from common German first/last names."""
+    rng = random.Random(seed)
+    names = []
+    seen = set()
+    while len(names) < count:
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        if name in seen:
+            # Double names / suffixes keep the roster realistic but unique
+            name = f"{name}-{rng.choice(LAST_NAMES)}"
+            if name in seen:
+                name = f"{name} {len(names)}"
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+def with_typo(name, rng):
+    """Return `name` with one random character dropped, swapped or replaced."""
+    if len(name) < 4:
+        return name
+    i = rng.randrange(1, len(name) - 1)
+    kind = rng.randrange(3)
+    if kind == 0:
+        return name[:i] + name[i + 1:]
+    if kind == 1:
+        return name[:i - 1] + name[i] + name[i - 1] + name[i + 1:]
+    return name[:i] + rng.choice("aeiounrst") + name[i + 1:]
+
+
+def synthetic_players(count, division, seed=0, start_id=1):
+    """Player dicts in the scraper's schema, ranked by descending rating."""
+    rng = random.Random(f"{seed}-{division}")
+    names = synthetic_names(count, seed=f"{seed}-{division}")
+    ratings = sorted((rng.randint(800, 2200) for _ in range(count)), reverse=True)
+    players = []
+    for i, (name, rating) in enumerate(zip(names, ratings)):
+        club_idx = rng.randrange(len(CLUBS))
+        players.append({
+            "name": name,
+            "player_id": start_id + i,
+            "rank": i + 1,
+            "club": CLUBS[club_idx],
+            "city": CITIES[club_idx],
+            "games": rng.randint(0, 400),
+            "elo_rating": rating,
+            "division": division,
+            "trend_90_days": rng.randint(-80, 80),
+            "pro_status": rating >= 1800,
+            "exists_in_both_divisions": False,
+        })
+    return players
+
+
+def ranking_row_html(player, ranking_id=1):
+    """One <tr> of the playerzone ranking table (table#rgx-main-table) for `player`."""
+    trend = player['trend_90_days']
+    if trend == 0:
+        hint = "Keine Veränderung"
+    else:
+        hint = f"{trend:+d} Punkte in den letzten 90 Tagen"
+    pro = " pro-div" if player['pro_status'] else ""
+    return (
+        '<tr>\n'
+        f'  <td class="bebas bold pos-col">{player["rank"]}.</td>\n'
+        '  <td>\n'
+        '    <div class="player-name">'
+        f'<a href="#elo-history" class="modal-trigger bebas" onclick="show_history({player["player_id"]}, {ranking_id})">'
+        f'{html_escape(player["name"])}</a></div>\n'
+        f'    <span class="player-club hide-on-med-and-down">{html_escape(player["club"])}</span>\n'
+        f'    <span class="player-club hide-on-large-only">{html_escape(player["city"])}</span>\n'
+        '  </td>\n'
+        f'  <td class="bebas games-col hide-on-small-only"> {player["games"]} </td>\n'
+        f'  <td><div class="rgx-badge{pro}"><span class="rgx-value">{player["elo_rating"]}'
+        f'<span class="hint" data-content="{html_escape(hint)}"><i class="material-icons">info</i></span>'
+        '</span></div></td>\n'
+        '</tr>'
+    )
+
+
+def ranking_page_html(players, ranking_id=1):
+    """A full ranking page around ranking_row_html rows, with the page chrome parsers must skip."""
+    rows = "\n".join(ranking_row_html(p, ranking_id) for p in players)
+    return (
+        '<!DOCTYPE html>\n<html lang="de"><head><meta charset="utf-8">'
+        '<title>RGX Ranking</title><link rel="stylesheet" href="/css/app.css"></head>\n'
+        '<body><nav><table class="menu"><tr><td>Ranking</td></tr></table></nav>\n'
+        '<table id="rgx-main-table" class="striped">\n'
+        '<thead><tr><th>#</th><th>Spieler</th><th>Spiele</th><th>RGX</th></tr></thead>\n'
+        f'<tbody>\n{rows}\n'
+        # Rows without a player link (e.g. ads or separators) are skipped by the scraper
+        '<tr><td colspan="4" class="divider">Weitere Spieler</td></tr>\n'
+        '</tbody>\n</table>\n'
+        '<script>function show_history(id, ranking) { /* ... */ }</script>\n'
+        '</body></html>\n'
+    )
+
+
+def html_escape(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
+
+
+def synthetic_history(player_id, points, seed=0):
+    """[(date, rating), ...] of a seeded random walk, one point per week up to HISTORY_END."""
+    rng = random.Random(f"{seed}-history-{player_id}")
+    rating = rng.randint(800, 2200)
+    history = []
+    for week in range(points):
+        day = HISTORY_END - timedelta(weeks=points - 1 - week)
+        history.append((day.strftime('%d.%m.%Y'), rating))
+        rating = max(500, rating + rng.randint(-40, 40))
+    return history
+
+
+def history_page_html(history):
+    """A playerzone history page: the RGX chart config history.parse_history_html reads."""
+    labels = ", ".join(f"'{day}'" for day, _ in history)
+    data = ", ".join(str(rating) for _, rating in history)
+    return (
+        '<!DOCTYPE html>\n<html lang="de"><head><meta charset="utf-8"><title>RGX Verlauf</title></head>\n'
+        '<body><canvas id="rgx-chart"></canvas>\n'
+        '<script>\n'
+        'new Chart(document.getElementById("rgx-chart"), {\n'
+        '  type: "line",\n'
+        '  data: {\n'
+        f'    labels: [{labels}],\n'
+        f'    datasets: [{{ label: "RGX", borderColor: "#e30613", data: [{data}] }}]\n'
+        '  },\n'
+        '  options: { responsive: true }\n'
+        '});\n'
+        '</script>\n'
+        '</body></html>\n'
+    )
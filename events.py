@@ -0,0 +1,322 @@
+"""
+Change feed behind GET /events: whenever a new snapshot is loaded, the
+players whose rating, rank or 90-day trend moved (plus added and removed
+players) are published once as an event and pushed to every subscriber as
+server-sent events.
+
+Fan-out is built for many idle subscribers:
+
+  - the diff between consecutive snapshots is computed once per reload, on
+    the reloading thread (PlayerStore listener)
+  - an event is serialized once per distinct filter, however many
+    subscribers share that filter
+  - subscribers hold no state beyond their filter and last event id; they
+    sleep on one condition (threads) or one asyncio.Event per event loop
+    and wake only for new events and heartbeats
+  - while anybody is subscribed, one watcher thread checks the data files
+    for a new snapshot, so updates are pushed even without other traffic
+
+The last `history` events are kept so a reconnecting client (Last-Event-ID)
+gets what it missed. A client that fell further behind gets a 'reset' event
+and should refetch what it shows.
+"""
+import asyncio
+from collections import deque
+import json
+import threading
+import time
+
+import metrics
+from player_diff import diff_players, player_key
+
+EVENT_FIELDS = ('elo_rating', 'rank', 'trend_90_days')
+DIVISIONS = ('open', 'women')
+
+# Distinct filters whose frames are kept per event; beyond that frames are
+# serialized per subscriber
+MAX_CACHED_FRAMES = 1024
+
+
+class EventsError(ValueError):
+    """Invalid /events subscription parameter, reported to the client as HTTP 400."""
+
+
+# ----------------------------------------------------------------------------
+# Snapshot deltas
+# ----------------------------------------------------------------------------
+def _entry(kind, player, deltas=None):
+    entry = {
+        'type': kind,
+        'player_id': player['player_id'],
+        'division': player['division'],
+        'name': player['name'],
+        'club': player.get('club'),
+    }
+    for field in EVENT_FIELDS:
+        entry[field] = player.get(field)
+    if deltas is not None:
+        entry['delta'] = deltas
+    return entry
+
+
+def snapshot_changes(old_snapshot, new_snapshot):
+    """
+    Players of new_snapshot whose rating, rank or trend differ from
+    old_snapshot, as event entries:
+      {'type': 'changed' | 'added' | 'removed', 'player_id', 'division',
+       'name', 'club', 'elo_rating', 'rank', 'trend_90_days',
+       'delta': {field: new - old, ...}}   (changed players only)
+    A negative rank delta is a climb.
+    """
+    diff = diff_players(old_snapshot.players, new_snapshot.players)
+    entries = [_entry('added', p) for p in diff['added']]
+    entries += [_entry('removed', p) for p in diff['removed']]
+    moved = [c for c in diff['changed'] if any(field in c['changes'] for field in EVENT_FIELDS)]
+    if moved:
+        current = {player_key(p): p for p in new_snapshot.players}
+        for change in moved:
+            deltas = {}
+            for field in EVENT_FIELDS:
+                old, new = change['changes'].get(field, (None, None))
+                if isinstance(old, (int, float)) and isinstance(new, (int, float)):
+                    deltas[field] = new - old
+            entries.append(_entry('changed', current[(change['player_id'], change['division'])], deltas))
+    return entries
+
+
+# ----------------------------------------------------------------------------
+# Subscription filters
+# ----------------------------------------------------------------------------
+def _values(args, name):
+    """Repeated and/or comma-separated query parameter values."""
+    values = args.getlist(name) if hasattr(args, 'getlist') else [args.get(name) or '']
+    return [v.strip() for value in values for v in value.split(',') if v.strip()]
+
+
+class EventFilter:
+    """
+    Which entries a subscriber gets: players by id, clubs (case-insensitive)
+    and divisions. Entries must match every given kind; no filter passes
+    everything.
+    """
+
+    __slots__ = ('players', 'clubs', 'divisions', 'key')
+
+    def __init__(self, players=(), clubs=(), divisions=()):
+        self.players = frozenset(players)
+        self.clubs = frozenset(c.lower() for c in clubs)
+        self.divisions = frozenset(d.lower() for d in divisions)
+        self.key = (self.players, self.clubs, self.divisions)
+
+    @classmethod
+    def from_args(cls, args):
+        """Parse player=, club= and division= (see /events); raises EventsError."""
+        try:
+            players = [int(p) for p in _values(args, 'player')]
+        except ValueError:
+            raise EventsError("'player' must be player ids.")
+        divisions = [d.lower() for d in _values(args, 'division')]
+        if any(d not in DIVISIONS for d in divisions):
+            raise EventsError("'division' must be 'open' or 'women'.")
+        return cls(players, _values(args, 'club'), divisions)
+
+    def matches(self, entry):
+        if self.players and entry['player_id'] not in self.players:
+            return False
+        if self.clubs and (entry['club'] or '').lower() not in self.clubs:
+            return False
+        return not self.divisions or entry['division'].lower() in self.divisions
+
+
+# ----------------------------------------------------------------------------
+# Events and the feed
+# ----------------------------------------------------------------------------
+def _frame(event_id, name, data):
+    return f"id: {event_id}\nevent: {name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class ChangeEvent:
+    """The entries of one snapshot swap; never mutated after publishing."""
+
+    def __init__(self, sequence, old_snapshot, new_snapshot, entries):
+        self.sequence = sequence
+        self.generation = new_snapshot.generation
+        self.previous_generation = old_snapshot.generation
+        self.loaded_at = new_snapshot.loaded_at
+        self.entries = entries
+        self._frames = {}
+
+    def frame(self, event_filter):
+        """The SSE frame for subscribers with `event_filter`; '' if nothing matches."""
+        frame = self._frames.get(event_filter.key)
+        if frame is None:
+            entries = self.entries
+            if event_filter.key != EMPTY_FILTER.key:
+                entries = [e for e in entries if event_filter.matches(e)]
+            frame = _frame(self.generation, 'players', {
+                'generation': self.generation,
+                'previous_generation': self.previous_generation,
+                'loaded_at': self.loaded_at,
+                'players': entries,
+            }) if entries else ''
+            if len(self._frames) < MAX_CACHED_FRAMES:
+                self._frames[event_filter.key] = frame
+        return frame
+
+
+EMPTY_FILTER = EventFilter()
+
+
+class ChangeFeed:
+    """
+    Records a ChangeEvent per snapshot swap. Register publish() with
+    PlayerStore.add_listener(); `refresh` (e.g. PlayerStore.get_snapshot) is
+    called every `refresh_interval` seconds by the watcher thread while
+    anybody is subscribed.
+
+    Clients see snapshot generations as event ids. Internally subscribers
+    track a sequence number, so waiting is a single integer comparison.
+    """
+
+    def __init__(self, refresh=None, refresh_interval=2.0, history=64):
+        self.refresh = refresh
+        self.refresh_interval = refresh_interval
+        self.subscribers = 0
+        self.sequence = 0
+        self.generation = None
+        self._events = deque(maxlen=history)
+        self._condition = threading.Condition()
+        self._loop_events = {}  # asyncio loop => asyncio.Event set on the next publish
+        self._watching = False
+
+    # -- publishing ----------------------------------------------------------
+    def publish(self, old_snapshot, new_snapshot):
+        """PlayerStore listener: diff the snapshots and wake the subscribers."""
+        if old_snapshot is None:
+            self.generation = new_snapshot.generation
+            return
+        with metrics.stage('events_diff'):
+            entries = snapshot_changes(old_snapshot, new_snapshot)
+        with self._condition:
+            # Swaps that moved nobody are recorded too, so resuming from any
+            # recent generation finds its successor
+            self.sequence += 1
+            self.generation = new_snapshot.generation
+            self._events.append(ChangeEvent(self.sequence, old_snapshot, new_snapshot, entries))
+            if not entries:
+                return
+            loop_events, self._loop_events = self._loop_events, {}
+            self._condition.notify_all()
+        for loop, event in loop_events.items():
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # Loop already closed
+                pass
+
+    def _resume_sequence(self, generation):
+        """The sequence right after `generation`, or None if it is unknown or too old."""
+        if generation == self.generation:
+            return self.sequence
+        for event in self._events:
+            if event.previous_generation == generation:
+                return event.sequence - 1
+        return None
+
+    # -- waiting -------------------------------------------------------------
+    def wait(self, sequence, timeout):
+        """Block until an event after `sequence` exists or `timeout` passed."""
+        with self._condition:
+            return self._condition.wait_for(lambda: self.sequence > sequence, timeout)
+
+    async def wait_async(self, sequence, timeout):
+        """Like wait(), without holding a thread."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            # Take the loop's event before checking, so a publish in between
+            # is either seen here or sets the event
+            with self._condition:
+                if self.sequence > sequence:
+                    return True
+                event = self._loop_events.get(loop)
+                if event is None:
+                    event = self._loop_events[loop] = asyncio.Event()
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+
+    # -- subscribers ---------------------------------------------------------
+    def subscribe(self, event_filter=EMPTY_FILTER, last_event_id=None):
+        """
+        A Subscription for events after generation `last_event_id` (the SSE
+        Last-Event-ID), or from now on if None. An unknown or dropped
+        generation starts the subscription with a 'reset' event.
+        """
+        with self._condition:
+            self.subscribers += 1
+            if self.refresh is not None and not self._watching:
+                self._watching = True
+                threading.Thread(target=self._watch, name='playerzone-events', daemon=True).start()
+            if last_event_id is None:
+                return Subscription(self, event_filter, self.sequence)
+            sequence = self._resume_sequence(last_event_id)
+            if sequence is None:
+                return Subscription(self, event_filter, self.sequence, reset=True)
+            return Subscription(self, event_filter, sequence)
+
+    def _events_after(self, sequence):
+        with self._condition:
+            return [e for e in self._events if e.sequence > sequence], self.sequence, self.generation
+
+    def _unsubscribe(self):
+        with self._condition:
+            self.subscribers -= 1
+
+    def _watch(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            with self._condition:
+                if not self.subscribers:
+                    self._watching = False
+                    return
+            try:
+                self.refresh()
+            except (OSError, ValueError):
+                # Missing or half-written files: the store keeps its snapshot
+                pass
+
+
+class Subscription:
+    """One subscriber's position in the feed; close() it when the client is gone."""
+
+    def __init__(self, feed, event_filter, sequence, reset=False):
+        self.feed = feed
+        self.filter = event_filter
+        self.sequence = sequence
+        self._reset = reset
+        self._closed = False
+
+    def opening(self, retry_ms=5000):
+        """
+        First frames: the reconnect delay, 'hello' with the data version the
+        client starts from ('reset' instead if it asked to resume from a
+        version that is no longer known) and anything it missed.
+        """
+        name = 'reset' if self._reset else 'hello'
+        return (f"retry: {retry_ms}\n\n" + _frame(self.feed.generation, name, {'generation': self.feed.generation})
+                + self.pending())
+
+    def pending(self):
+        """Frames of the events since the last call ('' if none match)."""
+        events, self.sequence, _ = self.feed._events_after(self.sequence)
+        return ''.join(event.frame(self.filter) for event in events)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self.feed._unsubscribe()
@@ -1,18 +1,206 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-from fuzzywuzzy import process
+import hmac
 import json
 import os
 import re
-import requests
+import signal
+import time
+
+import admission
+from aggregates import aggregate_tables, group_detail, query_groups, query_trends
+from events import ChangeFeed, EventFilter, EventsError
+from history import HistoryCache, HistoryError, HistoryStore, fetch_history, fetch_history_async, ranking_id_for
+from http_cache import cached_json_body, cached_response
+from player_store import PlayerStore, normalize_name, pick_division_record
+from profiler import SamplingProfiler
+from roster_query import QUERY_PARAMS, QueryError, query_players
+import matchmaking
+import metrics
+import rgx
+from timeseries import TimeSeriesError, TimeSeriesStore, default_path as timeseries_path, parse_moment
+
+try:
+    import tournament
+except ImportError:  # pragma: no cover - /tournament/simulate needs numpy
+    tournament = None
+
+try:
+    import rating_engine
+except ImportError:  # pragma: no cover - /ratings/project needs numpy
+    rating_engine = None
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """The default JSON provider, timed into the 'json_serialize' stage."""
+
+    def dumps(self, obj, **kwargs):
+        with metrics.stage('json_serialize'):
+            return super().dumps(obj, **kwargs)
+
 
 app = Flask(__name__)
+app.json = TimedJSONProvider(app)
 CORS(app)
 
+# Process-wide player data, loaded once and hot-reloaded when the scraper
+# rewrites the JSON files.
+DATA_DIR = os.environ.get('PLAYERZONE_DATA_DIR', os.path.dirname(os.path.abspath(__file__)))
+player_store = PlayerStore(
+    DATA_DIR,
+    check_interval=float(os.environ.get('PLAYERZONE_RELOAD_INTERVAL', '2.0')),
+    snapshot_format=os.environ.get('PLAYERZONE_SNAPSHOT_FORMAT', 'auto')
+)
+
+# Max pairings per /match/batch request
+MATCH_BATCH_LIMIT = int(os.environ.get('PLAYERZONE_MATCH_BATCH_LIMIT', '10000'))
+
+# Max identifiers per /elo/batch request
+ELO_BATCH_LIMIT = int(os.environ.get('PLAYERZONE_ELO_BATCH_LIMIT', '1000'))
+
+# Max simulated tournaments per /tournament/simulate request
+TOURNAMENT_MAX_SIMULATIONS = int(os.environ.get('PLAYERZONE_TOURNAMENT_MAX_SIMULATIONS', '100000'))
+
+# Max players and search time per /matchmaking request
+MATCHMAKING_MAX_PLAYERS = int(os.environ.get('PLAYERZONE_MATCHMAKING_MAX_PLAYERS', '512'))
+MATCHMAKING_MAX_TIME_MS = int(os.environ.get('PLAYERZONE_MATCHMAKING_MAX_TIME_MS', '1000'))
+
+# Max games per /ratings/project request
+PROJECTION_MAX_GAMES = int(os.environ.get('PLAYERZONE_PROJECTION_MAX_GAMES', '10000'))
+
+# Parsed /history results; emptied whenever a new snapshot is loaded
+history_cache = HistoryCache(
+    maxsize=int(os.environ.get('PLAYERZONE_HISTORY_CACHE_SIZE', '2048')),
+    ttl=float(os.environ.get('PLAYERZONE_HISTORY_TTL', '600'))
+)
+
+
+def _invalidate_history_cache(old_snapshot, new_snapshot):
+    if old_snapshot is not None:
+        history_cache.clear()
+
+
+player_store.add_listener(_invalidate_history_cache)
+
+
+def _update_aggregates(old_snapshot, new_snapshot):
+    # Carry the club/city/trend tables over incrementally, but only once a
+    # request has asked for them
+    if old_snapshot is not None and old_snapshot.memoized('aggregates') is not None:
+        aggregate_tables(new_snapshot, old_snapshot)
+
+
+player_store.add_listener(_update_aggregates)
+
+# Rating changes pushed to /events subscribers (see events.py). While anybody
+# is subscribed the feed checks the data files itself, so changes go out even
+# when no other request comes in.
+change_feed = ChangeFeed(
+    refresh=player_store.get_snapshot,
+    refresh_interval=player_store.check_interval,
+    history=int(os.environ.get('PLAYERZONE_EVENTS_HISTORY', '64'))
+)
+player_store.add_listener(change_feed.publish)
+EVENTS_HEARTBEAT = float(os.environ.get('PLAYERZONE_EVENTS_HEARTBEAT', '15'))
+# WSGI environ key set (to a dict) by the ASGI app, which streams /events
+# itself: the handler then answers with the opening frames only and leaves
+# the subscription in the dict under 'subscription'
+EVENTS_ASYNC_ENVIRON = 'playerzone.events_async'
+
+# Histories persisted by history_crawler.py; with PLAYERZONE_HISTORY_OFFLINE=1
+# /history never goes upstream
+history_store = HistoryStore(
+    os.environ.get('PLAYERZONE_HISTORY_STORE', os.path.join(DATA_DIR, 'histories.json.gz'))
+)
+HISTORY_OFFLINE = os.environ.get('PLAYERZONE_HISTORY_OFFLINE') == '1'
+# WSGI environ key of a history fetched ahead by the ASGI app:
+# ((player_id, ranking_id), history or None, HistoryError / admission.Rejected or None)
+HISTORY_PREFETCH_ENVIRON = 'playerzone.history_prefetch'
+# WSGI environ key of a request the ASGI app has run through admission
+# control already: True, or the admission.Rejected to answer with
+ADMITTED_ENVIRON = 'playerzone.admitted'
+
+# Admission control (see admission.py). Concurrent live /history fetches are
+# capped; per-client limits (keyed by PLAYERZONE_CLIENT_IP_HEADER behind a
+# proxy) and the cap on requests in flight are off unless configured.
+CLIENT_IP_HEADER = os.environ.get('PLAYERZONE_CLIENT_IP_HEADER')
+request_rate_limiter = admission.ClientRateLimiter(
+    rate=float(os.environ.get('PLAYERZONE_RATE_LIMIT', '0')),
+    burst=float(os.environ.get('PLAYERZONE_RATE_LIMIT_BURST', '50'))
+)
+upstream_rate_limiter = admission.ClientRateLimiter(
+    rate=float(os.environ.get('PLAYERZONE_UPSTREAM_RATE_LIMIT', '0')),
+    burst=float(os.environ.get('PLAYERZONE_UPSTREAM_RATE_BURST', '10')),
+    reason='upstream_rate'
+)
+upstream_limit = admission.ConcurrencyLimit(
+    int(os.environ.get('PLAYERZONE_UPSTREAM_CONCURRENCY', '8')),
+    timeout=float(os.environ.get('PLAYERZONE_UPSTREAM_QUEUE_TIMEOUT', '2'))
+)
+events_limit = admission.ConcurrencyLimit(
+    int(os.environ.get('PLAYERZONE_EVENTS_MAX_SUBSCRIBERS', '10000')),
+    timeout=0,
+    reason='subscribers',
+    message='Too many event subscribers. Please retry shortly.'
+)
+# Under WSGI every open /events stream holds a worker thread, so only a few
+# are allowed there; asgi_app serves them without threads
+wsgi_events_limit = admission.ConcurrencyLimit(
+    int(os.environ.get('PLAYERZONE_EVENTS_MAX_WSGI_SUBSCRIBERS', '16')),
+    timeout=0,
+    reason='subscribers',
+    message='Too many event subscribers for this server. Please retry shortly.'
+)
+_MAX_IN_FLIGHT = int(os.environ.get('PLAYERZONE_MAX_CONCURRENT_REQUESTS', '0'))
+request_gate = admission.PriorityGate(
+    _MAX_IN_FLIGHT,
+    max_queue=int(os.environ.get('PLAYERZONE_REQUEST_QUEUE', str(4 * _MAX_IN_FLIGHT))),
+    max_wait=float(os.environ.get('PLAYERZONE_REQUEST_QUEUE_TIMEOUT', '1'))
+)
+# Gate priority per endpoint: routes answered from memory and caches first,
+# CPU-heavy ones next, upstream-bound /history last. Operational endpoints
+# skip the gate, and so does the long-lived /events stream (which is capped
+# by events_limit instead).
+ENDPOINT_PRIORITY = {
+    'calculate_match_batch': 1,
+    'simulate_tournament': 1,
+    'suggest_matchmaking': 1,
+    'project_ratings': 1,
+    'get_elo_ratings_batch': 1,
+    'get_elo_history': 2,
+}
+UNGATED_ENDPOINTS = {'get_metrics', 'reload_players', 'configure_profiler', 'static'}
+STREAMING_ENDPOINTS = {'stream_events'}
+metrics.REGISTRY.add_collector(lambda: [
+    ('playerzone_requests_in_flight', 'gauge', 'Requests admitted by the request gate.', (),
+     [((), request_gate.active)]),
+    ('playerzone_requests_queued', 'gauge', 'Requests waiting for the request gate.', (),
+     [((), request_gate.queued)]),
+    ('playerzone_upstream_fetches_in_flight', 'gauge', 'Live history fetches holding an upstream slot.', (),
+     [((), upstream_limit.active)]),
+    ('playerzone_events_subscribers', 'gauge', 'Open /events streams.', (),
+     [((), change_feed.subscribers)]),
+])
+
+# Every scrape, as appended by scraper.py (see timeseries.py)
+timeseries_store = TimeSeriesStore(timeseries_path(DATA_DIR))
+
+# Per-request sampling profiles (see profiler.py); off unless PLAYERZONE_PROFILE=1
+# or switched on through /admin/profile
+profiler = SamplingProfiler(
+    os.environ.get('PLAYERZONE_PROFILE_DIR', os.path.join(DATA_DIR, 'profiles')),
+    interval=float(os.environ.get('PLAYERZONE_PROFILE_INTERVAL_MS', '5')) / 1000,
+    min_duration=float(os.environ.get('PLAYERZONE_PROFILE_MIN_MS', '0')) / 1000,
+    keep=int(os.environ.get('PLAYERZONE_PROFILE_KEEP', '100'))
+)
+if os.environ.get('PLAYERZONE_PROFILE') == '1':
+    profiler.configure(True)
+
 # ----------------------------------------------------------------------------
 # Helper: get_matched_player - used by /elo and /history to resolve ID vs name
 # ----------------------------------------------------------------------------
-def get_matched_player(player_query, all_players):
+def get_matched_player(player_query, snapshot):
     """
     Returns (matched_player_dict, fuzzy_score, exact_match_bool)
     or raises ValueError if no match is found.
@@ -21,28 +209,24 @@ def get_matched_player(player_query, all_players):
       1) Try parse as int => interpret as a player ID
          - If found, default to Women if multiple divisions share that ID
          - (fuzzy_score=None, exact_match=True)
-      2) If that fails => treat as a fuzzy name
+      2) If that fails => treat as a name
          - If name ends with '(o)' or '(1)', prefer Open if found in both divisions
+         - The snapshot's search index answers like extractOne over all names
          - (fuzzy_score=some int, exact_match=(score==100))
     """
     # Attempt ID-based lookup
     try:
         requested_id = int(player_query)
-        matched_players = [p for p in all_players if p['player_id'] == requested_id]
+        matched_players = snapshot.find_by_id(requested_id)
         if not matched_players:
             raise ValueError(f"No player found with ID {requested_id}")
 
-        if len(matched_players) > 1:
-            # Found in both divisions => default to Women
-            women_match = next((p for p in matched_players if p['division'].lower() == 'women'), None)
-            matched_player = women_match if women_match else matched_players[0]
-        else:
-            matched_player = matched_players[0]
-
+        # Found in both divisions => default to Women
+        matched_player = pick_division_record(matched_players)
         return matched_player, None, True  # (player_dict, fuzzy_score=None, exact_match=True)
 
     except ValueError:
-        # Not numeric => fuzzy name
+        # Not numeric => name
         wants_open = False
         sanitized_name = player_query.strip()
 
@@ -50,38 +234,45 @@ def get_matched_player(player_query, all_players):
             wants_open = True
             sanitized_name = sanitized_name[:-4].strip()
 
-        all_names = [p['name'] for p in all_players]
-        best_match_tuple = process.extractOne(sanitized_name, all_names)
-        if not best_match_tuple:
-            raise ValueError(f"No player found matching '{sanitized_name}'")
-        best_match, score = best_match_tuple
-
-        matched_records = [p for p in all_players if p['name'] == best_match]
+        matched_records, score = match_player_name(sanitized_name, snapshot)
         if not matched_records:
             raise ValueError(f"No player found matching '{sanitized_name}'")
 
-        if len(matched_records) > 1:
-            women_match = next((p for p in matched_records if p['division'].lower() == 'women'), None)
-            open_match = next((p for p in matched_records if p['division'].lower() == 'open'), None)
-            if wants_open and open_match:
-                matched_player = open_match
-            elif women_match:
-                matched_player = women_match
-            else:
-                matched_player = matched_records[0]
-        else:
-            matched_player = matched_records[0]
-
+        matched_player = pick_division_record(matched_records, wants_open)
         exact_match = (score == 100)
         return matched_player, score, exact_match
 
 
+# ----------------------------------------------------------------------------
+# Helper: match_player_name - fuzzy name lookup
+# ----------------------------------------------------------------------------
+def match_player_name(name, snapshot):
+    """
+    Returns (records, score) for the best matching name, where records holds
+    one entry per division of that player. Returns ([], None) if nothing matches.
+    """
+    with metrics.stage('fuzzy_match'):
+        best_match_tuple = snapshot.search_index.extract_one(name)
+    if not best_match_tuple:
+        return [], None
+    best_match, score = best_match_tuple
+    return snapshot.find_by_matched_name(best_match), score
+
+
 # ----------------------------------------------------------------------------
 # Helper: resolve_player_info - used by /match to get (rating, display_name)
 # ----------------------------------------------------------------------------
-def resolve_player_info(identifier, all_players):
+def resolve_player_info(identifier, snapshot):
+    """
+    Resolve a single 'identifier' to (rating, name), see resolve_player_record.
+    """
+    return resolve_player_record(identifier, snapshot)[1:]
+
+
+def resolve_player_record(identifier, snapshot):
     """
-    Resolve a single 'identifier' to (rating, name).
+    Resolve a single 'identifier' to (player record, rating, name); the
+    record is None for direct ratings.
     
     'identifier' can be:
       - "(xxxx)" => direct RGX rating
@@ -100,59 +291,127 @@ def resolve_player_info(identifier, all_players):
     match_paren_rating = re.match(r'^\((\d+)\)$', sanitized)
     if match_paren_rating:
         rating_val = int(match_paren_rating.group(1))
-        return rating_val, f"Direct RGX {rating_val}"
+        return None, rating_val, f"Direct RGX {rating_val}"
 
     # Step 3) Try interpret as int => could be player_id or direct rating
     try:
         as_int = int(sanitized)
-        matched_players = [p for p in all_players if p['player_id'] == as_int]
+        matched_players = snapshot.find_by_id(as_int)
         if matched_players:
-            if len(matched_players) > 1:
-                # found in both => default to Women, unless wants_open
-                women_match = next((p for p in matched_players if p['division'].lower() == 'women'), None)
-                open_match = next((p for p in matched_players if p['division'].lower() == 'open'), None)
-                if wants_open and open_match:
-                    mp = open_match
-                elif women_match:
-                    mp = women_match
-                else:
-                    mp = matched_players[0]
-            else:
-                mp = matched_players[0]
-            return mp['elo_rating'], mp['name']
+            # found in both => default to Women, unless wants_open
+            mp = pick_division_record(matched_players, wants_open)
+            return mp, mp['elo_rating'], mp['name']
         else:
             # no ID match => treat as direct rating
-            return as_int, f"Direct RGX {as_int}"
+            return None, as_int, f"Direct RGX {as_int}"
     except ValueError:
-        # not numeric => fuzzy name
+        # not numeric => name
         pass
 
-    # Step 4) fuzzy name
-    all_names = [p['name'] for p in all_players]
-    best_match_tuple = process.extractOne(sanitized, all_names)
-    if not best_match_tuple:
-        raise ValueError(f"No player found matching '{identifier}'")
-    best_match, score = best_match_tuple
-
-    matched_records = [p for p in all_players if p['name'] == best_match]
+    # Step 4) exact or fuzzy name
+    matched_records, _ = match_player_name(sanitized, snapshot)
     if not matched_records:
         raise ValueError(f"No player found matching '{identifier}'")
 
-    if len(matched_records) > 1:
-        # found in both divisions
-        women_match = next((p for p in matched_records if p['division'].lower() == 'women'), None)
-        open_match = next((p for p in matched_records if p['division'].lower() == 'open'), None)
-        if wants_open and open_match:
-            mp = open_match
-        elif women_match:
-            mp = women_match
-        else:
-            mp = matched_records[0]
-    else:
-        mp = matched_records[0]
+    mp = pick_division_record(matched_records, wants_open)
+    return mp, mp['elo_rating'], mp['name']
+
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if profiler.enabled:
+        rule = request.url_rule.rule if request.url_rule else 'unmatched'
+        g.request_profile = profiler.start_request(f'{request.method} {rule}')
+
+
+def rejection_response(rejected):
+    """429/503 answer for an admission.Rejected."""
+    response = jsonify({'error': str(rejected)})
+    response.status_code = rejected.status
+    response.headers['Retry-After'] = str(rejected.retry_after)
+    return response
 
-    return mp['elo_rating'], mp['name']
 
+def admit(environ, endpoint):
+    """
+    Apply the per-client request rate and the request gate to a request for
+    `endpoint`. Raises admission.Rejected; returns True if the request took
+    a gate slot, which must then be given back with request_gate.leave().
+    """
+    request_rate_limiter.take(admission.client_key(environ, CLIENT_IP_HEADER))
+    if request_gate.enabled and endpoint not in STREAMING_ENDPOINTS:
+        request_gate.enter(ENDPOINT_PRIORITY.get(endpoint, 0))
+        return True
+    return False
+
+
+@app.before_request
+def admit_request():
+    if request.endpoint in UNGATED_ENDPOINTS:
+        return None
+    admitted = request.environ.get(ADMITTED_ENVIRON)
+    if isinstance(admitted, admission.Rejected):
+        return rejection_response(admitted)
+    if admitted:
+        # Admitted (and its gate slot held) by the ASGI app
+        return None
+    try:
+        g.admitted = admit(request.environ, request.endpoint)
+    except admission.Rejected as e:
+        return rejection_response(e)
+    return None
+
+
+@app.teardown_request
+def leave_request_gate(exc):
+    # Streamed responses keep their slot until the stream ends
+    if g.pop('admitted', False):
+        request_gate.leave()
+
+
+def fetch_history_admitted(player_id, ranking_id):
+    """fetch_history() within the global limit on concurrent upstream fetches."""
+    with upstream_limit:
+        return fetch_history(player_id, ranking_id)
+
+
+async def fetch_history_admitted_async(player_id, ranking_id):
+    """fetch_history_async() within the same limit, for the ASGI app."""
+    async with upstream_limit:
+        return await fetch_history_async(player_id, ranking_id)
+
+
+# Registered before add_snapshot_generation, so it runs after it
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        metrics.REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            request.url_rule.rule if request.url_rule else 'unmatched',
+            request.method,
+            str(response.status_code)
+        )
+    profile = g.pop('request_profile', None)
+    if profile is not None:
+        profiler.end_request(profile)
+    return response
+
+
+@app.after_request
+def add_snapshot_generation(response):
+    """Tag every response with the generation of the loaded player snapshot."""
+    snapshot = player_store.current
+    if snapshot is not None:
+        response.headers['X-Snapshot-Generation'] = str(snapshot.generation)
+    return response
+
+
+def normalize_elo_query(player_query):
+    """/elo accepts 'first_last' and 'first-last' for 'first last'."""
+    return player_query.replace('_', ' ').replace('-', ' ')
 
 
 @app.before_request
@@ -160,8 +419,7 @@ def handle_elo_query_spacing():
     if request.endpoint == 'get_elo_rating':
         player_query = request.view_args.get('player_query')
         if player_query:
-            modified_query = player_query.replace('_', ' ').replace('-', ' ')
-            request.view_args['player_query'] = modified_query
+            request.view_args['player_query'] = normalize_elo_query(player_query)
 
 # ----------------------------------------------------------------------------
 # /elo/<player_query>
@@ -172,36 +430,11 @@ def get_elo_rating(player_query):
     GET /elo/<player_query>
     Returns ELO info for a player by ID or name, using get_matched_player logic.
     """
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    men_path = os.path.join(current_dir, 'men_players.json')
-    women_path = os.path.join(current_dir, 'women_players.json')
-
     try:
-        with open(men_path, 'r', encoding='utf-8') as f:
-            men_data = json.load(f)
-        with open(women_path, 'r', encoding='utf-8') as f:
-            women_data = json.load(f)
-
-        all_players = men_data + women_data
+        snapshot = player_store.get_snapshot()
 
-        matched_player, fuzzy_score, exact_match = get_matched_player(player_query, all_players)
-
-        response_data = {
-            'name': matched_player['name'],
-            'player_id': matched_player['player_id'],
-            'rank': matched_player['rank'],
-            'club': matched_player['club'],
-            'city': matched_player['city'],
-            'games': matched_player['games'],
-            'elo_rating': matched_player['elo_rating'],
-            'division': matched_player['division'],
-            'trend_90_days': matched_player['trend_90_days'],
-            'pro_status': matched_player['pro_status'],
-            'exists_in_both_divisions': matched_player.get('exists_in_both_divisions', False),
-            'match_score': fuzzy_score,
-            'exact_match': exact_match
-        }
-        return jsonify(response_data)
+        matched_player, fuzzy_score, exact_match = get_matched_player(player_query, snapshot)
+        return jsonify(elo_response(matched_player, fuzzy_score, exact_match))
 
     except ValueError as e:
         return jsonify({'error': str(e)}), 404
@@ -213,6 +446,96 @@ def get_elo_rating(player_query):
         return jsonify({'error': str(e)}), 500
 
 
+def elo_response(matched_player, fuzzy_score, exact_match):
+    """The /elo body for a get_matched_player() result."""
+    return {
+        'name': matched_player['name'],
+        'player_id': matched_player['player_id'],
+        'rank': matched_player['rank'],
+        'club': matched_player['club'],
+        'city': matched_player['city'],
+        'games': matched_player['games'],
+        'elo_rating': matched_player['elo_rating'],
+        'division': matched_player['division'],
+        'trend_90_days': matched_player['trend_90_days'],
+        'pro_status': matched_player['pro_status'],
+        'exists_in_both_divisions': matched_player.get('exists_in_both_divisions', False),
+        'match_score': fuzzy_score,
+        'exact_match': exact_match
+    }
+
+
+# ----------------------------------------------------------------------------
+# /elo/batch
+# ----------------------------------------------------------------------------
+def player_lookup_key(player_query):
+    """
+    Key shared by all queries get_matched_player() resolves identically:
+    the same ID, or the same normalized name with the same division hint.
+    """
+    query = player_query.strip()
+    try:
+        int(query)
+        # Unknown IDs fall back to matching the digits as a name, so keep the spelling
+        return ('id', query)
+    except ValueError:
+        pass
+    wants_open = query.endswith('(o)') or query.endswith('(1)')
+    name = query[:-4].strip() if wants_open else query
+    return ('name', normalize_name(name), wants_open)
+
+
+@app.route('/elo/batch', methods=['POST'])
+def get_elo_ratings_batch():
+    """
+    Many /elo lookups in one request.
+
+    POST { "players": ["265", "paul_siemer", "Jane Doe (o)", 190, ...] }
+
+    Identifiers are normalized like /elo/<player_query> and every distinct
+    player is resolved once, however often and in whatever spelling it is
+    asked for. Returns { "results": [...], "unique": n } with one entry per
+    identifier in request order: {"query": ..., ...the /elo response...}, or
+    {"query": ..., "error": ..., "status": 404} where /elo would fail.
+    """
+    data = request.get_json(silent=True)
+    queries = data.get('players') if isinstance(data, dict) else data
+    if not isinstance(queries, list) or not queries:
+        return jsonify({'error': "Provide a non-empty 'players' list."}), 400
+    if len(queries) > ELO_BATCH_LIMIT:
+        return jsonify({'error': f'At most {ELO_BATCH_LIMIT} players per request.'}), 413
+
+    try:
+        snapshot = player_store.get_snapshot()
+    except FileNotFoundError as e:
+        return jsonify({'error': f'Players data file not found: {str(e)}'}), 500
+    except json.JSONDecodeError:
+        return jsonify({'error': 'Error reading players data'}), 500
+
+    resolved = {}  # lookup key => (query, get_matched_player() result or ValueError)
+    results = []
+    for query in queries:
+        if isinstance(query, bool) or not isinstance(query, (str, int)):
+            results.append({'query': query, 'error': 'Identifiers must be strings or numbers.', 'status': 400})
+            continue
+        player_query = normalize_elo_query(str(query))
+        key = player_lookup_key(player_query)
+        first_query, outcome = resolved.get(key, (None, None))
+        if outcome is None or (isinstance(outcome, ValueError) and first_query != player_query):
+            # Misses are reported in the wording of each query, as /elo does
+            try:
+                outcome = get_matched_player(player_query, snapshot)
+            except ValueError as e:
+                outcome = e
+            resolved.setdefault(key, (player_query, outcome))
+        if isinstance(outcome, ValueError):
+            results.append({'query': query, 'error': str(outcome), 'status': 404})
+        else:
+            results.append({'query': query, **elo_response(*outcome)})
+
+    return jsonify({'results': results, 'unique': len(resolved)})
+
+
 # ----------------------------------------------------------------------------
 # /history/<player_query>
 # ----------------------------------------------------------------------------
@@ -222,58 +545,38 @@ def get_elo_history(player_query):
     GET /history/<player_query>
     Returns the basic ELO history for a player, using a simple regex to parse
     `labels: [ ... ]` and `data: [ ... ]` from the RGX site.
+    Histories crawled by history_crawler.py are served from the local store;
+    other players are fetched live and cached per (player_id, ranking_id).
     """
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    men_path = os.path.join(current_dir, 'men_players.json')
-    women_path = os.path.join(current_dir, 'women_players.json')
-
     try:
-        with open(men_path, 'r', encoding='utf-8') as f:
-            men_data = json.load(f)
-        with open(women_path, 'r', encoding='utf-8') as f:
-            women_data = json.load(f)
-
-        all_players = men_data + women_data
+        snapshot = player_store.get_snapshot()
 
-        matched_player, fuzzy_score, exact_match = get_matched_player(player_query, all_players)
-        division = matched_player['division'].lower()
-        ranking_id = 1 if division == 'open' else 2
+        matched_player, fuzzy_score, exact_match = get_matched_player(player_query, snapshot)
+        ranking_id = ranking_id_for(matched_player['division'])
         player_id = matched_player['player_id']
 
-        url = f"https://playerzone.roundnetgermany.de/ranking/rg-rating/history?player_id={player_id}&ranking_id={ranking_id}"
-        headers = {
-            'User-Agent': (
-                'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                'AppleWebKit/537.36 (KHTML, like Gecko) '
-                'Chrome/91.0.4472.124 Safari/537.36'
-            )
-        }
-        resp = requests.get(url, headers=headers)
-        if resp.status_code != 200:
-            return jsonify({'error': f'Failed to load page. HTTP {resp.status_code}'}), 500
-
-        # Simple regex to parse
-        match_chart = re.search(r'labels:\s*\[(.*?)\].*?data:\s*\[(.*?)\]', resp.text, re.DOTALL)
-        if not match_chart:
-            return jsonify({'error': 'Failed to parse chart arrays with the simple regex'}), 500
-
-        labels_raw = match_chart.group(1).strip()
-        data_raw = match_chart.group(2).strip()
-
-        # Convert them to lists
-        dates = [date.strip().strip("'").strip('"') for date in labels_raw.split(',')]
-        ratings = []
-        for rating_str in data_raw.split(','):
-            rating_str = rating_str.strip().strip("'").strip('"')
+        history_list = history_store.get(player_id, ranking_id)
+        if history_list is None:
+            if HISTORY_OFFLINE:
+                return jsonify({'error': f'No stored history for player {player_id}'}), 404
+            key = (player_id, ranking_id)
+            prefetched = request.environ.get(HISTORY_PREFETCH_ENVIRON)
             try:
-                rating_val = int(rating_str)
-                ratings.append(rating_val)
-            except ValueError:
-                ratings.append(None)
-
-        history_list = []
-        for d, r in zip(dates, ratings):
-            history_list.append({'date': d, 'points': r})
+                if prefetched is not None and prefetched[0] == key:
+                    # Already fetched without blocking (or refused) by the ASGI app
+                    key, history_list, error = prefetched
+                    if error is not None:
+                        raise error
+                else:
+                    if not history_cache.cached(key):
+                        upstream_rate_limiter.take(admission.client_key(request.environ, CLIENT_IP_HEADER))
+                    history_list = history_cache.get_or_load(
+                        key, lambda: fetch_history_admitted(player_id, ranking_id)
+                    )
+            except admission.Rejected as e:
+                return rejection_response(e)
+            except HistoryError as e:
+                return jsonify({'error': str(e)}), 500
 
         return jsonify({
             'name': matched_player['name'],
@@ -294,6 +597,129 @@ def get_elo_history(player_query):
         return jsonify({'error': str(e)}), 500
 
 
+def history_fetch_key(player_query):
+    """
+    The (player_id, ranking_id) whose history GET /history/<player_query>
+    would fetch from playerzone, or None if it would not go upstream
+    (unknown player, stored history, offline mode). asgi_app.py uses this to
+    fetch the page without blocking and hands the result in through
+    HISTORY_PREFETCH_ENVIRON.
+    """
+    if HISTORY_OFFLINE:
+        return None
+    try:
+        snapshot = player_store.get_snapshot()
+        matched_player, _, _ = get_matched_player(player_query, snapshot)
+    except (ValueError, OSError):
+        return None
+    ranking_id = ranking_id_for(matched_player['division'])
+    if history_store.get(matched_player['player_id'], ranking_id) is not None:
+        return None
+    return matched_player['player_id'], ranking_id
+
+
+# ----------------------------------------------------------------------------
+# /rank-history, /leaderboard, /movers - answered from the scrape time series
+# ----------------------------------------------------------------------------
+def _moment_arg(name, default=None, end_of_day=True):
+    value = request.args.get(name)
+    return default if not value else parse_moment(value, name, end_of_day)
+
+
+def _bounded_int_arg(name, default, maximum):
+    value = request.args.get(name)
+    if not value:
+        return default
+    try:
+        return max(0 if name == 'offset' else 1, min(int(value), maximum))
+    except ValueError:
+        raise TimeSeriesError(f"'{name}' must be an integer.")
+
+
+@app.route('/rank-history/<player_query>', methods=['GET'])
+def get_rank_history(player_query):
+    """
+    GET /rank-history/<player_query>?from=<date>&to=<date>
+    Rank, rating and games of a player at every recorded scrape, oldest first.
+    Dates are ISO dates (YYYY-MM-DD, inclusive) or date-times.
+    """
+    try:
+        snapshot = player_store.get_snapshot()
+        matched_player, fuzzy_score, exact_match = get_matched_player(player_query, snapshot)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        return jsonify({'error': f'Failed to load player data: {str(e)}'}), 500
+
+    try:
+        series = timeseries_store.player_series(
+            matched_player['player_id'], matched_player['division'],
+            _moment_arg('from', end_of_day=False), _moment_arg('to')
+        )
+    except TimeSeriesError as e:
+        return jsonify({'error': str(e)}), 400
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+
+    return jsonify({
+        'name': matched_player['name'],
+        'player_id': matched_player['player_id'],
+        'division': matched_player['division'],
+        'series': series,
+        'match_score': fuzzy_score,
+        'exact_match': exact_match
+    })
+
+
+@app.route('/leaderboard', methods=['GET'])
+def get_leaderboard():
+    """
+    GET /leaderboard?date=<date>&division=<open|women>&limit=&offset=
+    The ranking as recorded by the last scrape on or before `date`
+    (default: the latest scrape). Division defaults to open.
+    """
+    try:
+        board = timeseries_store.leaderboard(
+            _moment_arg('date', float('inf')),
+            request.args.get('division', 'open'),
+            _bounded_int_arg('limit', 100, 1000),
+            _bounded_int_arg('offset', 0, 10 ** 9)
+        )
+    except TimeSeriesError as e:
+        return jsonify({'error': str(e)}), 400
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    if board is None:
+        return jsonify({'error': 'No scrape recorded on or before that date.'}), 404
+    return jsonify(board)
+
+
+@app.route('/movers', methods=['GET'])
+def get_movers():
+    """
+    GET /movers?from=<date>&to=<date>&division=<open|women>&by=<rank|elo_rating>&limit=<n>
+    Biggest risers and fallers between the scrapes as of `from` and `to`
+    (default: the latest scrape), among players ranked in both.
+    """
+    if not request.args.get('from'):
+        return jsonify({'error': "No 'from' date provided."}), 400
+    try:
+        movers = timeseries_store.movers(
+            _moment_arg('from'),
+            _moment_arg('to', float('inf')),
+            request.args.get('division', 'open'),
+            request.args.get('by', 'rank'),
+            _bounded_int_arg('limit', 10, 100)
+        )
+    except TimeSeriesError as e:
+        return jsonify({'error': str(e)}), 400
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    if movers is None:
+        return jsonify({'error': "No scrape recorded on or before the 'from' date."}), 404
+    return jsonify(movers)
+
+
 # ----------------------------------------------------------------------------
 # /players
 # ----------------------------------------------------------------------------
@@ -302,18 +728,25 @@ def get_all_players():
     """
     GET /players
     Returns all players from men_players.json + women_players.json
-    """
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    men_path = os.path.join(current_dir, 'men_players.json')
-    women_path = os.path.join(current_dir, 'women_players.json')
 
+    The body is serialized once per snapshot and served with a strong ETag
+    and Last-Modified (304 on a match), gzip/brotli encoded on request.
+
+    With any query parameter (division, club, city, pro_status, min_rank,
+    max_rank, min_elo, max_elo, sort, fields, limit, offset, cursor) a page
+    of matching players is returned instead:
+      { "total", "offset", "limit", "next_cursor", "generation", "players" }
+    """
     try:
-        with open(men_path, 'r', encoding='utf-8') as f:
-            men_data = json.load(f)
-        with open(women_path, 'r', encoding='utf-8') as f:
-            women_data = json.load(f)
+        snapshot = player_store.get_snapshot()
+        if any(param in request.args for param in QUERY_PARAMS):
+            try:
+                return jsonify(query_players(snapshot, request.args))
+            except QueryError as e:
+                return jsonify({'error': str(e)}), 400
 
-        return jsonify(men_data + women_data)
+        cached = snapshot.memo('players', lambda: cached_json_body(list(snapshot.players), snapshot.last_modified))
+        return cached_response(cached)
 
     except FileNotFoundError as e:
         return jsonify({'error': f'Players data file not found: {str(e)}'}), 500
@@ -323,6 +756,139 @@ def get_all_players():
         return jsonify({'error': str(e)}), 500
 
 
+# ----------------------------------------------------------------------------
+# /clubs, /cities, /trends - aggregates materialized per snapshot
+# ----------------------------------------------------------------------------
+def _group_list(field):
+    try:
+        snapshot = player_store.get_snapshot()
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        return jsonify({'error': f'Failed to load player data: {str(e)}'}), 500
+    try:
+        return jsonify(query_groups(snapshot, field, request.args))
+    except QueryError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+def _group_detail(field, name):
+    try:
+        snapshot = player_store.get_snapshot()
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        return jsonify({'error': f'Failed to load player data: {str(e)}'}), 500
+    detail = group_detail(snapshot, field, name)
+    if detail is None:
+        return jsonify({'error': f"No {field} named '{name}'"}), 404
+    return jsonify(detail)
+
+
+@app.route('/clubs', methods=['GET'])
+def list_clubs():
+    """
+    GET /clubs?division=<open|women>&sort=<players|average_elo|pro_players|name>&limit=&offset=
+    Per club: players, pro players, average RGX and 90-day trend, per-division
+    figures and the top players. Sort defaults to '-players'.
+    """
+    return _group_list('club')
+
+
+@app.route('/clubs/<path:club>', methods=['GET'])
+def get_club(club):
+    """GET /clubs/<club> - the club summary plus all members, highest rating first."""
+    return _group_detail('club', club)
+
+
+@app.route('/cities', methods=['GET'])
+def list_cities():
+    """GET /cities - like /clubs, grouped by city."""
+    return _group_list('city')
+
+
+@app.route('/cities/<path:city>', methods=['GET'])
+def get_city(city):
+    """GET /cities/<city> - the city summary plus all players, highest rating first."""
+    return _group_detail('city', city)
+
+
+@app.route('/trends', methods=['GET'])
+def get_trends():
+    """
+    GET /trends?division=<open|women>&limit=<n>
+    The players with the biggest 90-day rating gains and losses per division.
+    """
+    try:
+        snapshot = player_store.get_snapshot()
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        return jsonify({'error': f'Failed to load player data: {str(e)}'}), 500
+    try:
+        return jsonify(query_trends(snapshot, request.args))
+    except QueryError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+# ----------------------------------------------------------------------------
+# /search
+# ----------------------------------------------------------------------------
+@app.route('/search', methods=['GET'])
+def search_players():
+    """
+    GET /search?q=<text>&limit=<n>&division=<open|women>
+    Autocomplete suggestions: prefix matches on name, name parts and ID first,
+    then typo-tolerant fuzzy matches to fill up to `limit` results.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': "No 'q' query parameter provided."}), 400
+
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        return jsonify({'error': "'limit' must be an integer."}), 400
+    limit = max(1, min(limit, 50))
+    division = request.args.get('division') or None
+
+    try:
+        snapshot = player_store.get_snapshot()
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        return jsonify({'error': f'Failed to load player data: {str(e)}'}), 500
+
+    results = []
+    seen = set()
+    for player in snapshot.suggest_index.prefix(query, limit, division):
+        seen.add((player['player_id'], player['division']))
+        results.append(_suggestion(player, 'prefix', None))
+
+    if len(results) < limit:
+        for name, score in snapshot.search_index.extract(query, limit * 2):
+            for player in snapshot.find_by_matched_name(name):
+                key = (player['player_id'], player['division'])
+                if key in seen:
+                    continue
+                if division and player['division'].lower() != division.lower():
+                    continue
+                seen.add(key)
+                results.append(_suggestion(player, 'fuzzy', score))
+            if len(results) >= limit:
+                break
+
+    return jsonify({
+        'query': query,
+        'results': results[:limit]
+    })
+
+
+def _suggestion(player, match_type, score):
+    return {
+        'name': player['name'],
+        'player_id': player['player_id'],
+        'division': player['division'],
+        'club': player['club'],
+        'rank': player['rank'],
+        'elo_rating': player['elo_rating'],
+        'match': match_type,
+        'match_score': score
+    }
+
+
 # ----------------------------------------------------------------------------
 # /match
 # ----------------------------------------------------------------------------
@@ -341,53 +907,11 @@ def calculate_match_outcome():
       3) Provide descriptive text for each (b, p) combination.
       4) JSON structure includes team1_players, team2_players, sums, combos, etc.
     """
-    # Constants for formula
-    d = 550
-    k = 50
-
-    # We'll define the sets of (b, p) we actually use:
-    # - b=1.0 => p in [0, 0.25, 0.33, 0.4, 0.5, 0.6, 0.67, 0.75, 1]
-    # - b=0.75 => p in [0, 1]
-    combos_b_p = [
-        (1.0, 0), (1.0, 0.25), (1.0, 0.33), (1.0, 0.4), (1.0, 0.5),
-        (1.0, 0.6), (1.0, 0.67), (1.0, 0.75), (1.0, 1),
-        (0.75, 0), (0.75, 1)
-    ]
-
-    # Descriptive text for b
-    desc_for_b = {
-        0.75: "One-set match",
-        1.0: "Best-of-3 or Best-of-5 match"
-    }
-    # Descriptive text for p in a 1-satzspiel
-    desc_for_p_b_075 = {
-        0: "Team1 lost 0:1 in a 1-set match",
-        1: "Team1 won 1:0 in a 1-set match"
-    }
-    # Descriptive text for p in Best-of-3/5
-    desc_for_p_b_1 = {
-        0:    "Team1 lost 0:1, 0:2, or 0:3",
-        0.25: "Team1 lost 1:3",
-        0.33: "Team1 lost 1:2",
-        0.4:  "-",
-        0.5:  "1:1 or 2:2",
-        0.6:  "Team1 won 3:2",
-        0.67: "Team1 won 2:1",
-        0.75: "Team1 won 3:1",
-        1:    "Team1 won 1:0, 2:0, or 3:0"
-    }
-
+    # Formula constants, the (b, p) combinations and their descriptions
+    # live in rgx.py (shared with /match/batch).
     # Load player data
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    men_path = os.path.join(current_dir, 'men_players.json')
-    women_path = os.path.join(current_dir, 'women_players.json')
-
     try:
-        with open(men_path, 'r', encoding='utf-8') as f:
-            men_data = json.load(f)
-        with open(women_path, 'r', encoding='utf-8') as f:
-            women_data = json.load(f)
-        all_players = men_data + women_data
+        snapshot = player_store.get_snapshot()
     except (FileNotFoundError, json.JSONDecodeError) as e:
         return jsonify({"error": f"Failed to load player data: {str(e)}"}), 500
 
@@ -422,10 +946,10 @@ def calculate_match_outcome():
 
     # Resolve each player: (rating, name)
     try:
-        t1p1_rating, t1p1_name = resolve_player_info(team1_identifiers[0], all_players)
-        t1p2_rating, t1p2_name = resolve_player_info(team1_identifiers[1], all_players)
-        t2p1_rating, t2p1_name = resolve_player_info(team2_identifiers[0], all_players)
-        t2p2_rating, t2p2_name = resolve_player_info(team2_identifiers[1], all_players)
+        t1p1_rating, t1p1_name = resolve_player_info(team1_identifiers[0], snapshot)
+        t1p2_rating, t1p2_name = resolve_player_info(team1_identifiers[1], snapshot)
+        t2p1_rating, t2p1_name = resolve_player_info(team2_identifiers[0], snapshot)
+        t2p2_rating, t2p2_name = resolve_player_info(team2_identifiers[1], snapshot)
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
 
@@ -433,29 +957,7 @@ def calculate_match_outcome():
     r2 = t2p1_rating + t2p2_rating
 
     # Build combination results
-    results = []
-    for (b_val, p_val) in combos_b_p:
-        e1 = 1.0 / (1 + 10 ** ((r2 - r1) / d))
-        x1 = b_val * k * (p_val - e1)
-
-        if b_val == 0.75:
-            # 1-set
-            match_type = desc_for_b[b_val]
-            outcome_desc = desc_for_p_b_075.get(p_val, "Invalid p for 1-set match")
-        else:
-            # b=1
-            match_type = desc_for_b[b_val]
-            outcome_desc = desc_for_p_b_1.get(p_val, f"p={p_val} not recognized")
-
-        full_desc = f"{match_type}; {outcome_desc}"
-
-        results.append({
-            "b": b_val,
-            "p": p_val,
-            "e1": round(e1, 4),
-            "x1": round(x1, 4),
-            "description": full_desc
-        })
+    results = rgx.combination_results(r1, r2)
 
     # Construct response
     response_data = {
@@ -474,6 +976,598 @@ def calculate_match_outcome():
     return jsonify(response_data)
 
 
+# ----------------------------------------------------------------------------
+# /match/batch
+# ----------------------------------------------------------------------------
+def _parse_pairing(item):
+    """
+    One /match/batch pairing => (team1_identifiers, team2_identifiers).
+    Accepts {"team1": [a, b], "team2": [c, d]} or "a,b vs c,d".
+    """
+    if isinstance(item, str):
+        split_vs = re.split(r'\s*vs\s*', item, flags=re.IGNORECASE)
+        if len(split_vs) != 2:
+            raise ValueError("Invalid pairing format. Use 'player1,player2 vs player3,player4'.")
+        teams = [[p.strip() for p in team.split(',') if p.strip()] for team in split_vs]
+    elif isinstance(item, dict):
+        teams = [item.get("team1"), item.get("team2")]
+    else:
+        raise ValueError("A pairing must be an object with team1/team2 or a 'a,b vs c,d' string.")
+
+    for name, team in zip(("team1", "team2"), teams):
+        if not (isinstance(team, list) and len(team) == 2):
+            raise ValueError(f"{name} must be a list of two player identifiers.")
+        if not all(isinstance(i, (str, int)) and not isinstance(i, bool) for i in team):
+            raise ValueError(f"{name} identifiers must be strings or numbers.")
+    return [str(i) for i in teams[0]], [str(i) for i in teams[1]]
+
+
+@app.route('/match/batch', methods=['POST'])
+def calculate_match_batch():
+    """
+    Many /match calculations in one request.
+
+    POST { "pairings": [ {"team1": ["265","Jane Doe"], "team2": ["(1972)","190"]},
+                         "player1,player2 vs player3,player4", ... ] }
+
+    Every distinct identifier is resolved once, and the expected scores and
+    gains of all pairings are computed as arrays (see rgx.batch_outcomes).
+    The response is streamed as JSON lines (application/x-ndjson), one line per
+    pairing in request order: {"index": i, ...the /match response...}, or
+    {"index": i, "error": "..."} if that pairing could not be resolved.
+    """
+    data = request.get_json(silent=True)
+    pairings = data.get("pairings") if isinstance(data, dict) else data
+    if not isinstance(pairings, list) or not pairings:
+        return jsonify({"error": "Provide a non-empty 'pairings' list."}), 400
+    if len(pairings) > MATCH_BATCH_LIMIT:
+        return jsonify({"error": f"At most {MATCH_BATCH_LIMIT} pairings per request."}), 413
+
+    try:
+        snapshot = player_store.get_snapshot()
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        return jsonify({"error": f"Failed to load player data: {str(e)}"}), 500
+
+    parsed = []
+    resolved = {}  # identifier => (rating, name) or ValueError
+    for item in pairings:
+        try:
+            teams = _parse_pairing(item)
+        except ValueError as e:
+            parsed.append(e)
+            continue
+        for identifier in teams[0] + teams[1]:
+            if identifier not in resolved:
+                try:
+                    resolved[identifier] = resolve_player_info(identifier, snapshot)
+                except ValueError as e:
+                    resolved[identifier] = e
+        parsed.append(teams)
+
+    # Team rating sums of the resolvable pairings, computed in one go
+    valid = []
+    for index, teams in enumerate(parsed):
+        if isinstance(teams, ValueError):
+            continue
+        infos = [resolved[i] for i in teams[0] + teams[1]]
+        error = next((info for info in infos if isinstance(info, ValueError)), None)
+        if error is None:
+            valid.append(index)
+        else:
+            parsed[index] = error
+    r1 = [sum(resolved[i][0] for i in parsed[index][0]) for index in valid]
+    r2 = [sum(resolved[i][0] for i in parsed[index][1]) for index in valid]
+    e1, x1 = rgx.batch_outcomes(r1, r2)
+    outcome_of = {index: position for position, index in enumerate(valid)}
+    dumps = app.json.dumps
+
+    def line(index):
+        teams = parsed[index]
+        if isinstance(teams, ValueError):
+            return dumps({"index": index, "error": str(teams)})
+        position = outcome_of[index]
+        e = round(float(e1[position]), 4)
+        gains = x1[position]
+        return dumps({
+            "index": index,
+            "team1_players": [
+                {"identifier": i, "resolved_name": resolved[i][1]} for i in teams[0]
+            ],
+            "team2_players": [
+                {"identifier": i, "resolved_name": resolved[i][1]} for i in teams[1]
+            ],
+            "team1_rating": r1[position],
+            "team2_rating": r2[position],
+            "combinations": [
+                {"b": b_val, "p": p_val, "e1": e, "x1": round(float(gains[j]), 4), "description": description}
+                for j, ((b_val, p_val), description) in enumerate(zip(rgx.COMBOS_B_P, rgx.COMBO_DESCRIPTIONS))
+            ]
+        })
+
+    def generate():
+        # Lines are sent in chunks so large batches don't cost one write per pairing
+        chunk = []
+        for index in range(len(parsed)):
+            chunk.append(line(index))
+            if len(chunk) == 256:
+                yield "\n".join(chunk) + "\n"
+                chunk = []
+        if chunk:
+            yield "\n".join(chunk) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+# ----------------------------------------------------------------------------
+# /tournament/simulate
+# ----------------------------------------------------------------------------
+@app.route('/tournament/simulate', methods=['POST'])
+def simulate_tournament():
+    """
+    Monte Carlo simulation of a tournament (see tournament.py).
+
+    POST {
+      "format": "pool" | "single" | "double",
+      "teams": [ {"name": "Team A", "players": ["265", "Jane Doe"]}, ["190", "(1650)"], ... ],
+      "simulations": 10000,       (optional, at most PLAYERZONE_TOURNAMENT_MAX_SIMULATIONS)
+      "b": 1.0,                   (optional, 0.75 for one-set games)
+      "seeding": "rating",        (optional, "rating" or "given" = order of "teams")
+      "seed": 42                  (optional, random seed for reproducible results)
+    }
+
+    Returns per team its placement probabilities, expected place and the
+    projected RGX change of each of its players (mean, std, 5th/50th/95th
+    percentile over all simulations).
+    """
+    if tournament is None:
+        return jsonify({"error": "Tournament simulation requires numpy on the server."}), 501
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "No JSON body provided."}), 400
+
+    fmt = data.get("format", "single")
+    teams = data.get("teams")
+    simulations = data.get("simulations", 10000)
+    b_val = data.get("b", 1.0)
+    seeding = data.get("seeding", "rating")
+    if not isinstance(teams, list):
+        return jsonify({"error": "'teams' must be a list of teams."}), 400
+    if (not isinstance(simulations, int) or isinstance(simulations, bool)
+            or not 1 <= simulations <= TOURNAMENT_MAX_SIMULATIONS):
+        return jsonify({"error": f"'simulations' must be between 1 and {TOURNAMENT_MAX_SIMULATIONS}."}), 400
+    if isinstance(b_val, bool):
+        return jsonify({"error": "'b' must be a number."}), 400
+    if seeding not in ("rating", "given"):
+        return jsonify({"error": "'seeding' must be 'rating' or 'given'."}), 400
+    seed = data.get("seed")
+    if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool) or seed < 0):
+        return jsonify({"error": "'seed' must be a non-negative integer."}), 400
+
+    try:
+        snapshot = player_store.get_snapshot()
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        return jsonify({"error": f"Failed to load player data: {str(e)}"}), 500
+
+    resolved = {}
+    team_entries = []
+    for position, team in enumerate(teams):
+        name, identifiers = f"Team {position + 1}", team
+        if isinstance(team, dict):
+            name, identifiers = team.get("name") or name, team.get("players")
+            if not isinstance(name, str):
+                return jsonify({"error": f"Team {position + 1}: 'name' must be a string."}), 400
+        if not (isinstance(identifiers, list) and len(identifiers) == 2
+                and all(isinstance(i, (str, int)) and not isinstance(i, bool) for i in identifiers)):
+            return jsonify({"error": f"{name} must have a list of two player identifiers."}), 400
+
+        players = []
+        for identifier in map(str, identifiers):
+            try:
+                if identifier not in resolved:
+                    resolved[identifier] = resolve_player_info(identifier, snapshot)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            rating, resolved_name = resolved[identifier]
+            players.append({"identifier": identifier, "resolved_name": resolved_name, "rating": rating})
+        team_entries.append({"name": name, "players": players,
+                             "rating": sum(p["rating"] for p in players)})
+
+    try:
+        results = tournament.simulate(
+            [team["rating"] for team in team_entries],
+            fmt=fmt,
+            simulations=simulations,
+            b=b_val,
+            seed=seed,
+            seeding=list(range(len(team_entries))) if seeding == "given" else None
+        )
+    except tournament.TournamentError as e:
+        return jsonify({"error": str(e)}), 400
+
+    for team, result in zip(team_entries, results):
+        team["seed"] = result["seed"]
+        team["placement_probabilities"] = result["placement_probabilities"]
+        team["expected_place"] = result["expected_place"]
+        # Both players of a team gain or lose the team's rating change
+        for player in team["players"]:
+            player["projected_rgx_change"] = result["rgx_change"]
+
+    return jsonify({
+        "format": fmt,
+        "simulations": simulations,
+        "b": b_val,
+        "teams": team_entries
+    })
+
+
+# ----------------------------------------------------------------------------
+# /matchmaking
+# ----------------------------------------------------------------------------
+@app.route('/matchmaking', methods=['POST'])
+def suggest_matchmaking():
+    """
+    Split a pool of players into balanced 2v2 games (see matchmaking.py).
+
+    POST {
+      "players": ["265", "Jane Doe", "(1650)", ...],
+      "time_limit_ms": 200        (optional, at most PLAYERZONE_MATCHMAKING_MAX_TIME_MS)
+    }
+
+    Every game lists its two teams, their summed ratings, the difference
+    r1 - r2 and e1 as in /match; games are ordered most balanced first.
+    With a player count that is not a multiple of four, the players left
+    over are listed in "sitting_out".
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "No JSON body provided."}), 400
+
+    identifiers = data.get("players")
+    time_limit_ms = data.get("time_limit_ms", 200)
+    if not (isinstance(identifiers, list)
+            and all(isinstance(i, (str, int)) and not isinstance(i, bool) for i in identifiers)):
+        return jsonify({"error": "'players' must be a list of player identifiers."}), 400
+    if not 4 <= len(identifiers) <= MATCHMAKING_MAX_PLAYERS:
+        return jsonify({"error": f"'players' must list between 4 and {MATCHMAKING_MAX_PLAYERS} players."}), 400
+    if (not isinstance(time_limit_ms, int) or isinstance(time_limit_ms, bool)
+            or not 1 <= time_limit_ms <= MATCHMAKING_MAX_TIME_MS):
+        return jsonify({"error": f"'time_limit_ms' must be between 1 and {MATCHMAKING_MAX_TIME_MS}."}), 400
+
+    try:
+        snapshot = player_store.get_snapshot()
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        return jsonify({"error": f"Failed to load player data: {str(e)}"}), 500
+
+    identifiers = [str(i) for i in identifiers]
+    if len(set(identifiers)) != len(identifiers):
+        return jsonify({"error": "'players' must not list a player twice."}), 400
+
+    players = []
+    seen_ids = set()
+    for identifier in identifiers:
+        try:
+            record, rating, resolved_name = resolve_player_record(identifier, snapshot)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        # "265" and that player's name are the same player
+        if record is not None:
+            if record["player_id"] in seen_ids:
+                return jsonify({"error": f"'players' lists {resolved_name} twice."}), 400
+            seen_ids.add(record["player_id"])
+        players.append({"identifier": identifier, "resolved_name": resolved_name, "rating": rating})
+
+    started = time.monotonic()
+    result = matchmaking.suggest_games([p["rating"] for p in players], time_limit=time_limit_ms / 1000)
+    elapsed_ms = (time.monotonic() - started) * 1000
+
+    games = []
+    for team1, team2, diff in result["games"]:
+        r1 = sum(players[i]["rating"] for i in team1)
+        r2 = sum(players[i]["rating"] for i in team2)
+        games.append({
+            "team1_players": [players[i] for i in team1],
+            "team2_players": [players[i] for i in team2],
+            "team1_rating": r1,
+            "team2_rating": r2,
+            "rating_difference": diff,
+            "e1": round(rgx.expected_score(r1, r2), 4)
+        })
+
+    return jsonify({
+        "games": games,
+        "sitting_out": [players[i] for i in result["sitting_out"]],
+        "total_rating_difference": sum(g["rating_difference"] for g in games),
+        "max_rating_difference": max((g["rating_difference"] for g in games), default=0),
+        "search": {
+            "exact": result["exact"],
+            "converged": result["converged"],
+            "passes": result["passes"],
+            "elapsed_ms": round(elapsed_ms, 1)
+        }
+    })
+
+
+# ----------------------------------------------------------------------------
+# /ratings/project
+# ----------------------------------------------------------------------------
+@app.route('/ratings/project', methods=['POST'])
+def project_ratings():
+    """
+    Ratings after a hypothetical series of games, applied in order with the
+    /match formula (see rating_engine.py). Nothing is stored.
+
+    POST { "games": [ {"team1": ["265", "Jane Doe"], "team2": ["190", "(1650)"], "b": 1.0, "p": 0.67}, ... ] }
+
+    "b" defaults to 1.0; "p" is team 1's share of the result. Returns per
+    player (in order of first appearance) its rating before and after all
+    games, the change and the number of games, and per game team 1's
+    expected score and rating change. A direct rating like "(1650)" is one
+    anonymous player per distinct identifier.
+    """
+    if rating_engine is None:
+        return jsonify({"error": "Rating projections require numpy on the server."}), 501
+
+    data = request.get_json(silent=True)
+    games = data.get("games") if isinstance(data, dict) else None
+    if not isinstance(games, list) or not games:
+        return jsonify({"error": "Provide a non-empty 'games' list."}), 400
+    if len(games) > PROJECTION_MAX_GAMES:
+        return jsonify({"error": f"At most {PROJECTION_MAX_GAMES} games per request."}), 413
+
+    try:
+        snapshot = player_store.get_snapshot()
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        return jsonify({"error": f"Failed to load player data: {str(e)}"}), 500
+
+    engine = rating_engine.RatingEngine()
+    players = {}  # engine key => response entry
+    key_of = {}   # identifier => engine key
+    encoded = []
+    for position, game in enumerate(games):
+        if not isinstance(game, dict):
+            return jsonify({"error": f"Game {position + 1} must be an object with team1, team2, b and p."}), 400
+        teams = []
+        for team_name in ("team1", "team2"):
+            team = game.get(team_name)
+            if not (isinstance(team, list) and len(team) == 2
+                    and all(isinstance(i, (str, int)) and not isinstance(i, bool) for i in team)):
+                return jsonify({"error": f"Game {position + 1}: {team_name} must be a list of two player identifiers."}), 400
+            keys = []
+            for identifier in map(str, team):
+                if identifier not in key_of:
+                    try:
+                        record, rating, resolved_name = resolve_player_record(identifier, snapshot)
+                    except ValueError as e:
+                        return jsonify({"error": str(e)}), 400
+                    key = f"{record['division'].lower()}:{record['player_id']}" if record else identifier
+                    key_of[identifier] = key
+                    if key not in players:
+                        engine.set_rating(key, rating)
+                        players[key] = {
+                            "identifier": identifier,
+                            "resolved_name": resolved_name,
+                            "player_id": record['player_id'] if record else None,
+                            "division": record['division'] if record else None,
+                        }
+                keys.append(key_of[identifier])
+            teams.append(keys)
+        encoded.append((teams[0], teams[1], game.get("b", 1.0), game.get("p")))
+
+    try:
+        projected, e1, x1 = engine.project(encoded)
+    except rating_engine.RatingEngineError as e:
+        return jsonify({"error": str(e)}), 400
+
+    for key, entry in players.items():
+        before, after, played = projected[key]
+        entry.update({
+            "rating_before": round(before, 4),
+            "rating_after": round(after, 4),
+            "change": round(after - before, 4),
+            "games": played,
+        })
+
+    return jsonify({
+        "players": list(players.values()),
+        "games": [{"e1": round(e, 4), "x1": round(x, 4)} for e, x in zip(e1.tolist(), x1.tolist())],
+    })
+
+
+# ----------------------------------------------------------------------------
+# /events
+# ----------------------------------------------------------------------------
+def close_event_subscription(subscription, wsgi=False):
+    subscription.close()
+    events_limit.release()
+    if wsgi:
+        wsgi_events_limit.release()
+
+
+@app.route('/events', methods=['GET'])
+def stream_events():
+    """
+    GET /events?player=<id>[,<id>...]&club=<club>&division=<open|women>
+    Server-sent events, one 'players' event per newly loaded snapshot with
+    the players whose rating, rank or 90-day trend changed (plus added and
+    removed players), each with its current values and deltas:
+      {"generation", "previous_generation", "loaded_at",
+       "players": [{"type", "player_id", "division", "name", "club",
+                    "elo_rating", "rank", "trend_90_days", "delta"}, ...]}
+    Filters are optional, may repeat and must all match. Events whose
+    players all fall outside the filter are skipped.
+
+    The stream opens with a 'hello' event naming the current generation.
+    Event ids are snapshot generations: reconnecting with Last-Event-ID (or
+    ?last_event_id=) replays the events since then, or sends a 'reset'
+    event if that version is no longer known. Comment lines keep idle
+    streams open every PLAYERZONE_EVENTS_HEARTBEAT seconds.
+
+    Each stream served by the WSGI app holds a worker thread for as long as
+    it is open, so at most PLAYERZONE_EVENTS_MAX_WSGI_SUBSCRIBERS are
+    accepted there; asgi_app serves many more.
+    """
+    try:
+        event_filter = EventFilter.from_args(request.args)
+        player_store.get_snapshot()
+    except EventsError as e:
+        return jsonify({'error': str(e)}), 400
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        return jsonify({'error': f'Failed to load player data: {str(e)}'}), 500
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    if last_event_id is not None:
+        try:
+            last_event_id = int(last_event_id)
+        except ValueError:
+            # Not a generation of ours: the subscription starts with 'reset'
+            pass
+    holder = request.environ.get(EVENTS_ASYNC_ENVIRON)
+    wsgi = holder is None
+    try:
+        if wsgi:
+            wsgi_events_limit.acquire()
+        try:
+            events_limit.acquire()
+        except admission.Rejected:
+            if wsgi:
+                wsgi_events_limit.release()
+            raise
+    except admission.Rejected as e:
+        return rejection_response(e)
+    subscription = change_feed.subscribe(event_filter, last_event_id)
+
+    if not wsgi:
+        holder['subscription'] = subscription
+        # Not a sequence, so no Content-Length is declared for the open stream
+        body = iter([subscription.opening()])
+    else:
+        def body():
+            yield subscription.opening()
+            while True:
+                change_feed.wait(subscription.sequence, EVENTS_HEARTBEAT)
+                yield subscription.pending() or ': keepalive\n\n'
+
+        body = body()
+
+    response = Response(body, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Don't let nginx buffer the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    if wsgi:
+        response.call_on_close(lambda: close_event_subscription(subscription, wsgi=True))
+    return response
+
+
+# ----------------------------------------------------------------------------
+# /admin/reload
+# ----------------------------------------------------------------------------
+def _admin_denied():
+    """
+    The error response for a request not sending PLAYERZONE_ADMIN_TOKEN as
+    its bearer token, or None if it does. Without a configured token the
+    admin endpoints are off.
+    """
+    admin_token = os.environ.get('PLAYERZONE_ADMIN_TOKEN')
+    if not admin_token:
+        return jsonify({'error': 'Admin endpoints are disabled; set PLAYERZONE_ADMIN_TOKEN to use them.'}), 403
+    # compare_digest only takes ASCII str, header values may hold anything
+    sent = request.headers.get('Authorization', '').encode('utf-8')
+    if not hmac.compare_digest(sent, f'Bearer {admin_token}'.encode('utf-8')):
+        return jsonify({'error': 'Unauthorized'}), 401
+    return None
+
+
+@app.route('/admin/reload', methods=['POST'])
+def reload_players():
+    """
+    POST /admin/reload
+    Forces a reload of the player snapshot. The request must send
+    PLAYERZONE_ADMIN_TOKEN as 'Authorization: Bearer <token>'; without a
+    configured token the endpoint answers 403 (SIGHUP still reloads).
+    """
+    denied = _admin_denied()
+    if denied:
+        return denied
+
+    try:
+        snapshot = player_store.reload()
+    except FileNotFoundError as e:
+        return jsonify({'error': f'Players data file not found: {str(e)}'}), 500
+    except json.JSONDecodeError:
+        return jsonify({'error': 'Error reading players data'}), 500
+
+    return jsonify({
+        'generation': snapshot.generation,
+        'players': len(snapshot.players)
+    })
+
+
+def _reload_on_sighup(signum, frame):
+    try:
+        player_store.reload(wait=False)
+    except (OSError, ValueError):
+        pass
+
+
+if hasattr(signal, 'SIGHUP'):
+    try:
+        signal.signal(signal.SIGHUP, _reload_on_sighup)
+    except ValueError:
+        # Not in the main thread (e.g. imported by a threaded server)
+        pass
+
+
+# ----------------------------------------------------------------------------
+# /metrics, /admin/profile
+# ----------------------------------------------------------------------------
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    GET /metrics
+    Request and stage latency histograms, cache hit/miss and upstream
+    counters in the Prometheus text format.
+    """
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route('/admin/profile', methods=['GET', 'POST'])
+def configure_profiler():
+    """
+    GET /admin/profile
+    POST /admin/profile  { "enabled": true, "interval_ms": 5, "min_duration_ms": 100 }
+
+    Shows or changes the per-request sampling profiler. While enabled, every
+    request taking at least min_duration_ms leaves a collapsed-stack profile
+    (.folded) in PLAYERZONE_PROFILE_DIR; the newest PLAYERZONE_PROFILE_KEEP
+    are kept. Same authorization as /admin/reload.
+    """
+    denied = _admin_denied()
+    if denied:
+        return denied
+
+    if request.method == 'POST':
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not isinstance(data.get('enabled'), bool):
+            return jsonify({'error': "Request body must be a JSON object with a boolean 'enabled'."}), 400
+        settings = {}
+        for field, name in (('interval_ms', 'interval'), ('min_duration_ms', 'min_duration')):
+            value = data.get(field)
+            if value is None:
+                continue
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+                return jsonify({'error': f"'{field}' must be a non-negative number."}), 400
+            settings[name] = value / 1000
+        if settings.get('interval') == 0:
+            return jsonify({'error': "'interval_ms' must be positive."}), 400
+        try:
+            profiler.configure(data['enabled'], **settings)
+        except OSError as e:
+            return jsonify({'error': f'Cannot write profiles: {str(e)}'}), 500
+
+    return jsonify(profiler.status())
+
+
 # ----------------------------------------------------------------------------
 # Main
 # ----------------------------------------------------------------------------
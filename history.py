@@ -0,0 +1,297 @@
+import asyncio
+from collections import OrderedDict
+import gzip
+import json
+import os
+import re
+import threading
+import time
+
+import requests
+
+from http_client import get_client
+import metrics
+
+DEFAULT_BASE_URL = "https://playerzone.roundnetgermany.de"
+HISTORY_PATH = "/ranking/rg-rating/history?player_id={player_id}&ranking_id={ranking_id}"
+
+_CHART_RE = re.compile(r'labels:\s*\[(.*?)\].*?data:\s*\[(.*?)\]', re.DOTALL)
+
+
+class HistoryError(Exception):
+    """Fetching or parsing a history page failed; the message is client-facing."""
+
+
+def ranking_id_for(division):
+    """playerzone ranking id: 1 = Open, 2 = Women."""
+    return 1 if division.lower() == 'open' else 2
+
+
+# ----------------------------------------------------------------------------
+# Parsing / fetching
+# ----------------------------------------------------------------------------
+def parse_history_html(html):
+    """
+    Parse `labels: [ ... ]` and `data: [ ... ]` of the RGX chart into
+    [{'date': ..., 'points': int or None}, ...].
+    """
+    match_chart = _CHART_RE.search(html)
+    if not match_chart:
+        raise HistoryError('Failed to parse chart arrays with the simple regex')
+
+    labels_raw = match_chart.group(1).strip()
+    data_raw = match_chart.group(2).strip()
+
+    # Convert them to lists
+    dates = [date.strip().strip("'").strip('"') for date in labels_raw.split(',')]
+    ratings = []
+    for rating_str in data_raw.split(','):
+        rating_str = rating_str.strip().strip("'").strip('"')
+        try:
+            ratings.append(int(rating_str))
+        except ValueError:
+            ratings.append(None)
+
+    return [{'date': d, 'points': r} for d, r in zip(dates, ratings)]
+
+
+def history_url(player_id, ranking_id, base_url=None):
+    """History page URL; base_url defaults to $PLAYERZONE_BASE_URL or playerzone."""
+    base_url = base_url or os.environ.get('PLAYERZONE_BASE_URL', DEFAULT_BASE_URL)
+    return base_url.rstrip('/') + HISTORY_PATH.format(player_id=player_id, ranking_id=ranking_id)
+
+
+def fetch_history(player_id, ranking_id, base_url=None, client=None):
+    """Download and parse one player's history page."""
+    url = history_url(player_id, ranking_id, base_url)
+    try:
+        with metrics.stage('upstream_fetch'):
+            resp = (client or get_client()).get(url)
+    except requests.RequestException as e:
+        raise HistoryError(f'Failed to load page. {e}')
+    if resp.status_code != 200:
+        raise HistoryError(f'Failed to load page. HTTP {resp.status_code}')
+    with metrics.stage('history_parse'):
+        return parse_history_html(resp.text)
+
+
+async def fetch_history_async(player_id, ranking_id, base_url=None, client=None):
+    """fetch_history() without blocking the event loop (see async_http_client)."""
+    from async_http_client import UPSTREAM_ERRORS, get_async_client
+
+    url = history_url(player_id, ranking_id, base_url)
+    try:
+        with metrics.stage('upstream_fetch'):
+            resp = await (client or get_async_client()).get(url)
+    except UPSTREAM_ERRORS as e:
+        raise HistoryError(f'Failed to load page. {e}')
+    if resp.status_code != 200:
+        raise HistoryError(f'Failed to load page. HTTP {resp.status_code}')
+    with metrics.stage('history_parse'):
+        return parse_history_html(resp.text)
+
+
+# ----------------------------------------------------------------------------
+# HistoryCache - TTL + LRU cache with single-flight loading
+# ----------------------------------------------------------------------------
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class HistoryCache:
+    """
+    Bounded cache of parsed histories keyed by (player_id, ranking_id).
+
+      - entries expire `ttl` seconds after they were loaded
+      - beyond `maxsize` entries the least recently used one is evicted
+      - concurrent misses for the same key share one in-flight load; the
+        waiting callers get its result (or its exception)
+      - failures are never cached
+    """
+
+    def __init__(self, maxsize=2048, ttl=600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key => (expires_at, value)
+        self._in_flight = {}
+        self._async_flights = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def cached(self, key):
+        """True if `key` has a live entry, i.e. get_or_load() would not call its loader."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[0] > time.monotonic()
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for key, or loader() shared across concurrent callers."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    metrics.cache_result('history', True)
+                    return entry[1]
+                del self._entries[key]
+
+            self.misses += 1
+            metrics.cache_result('history', False)
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                # A clear() during the load drops our flight; don't store stale data then
+                if self._in_flight.get(key) is flight:
+                    del self._in_flight[key]
+                    if flight.error is None:
+                        self._store(key, flight.value)
+            flight.done.set()
+        return flight.value
+
+    async def get_or_load_async(self, key, loader):
+        """
+        get_or_load() for coroutines: `loader` is an async function, and
+        concurrent misses await one shared task instead of blocking threads.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    metrics.cache_result('history', True)
+                    return entry[1]
+                del self._entries[key]
+            self.misses += 1
+            metrics.cache_result('history', False)
+
+        task = self._async_flights.get(key)
+        if task is None:
+            task = self._async_flights[key] = asyncio.ensure_future(self._load_async(key, loader))
+        # shield: a cancelled waiter must not cancel the load the others share
+        return await asyncio.shield(task)
+
+    async def _load_async(self, key, loader):
+        epoch = self._epoch
+        try:
+            value = await loader()
+        finally:
+            if self._async_flights.get(key) is asyncio.current_task():
+                del self._async_flights[key]
+        with self._lock:
+            # A clear() during the load: don't store stale data
+            if self._epoch == epoch:
+                self._store(key, value)
+        return value
+
+    def _store(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry, e.g. when a new scraper snapshot was loaded."""
+        with self._lock:
+            self._entries.clear()
+            self._in_flight.clear()
+            self._epoch += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# ----------------------------------------------------------------------------
+# HistoryStore - histories persisted by history_crawler.py
+# ----------------------------------------------------------------------------
+def history_key(player_id, ranking_id):
+    return f"{player_id}:{ranking_id}"
+
+
+def write_history_store(path, histories, crawled_at):
+    """
+    Write {history_key: [{'date', 'points'}, ...]} as gzip'd JSON. Points are
+    stored as compact [date, points] pairs. The file is swapped in atomically.
+    """
+    payload = {
+        'crawled_at': crawled_at,
+        'histories': {
+            key: [[entry['date'], entry['points']] for entry in history]
+            for key, history in histories.items()
+        }
+    }
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+class HistoryStore:
+    """
+    Read side of the crawler output. The file is (re)loaded lazily whenever
+    its mtime changes, checked at most every `check_interval` seconds.
+    """
+
+    def __init__(self, path, check_interval=5.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._histories = {}
+        self._mtime = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            self._histories, self._mtime = {}, None
+            return
+        if mtime == self._mtime or not self._lock.acquire(blocking=False):
+            return
+        try:
+            with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                payload = json.load(f)
+            self._histories = payload.get('histories', {})
+            self._mtime = mtime
+        except (OSError, ValueError):
+            # Keep what we had; the next check retries
+            pass
+        finally:
+            self._lock.release()
+
+    def get(self, player_id, ranking_id):
+        """Stored history as [{'date', 'points'}, ...], or None if not crawled."""
+        self._refresh()
+        pairs = self._histories.get(history_key(player_id, ranking_id))
+        if pairs is None:
+            return None
+        return [{'date': d, 'points': p} for d, p in pairs]
+
+    def __len__(self):
+        self._refresh()
+        return len(self._histories)
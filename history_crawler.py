@@ -0,0 +1,111 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import json
+import os
+import threading
+import time
+
+from history import (
+    HistoryError, fetch_history, history_key, ranking_id_for, write_history_store
+)
+from http_client import HttpClient
+
+
+class RateLimiter:
+    """Token bucket shared by all crawler threads: `rate` requests/second, bursts up to `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def load_players(data_dir):
+    """All (player_id, ranking_id, name) pairs from the scraped division files."""
+    targets = []
+    for filename in ('men_players.json', 'women_players.json'):
+        with open(os.path.join(data_dir, filename), 'r', encoding='utf-8') as f:
+            for p in json.load(f):
+                if p.get('player_id') is not None:
+                    targets.append((p['player_id'], ranking_id_for(p['division']), p['name']))
+    return targets
+
+
+def crawl_histories(targets, base_url=None, concurrency=8, rate=5.0, client=None):
+    """
+    Fetch and parse the history page of every (player_id, ranking_id, name)
+    target with `concurrency` worker threads, never exceeding `rate`
+    requests per second overall. Returns (histories, failures) where
+    histories maps history_key => parsed history.
+    """
+    client = client or HttpClient(per_host_limit=concurrency, pool_size=concurrency)
+    limiter = RateLimiter(rate, burst=concurrency)
+
+    def fetch(player_id, ranking_id):
+        limiter.acquire()
+        return fetch_history(player_id, ranking_id, base_url=base_url, client=client)
+
+    histories = {}
+    failures = []
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {
+            pool.submit(fetch, player_id, ranking_id): (player_id, ranking_id, name)
+            for player_id, ranking_id, name in targets
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            player_id, ranking_id, name = futures[future]
+            try:
+                histories[history_key(player_id, ranking_id)] = future.result()
+            except HistoryError as e:
+                failures.append((player_id, ranking_id, name, str(e)))
+            if done % 100 == 0:
+                print(f"  {done}/{len(futures)} histories fetched")
+    return histories, failures
+
+
+def main():
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Fetch the RGX history of every scraped player into a local store.")
+    parser.add_argument('--data-dir', default=os.environ.get('PLAYERZONE_DATA_DIR', current_dir),
+                        help="Directory holding men_players.json / women_players.json")
+    parser.add_argument('--output', default=None,
+                        help="History store path (default: <data-dir>/histories.json.gz)")
+    parser.add_argument('--base-url', default=None,
+                        help="playerzone base URL, e.g. a local stub server (default: $PLAYERZONE_BASE_URL or the live site)")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=5.0, help="Max requests per second, 0 = unlimited")
+    args = parser.parse_args()
+
+    output = args.output or os.path.join(args.data_dir, 'histories.json.gz')
+    targets = load_players(args.data_dir)
+    print(f"Crawling {len(targets)} player histories ({args.concurrency} workers, {args.rate} req/s)...")
+
+    started = time.time()
+    histories, failures = crawl_histories(targets, args.base_url, args.concurrency, args.rate)
+    write_history_store(output, histories, crawled_at=started)
+
+    print(f"Stored {len(histories)} histories in {output} ({time.time() - started:.1f}s).")
+    for player_id, ranking_id, name, error in failures[:20]:
+        print(f"  failed: {name} ({player_id}, ranking {ranking_id}): {error}")
+    if len(failures) > 20:
+        print(f"  ... and {len(failures) - 20} more failures")
+
+
+if __name__ == "__main__":
+    main()
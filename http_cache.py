@@ -0,0 +1,107 @@
+import gzip
+import hashlib
+import threading
+
+from flask import current_app, request
+
+import metrics
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+
+# ----------------------------------------------------------------------------
+# CachedBody - one serialized JSON payload plus its compressed variants
+# ----------------------------------------------------------------------------
+class CachedBody:
+    """
+    A JSON response body serialized once (per player snapshot) together with
+    a strong ETag. The gzip/brotli variants are compressed on first use and
+    then kept, so repeat requests only copy bytes.
+    """
+
+    def __init__(self, body, last_modified):
+        self.body = body
+        self.last_modified = last_modified
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self._variants = {'identity': body}
+        self._lock = threading.Lock()
+
+    def variant(self, encoding):
+        """Body bytes for 'identity', 'gzip' or 'br'."""
+        data = self._variants.get(encoding)
+        metrics.cache_result('compressed_body', data is not None)
+        if data is None:
+            with self._lock:
+                data = self._variants.get(encoding)
+                if data is None:
+                    if encoding == 'gzip':
+                        data = gzip.compress(self.body, compresslevel=9, mtime=0)
+                    elif encoding == 'br':
+                        data = brotli.compress(self.body, quality=11)
+                    else:
+                        raise ValueError(f"Unsupported encoding {encoding}")
+                    self._variants[encoding] = data
+        return data
+
+    def etag_for(self, encoding):
+        # Each representation needs its own strong validator
+        return self.etag if encoding == 'identity' else f"{self.etag}-{encoding}"
+
+
+def cached_json_body(obj, last_modified):
+    """Serialize `obj` exactly like jsonify() would and wrap it in a CachedBody."""
+    body = current_app.json.response(obj).get_data()
+    return CachedBody(body, last_modified)
+
+
+def negotiate_encoding():
+    """Best of br / gzip / identity for the current request's Accept-Encoding."""
+    accepted = request.accept_encodings
+    candidates = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best, best_q = 'identity', 0
+    for encoding in candidates:
+        quality = accepted[encoding]
+        if quality > best_q:
+            best, best_q = encoding, quality
+    return best
+
+
+def cached_response(cached, max_age=60):
+    """
+    Build the response for a CachedBody:
+      - 304 if If-None-Match matches any variant's ETag, or (without
+        If-None-Match) If-Modified-Since is not older than the snapshot
+      - otherwise the body in the negotiated Content-Encoding
+    """
+    encoding = negotiate_encoding()
+    response = current_app.response_class(mimetype='application/json')
+    response.set_etag(cached.etag_for(encoding))
+    response.last_modified = cached.last_modified
+    response.headers['Cache-Control'] = f'public, max-age={max_age}'
+    response.vary.add('Accept-Encoding')
+
+    if_none_match = request.if_none_match
+    if if_none_match:
+        if any(if_none_match.contains_weak(cached.etag_for(enc)) for enc in ('identity', 'gzip', 'br')):
+            metrics.cache_result('http_conditional', True)
+            return _not_modified(response)
+    elif request.if_modified_since is not None:
+        if int(cached.last_modified) <= request.if_modified_since.timestamp():
+            metrics.cache_result('http_conditional', True)
+            return _not_modified(response)
+    metrics.cache_result('http_conditional', False)
+
+    response.set_data(cached.variant(encoding))
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def _not_modified(response):
+    response.status_code = 304
+    response.set_data(b'')
+    response.headers.pop('Content-Length', None)
+    return response
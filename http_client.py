@@ -0,0 +1,360 @@
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+DEFAULT_HEADERS = {
+    'User-Agent': (
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
+        'AppleWebKit/537.36 (KHTML, like Gecko) '
+        'Chrome/91.0.4472.124 Safari/537.36'
+    )
+}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(requests.RequestException):
+    """The host failed repeatedly; calls are refused until the breaker resets."""
+
+
+class HostBusyError(requests.RequestException):
+    """No per-host concurrency slot became free in time."""
+
+
+# ----------------------------------------------------------------------------
+# CircuitBreaker - per host, opens after consecutive failures
+# ----------------------------------------------------------------------------
+class CircuitBreaker:
+    """
+    closed    => calls pass; `failure_threshold` consecutive failures open it
+    open      => calls fail fast until `reset_timeout` seconds have passed
+    half-open => one trial call; success closes, failure re-opens
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        """
+        Whether a call may go out: True while closed, 'trial' for the one
+        half-open trial call, False otherwise. The trial call must end in
+        record_success(), record_failure() or abandon_trial().
+        """
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial_running:
+                self._trial_running = True
+                return 'trial'
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+
+    def abandon_trial(self):
+        """The trial call ended without a verdict (e.g. cancelled): let the next call try."""
+        with self._lock:
+            self._trial_running = False
+
+    def retry_after(self):
+        """Seconds until the breaker lets a trial call through."""
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+
+# ----------------------------------------------------------------------------
+# BaseHttpClient - retry, backoff and breaker policy of both clients
+# ----------------------------------------------------------------------------
+class BaseHttpClient:
+    """
+    What HttpClient and async_http_client.AsyncHttpClient share: settings,
+    per-host state, `metrics`, and the verdict on every attempt (breaker
+    bookkeeping, whether to retry and how long to back off). Subclasses
+    only send the requests and wait.
+    """
+
+    def __init__(self, timeout=(3.05, 10.0), retries=2, backoff=0.5, max_backoff=8.0,
+                 per_host_limit=8, failure_threshold=5, reset_timeout=30.0):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.per_host_limit = per_host_limit
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._hosts = {}
+        self._hosts_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self.metrics = {
+            'requests': 0,
+            'retries': 0,
+            'errors': 0,
+            'timeouts': 0,
+            'circuit_open': 0,
+            'host_busy': 0,
+            'latency_seconds_total': 0.0,
+            'status': {},
+        }
+
+    def _new_semaphore(self):
+        raise NotImplementedError
+
+    def _host_state(self, host):
+        with self._hosts_lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = self._hosts[host] = (
+                    self._new_semaphore(),
+                    CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                )
+            return state
+
+    def breaker(self, url):
+        """The circuit breaker guarding the host of `url`."""
+        return self._host_state(urlsplit(url).netloc)[1]
+
+    def _count(self, key, amount=1):
+        with self._metrics_lock:
+            self.metrics[key] += amount
+
+    def _busy(self, host):
+        self._count('host_busy')
+        return HostBusyError(f"Too many concurrent requests to {host}")
+
+    def _allow(self, host, breaker, release):
+        """breaker.allow(), or release the host slot and raise CircuitOpenError."""
+        allowed = breaker.allow()
+        if not allowed:
+            release()
+            self._count('circuit_open')
+            raise CircuitOpenError(f"Circuit open for {host}, retry in {breaker.retry_after():.0f}s")
+        return allowed
+
+    def _record_attempt(self, started, response):
+        with self._metrics_lock:
+            self.metrics['requests'] += 1
+            self.metrics['latency_seconds_total'] += time.monotonic() - started
+            if response is not None:
+                status = self.metrics['status']
+                status[response.status_code] = status.get(response.status_code, 0) + 1
+
+    def _failed(self, breaker):
+        """A call to the host failed in a way not worth retrying."""
+        self._count('errors')
+        breaker.record_failure()
+
+    def _next_delay(self, breaker, attempt, response, error):
+        """
+        Settle attempt number `attempt` (0 for the first) with the breaker.
+        Returns the backoff before the next attempt, or None once the call is
+        over: then the caller raises `error`, if any, or returns `response`.
+        """
+        if error is None and response.status_code not in RETRY_STATUSES:
+            breaker.record_success()
+            return None
+        self._failed(breaker)
+        if attempt >= self.retries:
+            return None
+        self._count('retries')
+        return self._backoff_delay(attempt + 1, response)
+
+    def _backoff_delay(self, attempt, response):
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** (attempt - 1))))
+
+    @staticmethod
+    def _slot_timeout(timeout):
+        """How long to wait for a per-host slot: one full request `timeout`."""
+        if isinstance(timeout, tuple):
+            return sum(t for t in timeout if t)
+        return timeout
+
+
+# ----------------------------------------------------------------------------
+# HttpClient - pooled session with timeouts, retries and per-host limits
+# ----------------------------------------------------------------------------
+class HttpClient(BaseHttpClient):
+    """
+    One requests.Session shared by the scraper and the API.
+
+      - keep-alive connection pool (`pool_size` connections per host)
+      - (connect, read) timeouts on every request
+      - up to `retries` retries on connection errors, timeouts and
+        429/5xx, with full-jitter exponential backoff (Retry-After honoured,
+        capped at `max_backoff`)
+      - a circuit breaker and a concurrency limit per host
+      - counters in `metrics` (requests, retries, errors, timeouts, ...)
+    """
+
+    def __init__(self, timeout=(3.05, 10.0), retries=2, backoff=0.5, max_backoff=8.0,
+                 per_host_limit=8, failure_threshold=5, reset_timeout=30.0, pool_size=16,
+                 headers=None):
+        super().__init__(timeout, retries, backoff, max_backoff, per_host_limit, failure_threshold, reset_timeout)
+        self.session = requests.Session()
+        self.session.headers.update(headers or DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _new_semaphore(self):
+        return threading.BoundedSemaphore(self.per_host_limit)
+
+    def get(self, url, **kwargs):
+        """GET `url`; raises requests.RequestException once retries are exhausted."""
+        return self.request('GET', url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        host = urlsplit(url).netloc
+        semaphore, breaker = self._host_state(host)
+
+        attempt = 0
+        while True:
+            if not semaphore.acquire(timeout=self._slot_timeout(kwargs['timeout'])):
+                raise self._busy(host)
+            allowed = self._allow(host, breaker, semaphore.release)
+
+            response, error = None, None
+            settled = False
+            started = time.monotonic()
+            try:
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                except requests.Timeout as e:
+                    self._count('timeouts')
+                    error = e
+                except requests.ConnectionError as e:
+                    error = e
+                except requests.RequestException:
+                    # Not worth retrying (redirect loops, undecodable bodies, ...),
+                    # but still a failed call to this host
+                    self._failed(breaker)
+                    settled = True
+                    raise
+                finally:
+                    semaphore.release()
+                    self._record_attempt(started, response)
+                delay = self._next_delay(breaker, attempt, response, error)
+                settled = True
+            finally:
+                if not settled and allowed == 'trial':
+                    breaker.abandon_trial()
+
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+            attempt += 1
+            time.sleep(delay)
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """The process-wide HttpClient, configured from PLAYERZONE_HTTP_* env vars."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HttpClient(
+                    timeout=(
+                        float(os.environ.get('PLAYERZONE_HTTP_CONNECT_TIMEOUT', '3.05')),
+                        float(os.environ.get('PLAYERZONE_HTTP_READ_TIMEOUT', '10'))
+                    ),
+                    retries=int(os.environ.get('PLAYERZONE_HTTP_RETRIES', '2')),
+                    per_host_limit=int(os.environ.get('PLAYERZONE_HTTP_PER_HOST_LIMIT', '8')),
+                )
+    return _client
+
+
+# ----------------------------------------------------------------------------
+# /metrics - counters of every client, per kind ('sync' / 'async')
+# ----------------------------------------------------------------------------
+_metric_sources = []
+
+UPSTREAM_COUNTERS = (
+    # (metrics key, metric name, help)
+    ('requests', 'playerzone_upstream_requests_total', 'Upstream HTTP requests sent (including retries).'),
+    ('retries', 'playerzone_upstream_retries_total', 'Upstream requests retried.'),
+    ('errors', 'playerzone_upstream_errors_total', 'Upstream connection errors, timeouts and 429/5xx responses.'),
+    ('timeouts', 'playerzone_upstream_timeouts_total', 'Upstream requests that timed out.'),
+    ('circuit_open', 'playerzone_upstream_circuit_open_total', 'Upstream requests refused by an open circuit breaker.'),
+    ('host_busy', 'playerzone_upstream_host_busy_total', 'Upstream requests refused for lack of a per-host slot.'),
+    ('latency_seconds_total', 'playerzone_upstream_latency_seconds_total', 'Time spent waiting for upstream responses.'),
+)
+
+
+def track_client_metrics(kind, clients):
+    """Export the `metrics` of the clients returned by clients() under client=<kind>."""
+    _metric_sources.append((kind, clients))
+
+
+def _collect_upstream():
+    totals = []
+    for kind, clients in _metric_sources:
+        merged = {key: 0 for key, _, _ in UPSTREAM_COUNTERS}
+        status = {}
+        for client in clients():
+            with client._metrics_lock:
+                for key in merged:
+                    merged[key] += client.metrics[key]
+                for code, count in client.metrics['status'].items():
+                    status[code] = status.get(code, 0) + count
+        totals.append((kind, merged, status))
+
+    families = [
+        (name, 'counter', documentation, ('client',), [((kind,), merged[key]) for kind, merged, _ in totals])
+        for key, name, documentation in UPSTREAM_COUNTERS
+    ]
+    families.append((
+        'playerzone_upstream_responses_total', 'counter', 'Upstream responses by HTTP status.', ('client', 'status'),
+        [((kind, code), count) for kind, _, status in totals for code, count in sorted(status.items())]
+    ))
+    return families
+
+
+track_client_metrics('sync', lambda: [_client] if _client is not None else [])
+metrics.REGISTRY.add_collector(_collect_upstream)
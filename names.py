@@ -0,0 +1,15 @@
+"""
+Name normalization shared by the snapshot formats and the lookup indexes.
+"""
+import re
+
+_NON_ALNUM = re.compile(r'(?ui)\W')
+
+
+def normalize_name(name):
+    """
+    Normalize a name the same way fuzzywuzzy's default processor does
+    (non-alphanumerics to spaces, lowercase, trimmed), so names normalizing
+    alike always get the same fuzzy match.
+    """
+    return _NON_ALNUM.sub(' ', name).lower().strip()
@@ -0,0 +1,49 @@
+DIFF_FIELDS = (
+    'name', 'rank', 'club', 'city', 'games', 'elo_rating', 'trend_90_days',
+    'pro_status', 'exists_in_both_divisions'
+)
+
+
+def player_key(player):
+    """Players are identified per division: (player_id, division)."""
+    return player['player_id'], player['division']
+
+
+def diff_players(old_players, new_players):
+    """
+    Compare two rosters. Returns
+      {
+        'added':   [player, ...],
+        'removed': [player, ...],
+        'changed': [{'player_id', 'division', 'name',
+                     'changes': {field: [old, new], ...}}, ...]
+      }
+    with players matched by (player_id, division).
+    """
+    old_by_key = {player_key(p): p for p in old_players}
+    new_by_key = {player_key(p): p for p in new_players}
+
+    added = [p for key, p in new_by_key.items() if key not in old_by_key]
+    removed = [p for key, p in old_by_key.items() if key not in new_by_key]
+    changed = []
+    for key, new in new_by_key.items():
+        old = old_by_key.get(key)
+        if old is None:
+            continue
+        changes = {
+            field: [old.get(field), new.get(field)]
+            for field in DIFF_FIELDS
+            if old.get(field) != new.get(field)
+        }
+        if changes:
+            changed.append({
+                'player_id': new['player_id'],
+                'division': new['division'],
+                'name': new['name'],
+                'changes': changes
+            })
+    return {'added': added, 'removed': removed, 'changed': changed}
+
+
+def is_empty(diff):
+    return not (diff['added'] or diff['removed'] or diff['changed'])
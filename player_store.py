@@ -0,0 +1,426 @@
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+
+import metrics
+from names import normalize_name
+from search_index import NameSearchIndex, SuggestIndex
+from snapshot_format import SNAPSHOT_FILENAME, MappedColumns, load_rosters
+
+logger = logging.getLogger(__name__)
+
+
+def pick_division_record(records, wants_open=False):
+    """
+    Choose one record among the per-division records of the same player:
+    Open if requested and available, else Women, else the first one.
+    """
+    if len(records) == 1:
+        return records[0]
+    women_match = next((p for p in records if p['division'].lower() == 'women'), None)
+    open_match = next((p for p in records if p['division'].lower() == 'open'), None)
+    if wants_open and open_match:
+        return open_match
+    if women_match:
+        return women_match
+    return records[0]
+
+
+# ----------------------------------------------------------------------------
+# Snapshot - one immutable, fully loaded view of both division files
+# ----------------------------------------------------------------------------
+class Snapshot:
+    """
+    Holds the players of one scraper run. A snapshot is never mutated after
+    construction, so request handlers can keep using the instance they grabbed
+    even if a newer one gets swapped in while they are running.
+    """
+
+    def __init__(self, men_players, women_players, generation, source_stats=None):
+        self.men_players = men_players
+        self.women_players = women_players
+        self.players = men_players + women_players
+        self.generation = generation
+        self.source_stats = source_stats or {}
+        self.loaded_at = time.time()
+
+        # Indexes: player_id / normalized name => records in roster order
+        # (one per division the player appears in).
+        self.names = [p['name'] for p in self.players]
+        self.by_id = {}
+        self.by_name = {}
+        for p in self.players:
+            self.by_id.setdefault(p['player_id'], []).append(p)
+            self.by_name.setdefault(normalize_name(p['name']), []).append(p)
+        self.search_index = NameSearchIndex(self.names)
+        self.suggest_index = SuggestIndex(self.players)
+
+        # Derived values (serialized responses, aggregates) computed on demand
+        self._memo = {}
+        self._memo_lock = threading.RLock()
+
+    def memo(self, key, factory):
+        """
+        Return the value cached under `key` for this snapshot, computing it
+        with factory() on first use. Concurrent first calls compute it once;
+        a factory may itself use memo() for values it builds on.
+        """
+        try:
+            value = self._memo[key]
+        except KeyError:
+            pass
+        else:
+            metrics.cache_result('snapshot_memo', True)
+            return value
+        with self._memo_lock:
+            if key not in self._memo:
+                metrics.cache_result('snapshot_memo', False)
+                self._memo[key] = factory()
+            else:
+                metrics.cache_result('snapshot_memo', True)
+            return self._memo[key]
+
+    def memoized(self, key, default=None):
+        """The value cached under `key` if it was computed already, else `default`."""
+        return self._memo.get(key, default)
+
+    def find_by_id(self, player_id):
+        """All division records for player_id (empty list if unknown)."""
+        return self.by_id.get(player_id, [])
+
+    def find_by_exact_name(self, name):
+        """
+        Records whose name is an exact (normalized) hit for `name`.
+        Like a 100-score fuzzy match, only records sharing the spelling of the
+        first hit are returned.
+        """
+        normalized = normalize_name(name)
+        if not normalized:
+            return []
+        records = self.by_name.get(normalized, [])
+        if len(records) > 1:
+            first_name = records[0]['name']
+            records = [p for p in records if p['name'] == first_name]
+        return records
+
+    def find_by_matched_name(self, name):
+        """Records spelled exactly `name`, e.g. the name a fuzzy match returned."""
+        return [p for p in self.by_name.get(normalize_name(name), []) if p['name'] == name]
+
+    def presorted(self, division, field, descending=False):
+        """
+        Sort order shipped with the snapshot as (players, keys) like
+        roster_query.sorted_players, or None to let the caller sort.
+        """
+        return None
+
+    def record_id(self, player):
+        """Identity of a record within this snapshot (for set membership)."""
+        return id(player)
+
+    @property
+    def last_modified(self):
+        """Newest mtime of the files this snapshot was loaded from."""
+        mtimes = [stat[1] for stat in self.source_stats.values() if stat]
+        return max(mtimes) if mtimes else self.loaded_at
+
+
+# ----------------------------------------------------------------------------
+# MappedSnapshot - Snapshot served straight from a memory-mapped players.pzc
+# ----------------------------------------------------------------------------
+class MappedRecord(dict):
+    """A player dict materialized from a mapped row; `row` is its position in the file."""
+    __slots__ = ('row',)
+
+
+class RecordList:
+    """
+    Read-only sequence of the records at `rows` (a range or a mapped row
+    array). Records are built on access and not kept, so iterating the
+    roster does not grow the process.
+    """
+
+    def __init__(self, columns, rows):
+        self.columns = columns
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return RecordList(self.columns, self.rows[i])
+        return self._record(self.rows[i])
+
+    def __iter__(self):
+        return map(self._record, self.rows)
+
+    def _record(self, row):
+        record = MappedRecord(self.columns.record(row))
+        record.row = row
+        return record
+
+
+class _OrderKeys:
+    """Sort keys of a stored order, as roster_query bisects them (negated when descending)."""
+
+    def __init__(self, column, rows, negate):
+        self.column = column
+        self.rows = rows
+        self.negate = negate
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, i):
+        value = self.column[self.rows[i]]
+        return -value if self.negate else value
+
+
+class MappedSnapshot(Snapshot):
+    """
+    Snapshot backed by a read-only mmap of players.pzc, including the id and
+    name indexes and the presorted rank/elo orders stored in the file. Worker
+    processes mapping the same file share one copy of the data; only the
+    fuzzy search indexes are built per process, on first use.
+
+    The generation comes from the file, so every worker reports the same
+    X-Snapshot-Generation and accepts the others' /players cursors.
+    """
+
+    def __init__(self, path, source_stats=None):
+        self.columns = MappedColumns(path)
+        self.generation = self.columns.generation
+        self.source_stats = source_stats or {}
+        self.loaded_at = time.time()
+
+        men = range(*self.columns.rosters['men_players'])
+        women = range(*self.columns.rosters['women_players'])
+        self.men_players = RecordList(self.columns, men)
+        self.women_players = RecordList(self.columns, women)
+        self.players = RecordList(self.columns, range(len(self.columns)))
+
+        self._memo = {}
+        self._memo_lock = threading.RLock()
+
+    @property
+    def names(self):
+        return self.memo('names', lambda: [self.columns.value('name', row) for row in range(len(self.columns))])
+
+    @property
+    def search_index(self):
+        return self.memo('search_index', lambda: NameSearchIndex(self.names))
+
+    @property
+    def suggest_index(self):
+        return self.memo('suggest_index', lambda: SuggestIndex(list(self.players)))
+
+    def close(self):
+        """Unmap the file; the snapshot is unusable afterwards."""
+        self.columns.close()
+
+    def _records(self, rows):
+        return [self.players[row] for row in rows]
+
+    def find_by_id(self, player_id):
+        return self._records(self.columns.rows_for_id(player_id))
+
+    def find_by_exact_name(self, name):
+        normalized = normalize_name(name)
+        if not normalized:
+            return []
+        rows = self.columns.rows_for_name(normalized)
+        if len(rows) > 1:
+            first_name = self.columns.value('name', rows[0])
+            rows = [row for row in rows if self.columns.value('name', row) == first_name]
+        return self._records(rows)
+
+    def find_by_matched_name(self, name):
+        rows = self.columns.rows_for_name(normalize_name(name))
+        return self._records(row for row in rows if self.columns.value('name', row) == name)
+
+    def presorted(self, division, field, descending=False):
+        stored = self.columns.order(division or 'all', field, descending)
+        if stored is None:
+            return None
+        rows, with_value = stored
+        keys = _OrderKeys(self.columns.columns[field], rows[:with_value], descending)
+        return RecordList(self.columns, rows), keys
+
+    def record_id(self, player):
+        return player.row
+
+
+# ----------------------------------------------------------------------------
+# PlayerStore - process-wide holder of the current snapshot
+# ----------------------------------------------------------------------------
+class PlayerStore:
+    """
+    Loads men_players.json + women_players.json (or the columnar players.pzc
+    written next to them, see snapshot_format) once and serves the parsed
+    snapshot from memory.
+
+    Source format (`snapshot_format`):
+      - 'auto'     players.pzc if it exists and is not older than the JSON
+                   files, else the JSON files
+      - 'columnar' / 'json' always that one
+      - 'mapped'   players.pzc, memory-mapped instead of parsed (see
+                   MappedSnapshot); meant for many worker processes
+
+    Reloading:
+      - get_snapshot() stats the files at most every `check_interval` seconds
+        and reloads when (inode, mtime, size) of any source file changed
+      - reload() forces a reload (used by the admin endpoint / SIGHUP)
+
+    Only one thread performs a reload at a time. Readers never wait for it:
+    they keep getting the previous snapshot until the new one is fully built,
+    then the reference is swapped in one assignment.
+    """
+
+    def __init__(self, data_dir, check_interval=2.0, snapshot_format='auto'):
+        if snapshot_format not in ('auto', 'columnar', 'json', 'mapped'):
+            raise ValueError(f"Unknown snapshot format '{snapshot_format}'")
+        self.men_path = os.path.join(data_dir, 'men_players.json')
+        self.women_path = os.path.join(data_dir, 'women_players.json')
+        self.columnar_path = os.path.join(data_dir, SNAPSHOT_FILENAME)
+        self.snapshot_format = snapshot_format
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._generation = 0
+        self._last_check = 0.0
+        self._reload_lock = threading.Lock()
+        self._initial_lock = threading.Lock()
+        self._listeners = []
+
+    @property
+    def current(self):
+        """The loaded snapshot without triggering a file check, or None."""
+        return self._snapshot
+
+    @property
+    def paths(self):
+        if self.snapshot_format == 'json':
+            return [self.men_path, self.women_path]
+        if self.snapshot_format in ('columnar', 'mapped'):
+            return [self.columnar_path]
+        return [self.men_path, self.women_path, self.columnar_path]
+
+    def add_listener(self, callback):
+        """
+        Register callback(old_snapshot, new_snapshot), called after every swap.
+        old_snapshot is None for the initial load.
+        """
+        self._listeners.append(callback)
+
+    def get_snapshot(self):
+        """
+        Return the current snapshot, loading it on first use and picking up
+        changed files on disk. Raises FileNotFoundError / json.JSONDecodeError
+        only if no snapshot could ever be loaded.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._initial_lock:
+                # Threads queued behind the first load reuse its snapshot
+                if self._snapshot is None:
+                    return self.reload(wait=True)
+                return self._snapshot
+
+        now = time.monotonic()
+        if now - self._last_check >= self.check_interval:
+            self._last_check = now
+            if self._changed(snapshot, self._stat_files()):
+                try:
+                    self.reload(wait=False)
+                except (OSError, ValueError):
+                    # Half-written or missing files: keep serving the old snapshot
+                    pass
+        return self._snapshot
+
+    def reload(self, wait=True):
+        """
+        Re-read the data files and swap in a new snapshot.
+        With wait=False the call returns immediately if another thread is
+        already reloading.
+        """
+        if not self._reload_lock.acquire(blocking=wait):
+            return self._snapshot
+        try:
+            old = self._snapshot
+            # Stat before reading so a write racing with the load is picked up
+            # again on the next check.
+            stats = self._stat_files()
+            snapshot = self._load_snapshot(stats)
+            self._generation = snapshot.generation
+            self._snapshot = snapshot
+            self._last_check = time.monotonic()
+        finally:
+            self._reload_lock.release()
+
+        for callback in self._listeners:
+            try:
+                callback(old, snapshot)
+            except Exception as e:
+                logger.warning("Snapshot listener failed: %s", e)
+        if isinstance(old, MappedSnapshot) and old is not snapshot:
+            # Requests still running keep reading the old mapping; it is
+            # unmapped as soon as the last of them lets go of the snapshot.
+            weakref.finalize(old, old.columns.close)
+        return snapshot
+
+    def _load_snapshot(self, stats):
+        with metrics.stage('snapshot_load'):
+            return self._read_snapshot(stats)
+
+    def _read_snapshot(self, stats):
+        if self.snapshot_format == 'mapped':
+            return MappedSnapshot(self.columnar_path, stats)
+        if self._use_columnar(stats):
+            men_data, women_data = load_rosters(self.columnar_path)
+        else:
+            men_data = self._load(self.men_path)
+            women_data = self._load(self.women_path)
+        return Snapshot(men_data, women_data, self._generation + 1, stats)
+
+    def _use_columnar(self, stats):
+        if self.snapshot_format != 'auto':
+            return self.snapshot_format == 'columnar'
+        columnar = stats.get(self.columnar_path)
+        if columnar is None:
+            return False
+        # A hand-edited or older-scraper JSON file newer than players.pzc wins
+        return all(stat is None or stat[1] <= columnar[1]
+                   for path, stat in stats.items() if path != self.columnar_path)
+
+    def _changed(self, snapshot, stats):
+        """
+        True if reloading with the files in `stats` would load different data
+        than `snapshot`. JSON exports replaced next to an unchanged
+        players.pzc that is still newer than them are not: the scraper renames
+        them right after players.pzc, and 'auto' keeps loading players.pzc.
+        """
+        if stats == snapshot.source_stats:
+            return False
+        if (self.snapshot_format == 'auto'
+                and stats.get(self.columnar_path) == snapshot.source_stats.get(self.columnar_path)
+                and self._use_columnar(snapshot.source_stats) and self._use_columnar(stats)):
+            return False
+        return True
+
+    def _stat_files(self):
+        stats = {}
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+                stats[path] = (st.st_ino, st.st_mtime, st.st_size)
+            except FileNotFoundError:
+                stats[path] = None
+        return stats
+
+    @staticmethod
+    def _load(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
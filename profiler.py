@@ -0,0 +1,138 @@
+"""
+Opt-in sampling profiler for individual requests.
+
+While enabled, a background thread samples the stack of every thread that is
+handling a request every `interval` seconds. When the request ends, its
+samples are written as collapsed stacks (one "frame;frame;frame count" line
+per distinct stack, the input format of flamegraph.pl / speedscope) to
+`<directory>/<time>-<method>-<route>-<ms>ms.folded`, if the request took at
+least `min_duration` seconds. Only the newest `keep` profiles are kept.
+
+Disabled (the default) it costs one attribute check per request and no
+thread runs.
+"""
+from collections import Counter, deque
+import os
+import re
+import sys
+import threading
+import time
+
+_UNSAFE = re.compile(r'[^A-Za-z0-9_.-]+')
+
+
+class _RequestProfile:
+    __slots__ = ('label', 'started', 'samples')
+
+    def __init__(self, label):
+        self.label = label
+        self.started = time.perf_counter()
+        self.samples = Counter()
+
+
+class SamplingProfiler:
+    def __init__(self, directory, interval=0.005, min_duration=0.0, max_depth=64, keep=100):
+        self.directory = directory
+        self.interval = interval
+        self.min_duration = min_duration
+        self.max_depth = max_depth
+        self.keep = keep
+        self.enabled = False
+        self.dumped = 0
+        self._active = {}  # thread id => _RequestProfile
+        self._written = deque()  # paths of the kept profiles, oldest first
+        self._lock = threading.Lock()
+        self._stop = None
+
+    def configure(self, enabled, interval=None, min_duration=None):
+        """Switch sampling on or off (and optionally change its settings)."""
+        with self._lock:
+            if interval is not None:
+                self.interval = interval
+            if min_duration is not None:
+                self.min_duration = min_duration
+            if enabled and not self.enabled:
+                os.makedirs(self.directory, exist_ok=True)
+                # Profiles left by earlier runs count against `keep` too
+                self._written = deque(sorted(
+                    (entry.path for entry in os.scandir(self.directory) if entry.name.endswith('.folded')),
+                    key=os.path.getmtime
+                ))
+                self._stop = threading.Event()
+                threading.Thread(target=self._run, args=(self._stop,), name='request-profiler', daemon=True).start()
+            elif not enabled and self.enabled:
+                self._stop.set()
+                self._active.clear()
+            self.enabled = enabled
+
+    def status(self):
+        return {
+            'enabled': self.enabled,
+            'directory': self.directory,
+            'interval_ms': self.interval * 1000,
+            'min_duration_ms': self.min_duration * 1000,
+            'profiles_written': self.dumped,
+            'profiles_kept': len(self._written),
+        }
+
+    def start_request(self, label):
+        """Start sampling the calling thread; returns a token for end_request()."""
+        profile = _RequestProfile(label)
+        with self._lock:
+            self._active[threading.get_ident()] = profile
+        return profile
+
+    def end_request(self, profile):
+        """Stop sampling the calling thread and write its profile; returns the path or None."""
+        with self._lock:
+            if self._active.get(threading.get_ident()) is profile:
+                del self._active[threading.get_ident()]
+        elapsed = time.perf_counter() - profile.started
+        if not profile.samples or elapsed < self.min_duration:
+            return None
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{_UNSAFE.sub('_', profile.label).strip('_')}-{elapsed * 1000:.0f}ms"
+        path = os.path.join(self.directory, f'{name}.folded')
+        suffix = 1
+        while os.path.exists(path):
+            suffix += 1
+            path = os.path.join(self.directory, f'{name}-{suffix}.folded')
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in profile.samples.most_common():
+                f.write(f'{stack} {count}\n')
+        with self._lock:
+            self.dumped += 1
+            self._written.append(path)
+            expired = [self._written.popleft() for _ in range(len(self._written) - self.keep)]
+        for old in expired:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+        return path
+
+    def _run(self, stop):
+        own = threading.get_ident()
+        while not stop.wait(self.interval):
+            with self._lock:
+                active = dict(self._active)
+            if not active:
+                continue
+            frames = sys._current_frames()
+            stacks = {}
+            for ident in active:
+                frame = frames.get(ident)
+                if frame is None or ident == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                    frame = frame.f_back
+                stacks[ident] = ';'.join(reversed(stack))
+            del frames
+            with self._lock:
+                # Requests that ended meanwhile have been written already
+                for ident, stack in stacks.items():
+                    profile = self._active.get(ident)
+                    if profile is active[ident]:
+                        profile.samples[stack] += 1
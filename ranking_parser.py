@@ -0,0 +1,415 @@
+"""
+Parsers for the playerzone ranking table (table#rgx-main-table).
+
+Backends, all producing the same player dicts:
+  - 'bs4'    BeautifulSoup with html.parser (the original implementation)
+  - 'lxml'   lxml's C parser and XPath, if lxml is installed
+  - 'stream' incremental stdlib parser that yields each row as soon as its
+             </tr> is read and never builds a document tree (fed straight
+             from the HTTP response by scraper.scrape_players)
+
+All of them raise RankingPageError for a page without the ranking table
+(e.g. an error page), skip rows without a player link and fall back to
+defaults for other missing cells (no rating badge: rating 0, not pro).
+"""
+from html.parser import HTMLParser
+import re
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+except ImportError:  # pragma: no cover - lxml is optional
+    lxml = None
+
+RANK_CLASS = 'bebas bold pos-col'
+CLUB_CLASS = 'player-club hide-on-med-and-down'
+CITY_CLASS = 'player-club hide-on-large-only'
+GAMES_CLASS = 'bebas games-col hide-on-small-only'
+
+_SHOW_HISTORY_RE = re.compile(r'show_history\((\d+),')
+_DIGITS_RE = re.compile(r'\d+')
+_TREND_RE = re.compile(r'([+-]?\d+)')
+
+
+class RankingPageError(ValueError):
+    """The page has no ranking table, e.g. an error or maintenance page."""
+
+    def __init__(self):
+        super().__init__("No ranking table (table#rgx-main-table) on the page")
+
+
+def build_player(division_label, rank_text, name, onclick, club, city, games_text,
+                 pro_status, elo_text, trend_text):
+    """Turn the raw strings of one table row into a player dict."""
+    # Remove trailing '.' if present (e.g. '1.' -> '1')
+    rank_str = rank_text.replace('.', '')
+
+    # e.g. show_history(265, 1) -> we want '265'
+    match = _SHOW_HISTORY_RE.search(onclick)
+    player_id = int(match.group(1)) if match else None
+
+    try:
+        games = int(games_text)
+    except ValueError:
+        games = 0
+
+    # Extract just the number from something like "1972"
+    elo_match = _DIGITS_RE.search(elo_text)
+    elo_rating = int(elo_match.group(0)) if elo_match else 0
+
+    # Check for "Keine Veränderung" to set trend to 0
+    if "Keine Veränderung" in trend_text or "No change" in trend_text:
+        trend_90_days = 0
+    else:
+        # Extract numerical trend: +26, -10, or 0
+        trend_match = _TREND_RE.search(trend_text)
+        trend_90_days = int(trend_match.group(1)) if trend_match else 0
+
+    return {
+        "name": name,
+        "player_id": player_id,
+        "rank": int(rank_str) if rank_str.isdigit() else None,
+        "club": club,
+        "city": city,
+        "games": games,
+        "elo_rating": elo_rating,
+        "division": division_label,  # "Open" or "Women"
+        "trend_90_days": trend_90_days,
+        "pro_status": pro_status,
+    }
+
+
+# ----------------------------------------------------------------------------
+# bs4 backend
+# ----------------------------------------------------------------------------
+def parse_players_bs4(html, division_label):
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Find the main table
+    table = soup.find('table', {'id': 'rgx-main-table'})
+    tbody = table.find('tbody') if table else None
+    if tbody is None:
+        raise RankingPageError()
+    rows = tbody.find_all('tr')
+
+    players = []
+    for row in rows:
+        # <td class="bebas bold pos-col">1.</td>
+        rank_td = row.find('td', class_=RANK_CLASS)
+        rank_text = rank_td.get_text(strip=True) if rank_td else ""
+
+        # <a href="#elo-history" class="modal-trigger bebas" onclick="show_history(265, 1)">Paul Siemer</a>
+        name_div = row.find('div', class_='player-name')
+        if not name_div or not name_div.a:
+            # If there's no <a>, skip this row
+            continue
+        name = name_div.a.get_text(strip=True)
+        onclick_val = name_div.a.get('onclick', '')
+
+        # <span class="player-club hide-on-med-and-down">1. Roundnet Club Köln</span>
+        club_span = row.find('span', class_=CLUB_CLASS)
+        club = club_span.get_text(strip=True) if club_span else ""
+        city_span = row.find('span', class_=CITY_CLASS)
+        city = city_span.get_text(strip=True) if city_span else ""
+
+        # <td class="bebas games-col hide-on-small-only"> 267 </td>
+        games_td = row.find('td', class_=GAMES_CLASS)
+        games_text = games_td.get_text(strip=True) if games_td else "0"
+
+        rgx_badge_div = row.find('div', class_='rgx-badge')
+        pro_status = rgx_badge_div is not None and 'pro-div' in rgx_badge_div.get('class', [])
+        rgx_value_span = rgx_badge_div.find('span', class_='rgx-value') if rgx_badge_div else None
+        elo_text = rgx_value_span.get_text(strip=True) if rgx_value_span else "0"
+
+        # Trend is stored in the nested <span class="hint" data-content="+26 Punkte in den letzten 90 Tagen">
+        hint_span = rgx_value_span.find('span', class_='hint') if rgx_value_span else None
+        trend_text = hint_span.get('data-content', '') if hint_span else ""
+
+        players.append(build_player(division_label, rank_text, name, onclick_val, club, city,
+                                    games_text, pro_status, elo_text, trend_text))
+    return players
+
+
+# ----------------------------------------------------------------------------
+# lxml backend
+# ----------------------------------------------------------------------------
+def _has_class(name):
+    return f'contains(concat(" ", normalize-space(@class), " "), " {name} ")'
+
+
+def _text(element):
+    # Same as bs4's get_text(strip=True): stripped text nodes joined without separator
+    return ''.join(t.strip() for t in element.itertext())
+
+
+_lxml_xpaths = None
+
+
+def _compiled_xpaths():
+    global _lxml_xpaths
+    if _lxml_xpaths is None:
+        from lxml import etree
+        _lxml_xpaths = {
+            key: etree.XPath(expr) for key, expr in {
+                'tbody': '//table[@id="rgx-main-table"]/tbody',
+                'rows': './/tr',
+                'rank': f'.//td[normalize-space(@class)="{RANK_CLASS}"]',
+                'name': f'(.//div[{_has_class("player-name")}])[1]//a',
+                'club': f'.//span[normalize-space(@class)="{CLUB_CLASS}"]',
+                'city': f'.//span[normalize-space(@class)="{CITY_CLASS}"]',
+                'games': f'.//td[normalize-space(@class)="{GAMES_CLASS}"]',
+                'badge': f'.//div[{_has_class("rgx-badge")}]',
+                'value': f'.//span[{_has_class("rgx-value")}]',
+                'hint': f'.//span[{_has_class("hint")}]',
+            }.items()
+        }
+    return _lxml_xpaths
+
+
+def parse_players_lxml(html, division_label):
+    if lxml is None:
+        raise RuntimeError("The 'lxml' parser backend needs the lxml package")
+
+    xp = _compiled_xpaths()
+    doc = lxml.html.fromstring(html)
+    tbody = xp['tbody'](doc)
+    if not tbody:
+        raise RankingPageError()
+    players = []
+    for row in xp['rows'](tbody[0]):
+        rank_td = xp['rank'](row)
+        rank_text = _text(rank_td[0]) if rank_td else ""
+
+        name_a = xp['name'](row)
+        if not name_a:
+            continue
+        name = _text(name_a[0])
+        onclick_val = name_a[0].get('onclick', '')
+
+        club_span = xp['club'](row)
+        club = _text(club_span[0]) if club_span else ""
+        city_span = xp['city'](row)
+        city = _text(city_span[0]) if city_span else ""
+
+        games_td = xp['games'](row)
+        games_text = _text(games_td[0]) if games_td else "0"
+
+        badge = xp['badge'](row)
+        pro_status = bool(badge) and 'pro-div' in (badge[0].get('class') or '').split()
+        value_span = xp['value'](badge[0]) if badge else []
+        elo_text = _text(value_span[0]) if value_span else "0"
+        hint_span = xp['hint'](value_span[0]) if value_span else []
+        trend_text = hint_span[0].get('data-content', '') if hint_span else ""
+
+        players.append(build_player(division_label, rank_text, name, onclick_val, club, city,
+                                    games_text, pro_status, elo_text, trend_text))
+    return players
+
+
+# ----------------------------------------------------------------------------
+# Streaming backend
+# ----------------------------------------------------------------------------
+_VOID_TAGS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+    'source', 'track', 'wbr'
+}
+
+
+class _RowExtractor(HTMLParser):
+    """
+    Event-driven extractor: keeps only the open-tag stack of the current row
+    and the few text fields it needs. Finished rows are queued in `rows`.
+    """
+
+    def __init__(self, division_label):
+        super().__init__(convert_charrefs=True)
+        self.division_label = division_label
+        self.rows = []
+        self.found_table = False  # saw the tbody of table#rgx-main-table
+        self._table_depth = 0     # nesting inside table#rgx-main-table
+        self._in_tbody = False
+        self._row = None
+        self._stack = []          # open tags inside the row: (tag, capture_field or None)
+        self._pending = []        # pieces of the current text node, split across feed() calls
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        attrs = dict(attrs)
+        if tag == 'table':
+            if self._table_depth or attrs.get('id') == 'rgx-main-table':
+                self._table_depth += 1
+            return
+        if not self._table_depth:
+            return
+        if tag == 'tbody' and self._table_depth == 1:
+            self._in_tbody = True
+            self.found_table = True
+            return
+        if not self._in_tbody:
+            return
+        if tag == 'tr':
+            if self._row is not None:
+                self._finish_row()
+            self._row = {'texts': {}, 'in_name_div': False}
+            self._stack = []
+            return
+        if self._row is None or tag in _VOID_TAGS:
+            return
+
+        self._stack.append((tag, self._capture_for(tag, attrs)))
+
+    def _capture_for(self, tag, attrs):
+        """Which field (if any) the text inside this element belongs to."""
+        row = self._row
+        texts = row['texts']
+        classes = (attrs.get('class') or '').split()
+        # Like bs4's class_='a b': the whole (whitespace-normalized) attribute must match
+        class_attr = ' '.join(classes)
+
+        if tag == 'td' and class_attr == RANK_CLASS and 'rank' not in texts:
+            texts['rank'] = []
+            return 'rank'
+        if tag == 'td' and class_attr == GAMES_CLASS and 'games' not in texts:
+            texts['games'] = []
+            return 'games'
+        if tag == 'span' and class_attr == CLUB_CLASS and 'club' not in texts:
+            texts['club'] = []
+            return 'club'
+        if tag == 'span' and class_attr == CITY_CLASS and 'city' not in texts:
+            texts['city'] = []
+            return 'city'
+        if tag == 'div' and 'player-name' in classes and 'name_div' not in row:
+            row['name_div'] = True
+            return 'name_div'
+        if tag == 'a' and self._inside('name_div') and 'name' not in texts:
+            texts['name'] = []
+            row['onclick'] = attrs.get('onclick') or ''
+            return 'name'
+        if tag == 'div' and 'rgx-badge' in classes and 'badge' not in row:
+            row['badge'] = True
+            row['pro_status'] = 'pro-div' in classes
+            return 'badge'
+        if tag == 'span' and 'rgx-value' in classes and self._inside('badge') and 'elo' not in texts:
+            texts['elo'] = []
+            return 'elo'
+        if tag == 'span' and 'hint' in classes and self._inside('elo') and 'trend' not in row:
+            row['trend'] = attrs.get('data-content') or ''
+        return None
+
+    def _inside(self, field):
+        return any(capture == field for _, capture in self._stack)
+
+    def handle_endtag(self, tag):
+        self._flush_text()
+        if not self._table_depth:
+            return
+        if tag == 'table':
+            self._table_depth -= 1
+            if not self._table_depth:
+                self._in_tbody = False
+            return
+        if tag == 'tbody' and self._table_depth == 1:
+            if self._row is not None:
+                self._finish_row()
+            self._in_tbody = False
+            return
+        if self._row is None:
+            return
+        if tag == 'tr':
+            self._finish_row()
+            return
+        # Pop up to the matching open tag; tolerates unclosed children
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i][0] == tag:
+                del self._stack[i:]
+                break
+
+    def handle_data(self, data):
+        if self._row is not None:
+            self._pending.append(data)
+
+    def _flush_text(self):
+        # Like get_text(strip=True), strip whole text nodes, not the chunks they arrived in
+        if not self._pending:
+            return
+        stripped = ''.join(self._pending).strip()
+        self._pending = []
+        if not stripped or self._row is None:
+            return
+        texts = self._row['texts']
+        for _, capture in self._stack:
+            if capture in texts:
+                texts[capture].append(stripped)
+
+    def _finish_row(self):
+        self._flush_text()
+        row, self._row, self._stack = self._row, None, []
+        texts = row['texts']
+        if 'name' not in texts:
+            # If there's no <a>, skip this row
+            return
+
+        def text(field, default):
+            return ''.join(texts[field]) if field in texts else default
+
+        self.rows.append(build_player(
+            self.division_label,
+            text('rank', ""),
+            text('name', ""),
+            row.get('onclick', ''),
+            text('club', ""),
+            text('city', ""),
+            text('games', "0"),
+            row.get('pro_status', False),
+            text('elo', "0"),
+            row.get('trend', ""),
+        ))
+
+
+def iter_players_stream(chunks, division_label):
+    """
+    Yield player dicts from an iterable of HTML text chunks (e.g. a streamed
+    HTTP response), each as soon as its row has been read. Raises
+    RankingPageError at the end if the page had no ranking table.
+    """
+    extractor = _RowExtractor(division_label)
+    for chunk in chunks:
+        extractor.feed(chunk)
+        if extractor.rows:
+            yield from extractor.rows
+            extractor.rows = []
+    extractor.close()
+    if extractor._row is not None:
+        extractor._finish_row()
+    yield from extractor.rows
+    if not extractor.found_table:
+        raise RankingPageError()
+
+
+def parse_players_stream(html, division_label, chunk_size=65536):
+    return list(iter_players_stream(
+        (html[i:i + chunk_size] for i in range(0, len(html), chunk_size)),
+        division_label
+    ))
+
+
+BACKENDS = {
+    'bs4': parse_players_bs4,
+    'lxml': parse_players_lxml,
+    'stream': parse_players_stream,
+}
+
+
+def default_backend():
+    return 'lxml' if lxml is not None else 'stream'
+
+
+def parse_players(html, division_label, backend=None):
+    """Parse a ranking page with `backend` (default: lxml if installed, else stream)."""
+    backend = backend or default_backend()
+    try:
+        parser = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown parser backend '{backend}', choose from {', '.join(BACKENDS)}")
+    return parser(html, division_label)
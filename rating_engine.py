@@ -0,0 +1,387 @@
+"""
+Local RGX rating engine: replays match results with the formula of /match.
+
+For every game (team1, team2, b, p) both players of team 1 move by
+
+    x1 = b * K * (p - e1),   e1 = rgx.expected_score(r1, r2)
+
+and both players of team 2 by -x1, where r1 and r2 are the summed ratings
+of the teams before the game. Ratings are kept as floats; playerzone shows
+them rounded.
+
+RatingEngine holds the rating of every player seen so far plus a log of all
+games applied (players, ratings before, e1, x1), from which per-player
+histories are read. Games are applied one at a time with apply() or in bulk
+with replay(): a bulk replay schedules the games into waves in which no
+player appears twice (wave = one more than the latest wave of any of its
+players), so each wave is a handful of NumPy operations over all its games
+and the result equals applying the games one by one in the given order.
+project() runs the same on a copy of the ratings, for "what if" questions.
+
+    python rating_engine.py replay season.csv --data-dir . --state state.npz
+    python rating_engine.py project state.npz upcoming.csv
+
+Game files are CSV (columns team1_player1, team1_player2, team2_player1,
+team2_player2, b, p and optionally division and date) or JSON lines
+({"team1": [a, b], "team2": [c, d], "b": 1, "p": 0.67, "division": "open"}).
+Players are keys of the form "<division>:<identifier>" when a game names its
+division, else the bare identifier; with --data-dir, "open:<player_id>" and
+"women:<player_id>" start at their scraped ratings.
+"""
+import argparse
+import csv
+import json
+import os
+
+import numpy as np
+
+import rgx
+
+DEFAULT_RATING = 1000.0
+CSV_PLAYER_COLUMNS = ('team1_player1', 'team1_player2', 'team2_player1', 'team2_player2')
+
+
+class RatingEngineError(ValueError):
+    """Invalid game or game file, reported to the client as HTTP 400."""
+
+
+def _check_result(b, p):
+    try:
+        b, p = float(b), float(p)
+    except (TypeError, ValueError):
+        raise RatingEngineError("'b' and 'p' must be numbers.")
+    if not b > 0:
+        raise RatingEngineError("'b' must be positive.")
+    if not 0 <= p <= 1:
+        raise RatingEngineError("'p' must be between 0 and 1.")
+    return b, p
+
+
+def _check_teams(team1, team2):
+    for name, team in (('team1', team1), ('team2', team2)):
+        if not (isinstance(team, (list, tuple)) and len(team) == 2):
+            raise RatingEngineError(f"{name} must be a list of two players.")
+        if not all(isinstance(player, (str, int)) and not isinstance(player, bool) for player in team):
+            raise RatingEngineError(f"The players of {name} must be strings or integers.")
+    if len({*team1, *team2}) != 4:
+        raise RatingEngineError("A player can only appear once per game.")
+
+
+def schedule_waves(players):
+    """
+    Wave of every game for an (n, 4) array of player indexes: 0 for a
+    player's first game, then one more than the wave of its previous game.
+    Games of one wave share no player.
+    """
+    latest = {}
+    waves = np.empty(len(players), dtype=np.int64)
+    for g, row in enumerate(players.tolist()):
+        wave = max(latest.get(i, -1) for i in row) + 1
+        for i in row:
+            latest[i] = wave
+        waves[g] = wave
+    return waves
+
+
+def run_games(ratings, players, b, p):
+    """
+    Apply games to `ratings` (float array, modified in place) in order.
+    players: (n, 4) indexes into ratings (team 1, team 1, team 2, team 2);
+    b, p: (n,) arrays. Returns (before, e1, x1): the (n, 4) ratings before
+    each game, team 1's expected score and team 1's change.
+    """
+    n = len(players)
+    before = np.empty((n, 4))
+    e1 = np.empty(n)
+    x1 = np.empty(n)
+    if n == 0:
+        return before, e1, x1
+
+    waves = schedule_waves(players)
+    order = np.argsort(waves, kind='stable')
+    bounds = np.cumsum(np.bincount(waves))
+    start = 0
+    for stop in bounds:
+        games = order[start:stop]
+        start = stop
+        idx = players[games]
+        current = ratings[idx]
+        r1 = current[:, 0] + current[:, 1]
+        r2 = current[:, 2] + current[:, 3]
+        e = 1.0 / (1 + 10.0 ** ((r2 - r1) / rgx.D))
+        x = b[games] * rgx.K * (p[games] - e)
+        # No index repeats within a wave, so plain fancy-index assignment is safe
+        ratings[idx] = current + np.column_stack((x, x, -x, -x))
+        before[games] = current
+        e1[games] = e
+        x1[games] = x
+    return before, e1, x1
+
+
+class RatingEngine:
+    """Per-player ratings plus the log of every game applied."""
+
+    def __init__(self, default_rating=DEFAULT_RATING):
+        self.default_rating = float(default_rating)
+        self.keys = []
+        self.index = {}  # key => position in self.ratings
+        self.ratings = np.empty(0)
+        # Game log, appended chunk by chunk and concatenated on read
+        self._log = {'players': [], 'before': [], 'e1': [], 'x1': [], 'b': [], 'p': []}
+        self._log_cache = None
+
+    # ------------------------------------------------------------------
+    # Players
+    # ------------------------------------------------------------------
+    def _indexes(self, keys):
+        """Positions of `keys`, adding unknown players at the default rating."""
+        positions = []
+        new = 0
+        for key in keys:
+            position = self.index.get(key)
+            if position is None:
+                position = self.index[key] = len(self.keys)
+                self.keys.append(key)
+                new += 1
+            positions.append(position)
+        if new:
+            self.ratings = np.concatenate((self.ratings, np.full(new, self.default_rating)))
+        return positions
+
+    def set_rating(self, key, rating):
+        position = self._indexes([key])[0]
+        self.ratings[position] = float(rating)
+
+    def rating(self, key):
+        position = self.index.get(key)
+        return self.default_rating if position is None else float(self.ratings[position])
+
+    def __len__(self):
+        return len(self.keys)
+
+    # ------------------------------------------------------------------
+    # Games
+    # ------------------------------------------------------------------
+    def _encode(self, games):
+        """[(team1, team2, b, p), ...] => (players, b, p) arrays."""
+        players, bs, ps = [], [], []
+        for team1, team2, b, p in games:
+            _check_teams(team1, team2)
+            b, p = _check_result(b, p)
+            players.append((*team1, *team2))
+            bs.append(b)
+            ps.append(p)
+        flat = self._indexes([key for row in players for key in row])
+        return np.array(flat, dtype=np.int64).reshape(-1, 4), np.array(bs), np.array(ps)
+
+    def _record(self, players, before, e1, x1, b, p):
+        for name, values in (('players', players), ('before', before), ('e1', e1),
+                             ('x1', x1), ('b', b), ('p', p)):
+            self._log[name].append(values)
+        self._log_cache = None
+
+    def apply(self, team1, team2, b, p):
+        """Apply one game; returns team 1's rating change."""
+        _check_teams(team1, team2)
+        b, p = _check_result(b, p)
+        idx = self._indexes([*team1, *team2])
+        current = [float(self.ratings[i]) for i in idx]
+        e1 = rgx.expected_score(current[0] + current[1], current[2] + current[3])
+        x1 = b * rgx.K * (p - e1)
+        for i, sign in zip(idx, (1, 1, -1, -1)):
+            self.ratings[i] += sign * x1
+        self._record(np.array([idx], dtype=np.int64), np.array([current]), np.array([e1]),
+                     np.array([x1]), np.array([b]), np.array([p]))
+        return x1
+
+    def replay(self, games):
+        """Apply [(team1, team2, b, p), ...] in order; returns team 1's change per game."""
+        players, b, p = self._encode(games)
+        before, e1, x1 = run_games(self.ratings, players, b, p)
+        self._record(players, before, e1, x1, b, p)
+        return x1
+
+    def project(self, games):
+        """
+        The outcome of `games` without applying them: {key: (rating before,
+        rating after, games played)} for every player in them, plus the
+        per-game (e1, x1) arrays.
+        """
+        known = len(self.keys)
+        players, b, p = self._encode(games)
+        ratings = self.ratings.copy()
+        _, e1, x1 = run_games(ratings, players, b, p)
+        involved, counts = np.unique(players, return_counts=True)
+        result = {
+            self.keys[i]: (float(self.ratings[i]), float(ratings[i]), int(count))
+            for i, count in zip(involved.tolist(), counts.tolist())
+        }
+        # Players first seen here are not kept
+        for key in self.keys[known:]:
+            del self.index[key]
+        del self.keys[known:]
+        self.ratings = self.ratings[:known]
+        return result, e1, x1
+
+    # ------------------------------------------------------------------
+    # History
+    # ------------------------------------------------------------------
+    def _game_log(self):
+        if self._log_cache is None:
+            if self._log['players']:
+                self._log_cache = {name: np.concatenate(chunks) for name, chunks in self._log.items()}
+                self._log = {name: [values] for name, values in self._log_cache.items()}
+            else:
+                self._log_cache = {
+                    'players': np.empty((0, 4), dtype=np.int64), 'before': np.empty((0, 4)),
+                    'e1': np.empty(0), 'x1': np.empty(0), 'b': np.empty(0), 'p': np.empty(0),
+                }
+        return self._log_cache
+
+    @property
+    def games_played(self):
+        return len(self._game_log()['players'])
+
+    def history(self, key):
+        """[{'game', 'rating_before', 'change', 'rating_after', 'e', 'b', 'p'}, ...] of one player."""
+        position = self.index.get(key)
+        if position is None:
+            return []
+        log = self._game_log()
+        games, slots = np.nonzero(log['players'] == position)
+        entries = []
+        for g, slot in zip(games.tolist(), slots.tolist()):
+            sign = 1 if slot < 2 else -1
+            before = float(log['before'][g, slot])
+            change = sign * float(log['x1'][g])
+            e1 = float(log['e1'][g])
+            entries.append({
+                'game': g,
+                'rating_before': before,
+                'change': change,
+                'rating_after': before + change,
+                'e': e1 if sign == 1 else 1 - e1,
+                'b': float(log['b'][g]),
+                'p': float(log['p'][g]) if sign == 1 else 1 - float(log['p'][g]),
+            })
+        return entries
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def save(self, path):
+        log = self._game_log()
+        with open(path, 'wb') as f:
+            np.savez_compressed(
+                f, keys=np.array(self.keys, dtype=str), ratings=self.ratings,
+                default_rating=np.array(self.default_rating), **log
+            )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            engine = cls(float(data['default_rating']))
+            engine._indexes(data['keys'].tolist())
+            engine.ratings = data['ratings'].copy()
+            engine._record(*(data[name] for name in ('players', 'before', 'e1', 'x1', 'b', 'p')))
+        return engine
+
+    @classmethod
+    def from_players(cls, players, default_rating=DEFAULT_RATING):
+        """Engine seeded with scraped ratings, keyed "<division>:<player_id>"."""
+        engine = cls(default_rating)
+        seeded = [p for p in players if p.get('player_id') is not None and p.get('elo_rating') is not None]
+        positions = engine._indexes([f"{p['division'].lower()}:{p['player_id']}" for p in seeded])
+        engine.ratings[positions] = [float(p['elo_rating']) for p in seeded]
+        return engine
+
+
+# ----------------------------------------------------------------------------
+# Game files
+# ----------------------------------------------------------------------------
+def _player_key(identifier, division):
+    identifier = str(identifier).strip()
+    return f'{division.lower()}:{identifier}' if division else identifier
+
+
+def read_games(path):
+    """[(team1, team2, b, p), ...] from a CSV or JSON lines file (see module docstring)."""
+    games = []
+    with open(path, encoding='utf-8', newline='') as f:
+        if path.endswith('.csv'):
+            rows = csv.DictReader(f)
+            missing = [c for c in CSV_PLAYER_COLUMNS + ('b', 'p') if c not in (rows.fieldnames or ())]
+            if missing:
+                raise RatingEngineError(f"{path}: missing columns {', '.join(missing)}")
+            for row in rows:
+                division = row.get('division') or ''
+                keys = [_player_key(row[c], division) for c in CSV_PLAYER_COLUMNS]
+                games.append((keys[:2], keys[2:], row['b'], row['p']))
+        else:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    game = json.loads(line)
+                    division = game.get('division') or ''
+                    games.append((
+                        [_player_key(i, division) for i in game['team1']],
+                        [_player_key(i, division) for i in game['team2']],
+                        game.get('b', 1.0),
+                        game['p']
+                    ))
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    raise RatingEngineError(f"{path}:{number}: invalid game ({e})")
+    return games
+
+
+def _load_players(data_dir):
+    players = []
+    for filename in ('men_players.json', 'women_players.json'):
+        with open(os.path.join(data_dir, filename), encoding='utf-8') as f:
+            players.extend(json.load(f))
+    return players
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay RGX match results locally.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    replay = sub.add_parser('replay', help="Apply a season of games and print the resulting ratings")
+    replay.add_argument('games', help="Game file (.csv or JSON lines)")
+    replay.add_argument('--state', help="Engine state (.npz) to continue from and save to")
+    replay.add_argument('--data-dir', help="Seed new state with the scraped ratings in this directory "
+                                           "(not with an existing --state)")
+    replay.add_argument('--default-rating', type=float, default=DEFAULT_RATING,
+                        help=f"Rating of players not seeded (default {DEFAULT_RATING:g})")
+    replay.add_argument('--top', type=int, default=20, help="Ratings to print (default 20)")
+    project = sub.add_parser('project', help="Ratings after hypothetical games, without saving them")
+    project.add_argument('state', help="Engine state (.npz)")
+    project.add_argument('games', help="Game file (.csv or JSON lines)")
+    args = parser.parse_args()
+
+    if args.command == 'replay':
+        if args.state and os.path.exists(args.state):
+            if args.data_dir:
+                parser.error(f"--data-dir only seeds new state, but {args.state} exists")
+            engine = RatingEngine.load(args.state)
+        elif args.data_dir:
+            engine = RatingEngine.from_players(_load_players(args.data_dir), args.default_rating)
+        else:
+            engine = RatingEngine(args.default_rating)
+        games = read_games(args.games)
+        engine.replay(games)
+        if args.state:
+            engine.save(args.state)
+        print(f"Replayed {len(games)} games; {engine.games_played} games, {len(engine)} players in total.")
+        order = np.argsort(-engine.ratings, kind='stable')[:args.top]
+        for i in order.tolist():
+            print(f"{engine.ratings[i]:9.1f}  {engine.keys[i]}")
+    else:
+        engine = RatingEngine.load(args.state)
+        projected, _, _ = engine.project(read_games(args.games))
+        for key, (before, after, played) in sorted(projected.items(), key=lambda item: item[1][0] - item[1][1]):
+            print(f"{before:9.1f} -> {after:9.1f} ({after - before:+.1f}, {played} games)  {key}")
+
+
+if __name__ == '__main__':
+    main()
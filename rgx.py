@@ -0,0 +1,106 @@
+"""
+RGX match formulas shared by /match, /match/batch and the simulations.
+
+For teams with summed ratings r1 and r2:
+
+    e1 = 1 / (1 + 10 ** ((r2 - r1) / D))     expected score of team 1
+    x1 = b * K * (p - e1)                     rating change of team 1
+
+where b weights the match format and p is team 1's share of the result.
+"""
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+D = 550
+K = 50
+
+# The (b, p) combinations reported for every pairing:
+# - b=1.0 => p in [0, 0.25, 0.33, 0.4, 0.5, 0.6, 0.67, 0.75, 1]
+# - b=0.75 => p in [0, 1]
+COMBOS_B_P = [
+    (1.0, 0), (1.0, 0.25), (1.0, 0.33), (1.0, 0.4), (1.0, 0.5),
+    (1.0, 0.6), (1.0, 0.67), (1.0, 0.75), (1.0, 1),
+    (0.75, 0), (0.75, 1)
+]
+
+# Descriptive text for b
+DESC_FOR_B = {
+    0.75: "One-set match",
+    1.0: "Best-of-3 or Best-of-5 match"
+}
+# Descriptive text for p in a 1-satzspiel
+DESC_FOR_P_B_075 = {
+    0: "Team1 lost 0:1 in a 1-set match",
+    1: "Team1 won 1:0 in a 1-set match"
+}
+# Descriptive text for p in Best-of-3/5
+DESC_FOR_P_B_1 = {
+    0:    "Team1 lost 0:1, 0:2, or 0:3",
+    0.25: "Team1 lost 1:3",
+    0.33: "Team1 lost 1:2",
+    0.4:  "-",
+    0.5:  "1:1 or 2:2",
+    0.6:  "Team1 won 3:2",
+    0.67: "Team1 won 2:1",
+    0.75: "Team1 won 3:1",
+    1:    "Team1 won 1:0, 2:0, or 3:0"
+}
+
+
+def describe_combination(b_val, p_val):
+    match_type = DESC_FOR_B[b_val]
+    if b_val == 0.75:
+        # 1-set
+        outcome_desc = DESC_FOR_P_B_075.get(p_val, "Invalid p for 1-set match")
+    else:
+        # b=1
+        outcome_desc = DESC_FOR_P_B_1.get(p_val, f"p={p_val} not recognized")
+    return f"{match_type}; {outcome_desc}"
+
+
+COMBO_DESCRIPTIONS = [describe_combination(b_val, p_val) for b_val, p_val in COMBOS_B_P]
+
+
+def expected_score(r1, r2):
+    return 1.0 / (1 + 10 ** ((r2 - r1) / D))
+
+
+def combination_results(r1, r2):
+    """The /match "combinations" list for summed team ratings r1 vs. r2."""
+    e1 = expected_score(r1, r2)
+    return [
+        {
+            "b": b_val,
+            "p": p_val,
+            "e1": round(e1, 4),
+            "x1": round(b_val * K * (p_val - e1), 4),
+            "description": description
+        }
+        for (b_val, p_val), description in zip(COMBOS_B_P, COMBO_DESCRIPTIONS)
+    ]
+
+
+def batch_outcomes(r1, r2):
+    """
+    Expected scores and gain matrix for many pairings at once.
+    r1, r2: sequences of summed team ratings. Returns (e1, x1) where e1[i] is
+    the expected score of pairing i and x1[i][j] team 1's change under
+    COMBOS_B_P[j]. NumPy arrays when numpy is installed, else lists.
+
+    The values can differ from combination_results() in the last bit of the
+    float, never after the 4-decimal rounding the responses use.
+    """
+    if np is None:
+        e1 = [expected_score(a, b) for a, b in zip(r1, r2)]
+        x1 = [[b_val * K * (p_val - e) for b_val, p_val in COMBOS_B_P] for e in e1]
+        return e1, x1
+
+    r1 = np.asarray(r1, dtype=np.int64)
+    r2 = np.asarray(r2, dtype=np.int64)
+    e1 = 1.0 / (1 + 10.0 ** ((r2 - r1) / D))
+    b = np.array([b_val for b_val, _ in COMBOS_B_P])
+    p = np.array([p_val for _, p_val in COMBOS_B_P], dtype=float)
+    x1 = b * K * (p[np.newaxis, :] - e1[:, np.newaxis])
+    return e1, x1
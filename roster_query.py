@@ -0,0 +1,197 @@
+import base64
+from bisect import bisect_left, bisect_right
+
+SORT_FIELDS = ('rank', 'elo_rating', 'games', 'trend_90_days', 'name', 'player_id')
+RANGE_FIELDS = {'rank': 'rank', 'elo': 'elo_rating'}
+PLAYER_FIELDS = (
+    'name', 'player_id', 'rank', 'club', 'city', 'games', 'elo_rating', 'division',
+    'trend_90_days', 'pro_status', 'exists_in_both_divisions'
+)
+QUERY_PARAMS = (
+    'division', 'club', 'city', 'pro_status', 'min_rank', 'max_rank', 'min_elo', 'max_elo',
+    'sort', 'fields', 'limit', 'offset', 'cursor'
+)
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+class QueryError(ValueError):
+    """Invalid /players query parameter, reported to the client as HTTP 400."""
+
+
+# ----------------------------------------------------------------------------
+# Precomputed per-snapshot structures (memoized on the Snapshot)
+# ----------------------------------------------------------------------------
+def _division_players(snapshot, division):
+    if division is None:
+        return snapshot.players
+    if division == 'open':
+        return snapshot.men_players
+    return snapshot.women_players
+
+
+def sorted_players(snapshot, division, field, descending=False):
+    """
+    Players of `division` (None = both) ordered by `field`, plus the parallel
+    list of sort keys for bisecting. Players without a value come last.
+    Orders stored with the snapshot are used as they are.
+    """
+    stored = snapshot.presorted(division, field, descending)
+    if stored is not None:
+        return stored
+
+    def build():
+        players = _division_players(snapshot, division)
+        with_value = [p for p in players if p.get(field) is not None]
+        without_value = [p for p in players if p.get(field) is None]
+        if field == 'name':
+            key = lambda p: p['name'].lower()  # noqa: E731
+        else:
+            key = lambda p: p[field]  # noqa: E731
+        with_value.sort(key=key, reverse=descending)
+        keys = [key(p) for p in with_value]
+        if descending:
+            # bisect needs ascending keys, so negate numbers for descending arrays
+            keys = [-k for k in keys] if field != 'name' else None
+        return with_value + without_value, keys
+
+    return snapshot.memo(('sorted', division, field, descending), build)
+
+
+def field_index(snapshot, division, field):
+    """Lowercased value of `field` (club/city) => set of snapshot.record_id()s."""
+    def build():
+        index = {}
+        for p in _division_players(snapshot, division):
+            index.setdefault((p.get(field) or '').lower(), set()).add(snapshot.record_id(p))
+        return index
+
+    return snapshot.memo(('field_index', division, field), build)
+
+
+# ----------------------------------------------------------------------------
+# Cursor encoding - offset bound to the snapshot generation it came from
+# ----------------------------------------------------------------------------
+def encode_cursor(generation, offset):
+    return base64.urlsafe_b64encode(f"{generation}:{offset}".encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, generation):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_generation, offset = base64.urlsafe_b64decode(padded).decode().split(':')
+        cursor_generation, offset = int(cursor_generation), int(offset)
+    except (ValueError, UnicodeDecodeError):
+        raise QueryError("Invalid 'cursor'.")
+    if cursor_generation != generation:
+        raise QueryError("Cursor belongs to an older data version; restart from the first page.")
+    return offset
+
+
+# ----------------------------------------------------------------------------
+# query_players - filter / sort / project / paginate against the snapshot
+# ----------------------------------------------------------------------------
+def _int_arg(args, name):
+    value = args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise QueryError(f"'{name}' must be an integer.")
+
+
+def query_players(snapshot, args):
+    """
+    Run a /players query given the request args (a mapping of strings).
+    Returns the response dict; raises QueryError for invalid parameters.
+
+    Rank/elo ranges on the sort field are resolved with a bisect on the
+    precomputed sorted array and club/city through per-division value
+    indexes, so only the candidate slice is checked and only the requested
+    page is serialized.
+    """
+    division = (args.get('division') or '').lower() or None
+    if division not in (None, 'open', 'women'):
+        raise QueryError("'division' must be 'open' or 'women'.")
+
+    sort = args.get('sort') or 'rank'
+    descending = sort.startswith('-')
+    sort_field = sort.lstrip('-')
+    if sort_field == 'elo':
+        sort_field = 'elo_rating'
+    if sort_field not in SORT_FIELDS:
+        raise QueryError(f"'sort' must be one of {', '.join(SORT_FIELDS)} (prefix '-' for descending).")
+
+    fields = None
+    if args.get('fields'):
+        fields = [f.strip() for f in args['fields'].split(',') if f.strip()]
+        unknown = [f for f in fields if f not in PLAYER_FIELDS]
+        if unknown:
+            raise QueryError(f"Unknown field(s) in 'fields': {', '.join(unknown)}")
+
+    limit = _int_arg(args, 'limit')
+    limit = DEFAULT_LIMIT if limit is None else max(1, min(limit, MAX_LIMIT))
+    if args.get('cursor'):
+        offset = decode_cursor(args['cursor'], snapshot.generation)
+    else:
+        offset = max(_int_arg(args, 'offset') or 0, 0)
+
+    ranges = {}
+    for param, field in RANGE_FIELDS.items():
+        low, high = _int_arg(args, f'min_{param}'), _int_arg(args, f'max_{param}')
+        if low is not None or high is not None:
+            ranges[field] = (low, high)
+
+    players, keys = sorted_players(snapshot, division, sort_field, descending)
+    start, end = 0, len(players)
+
+    # Range on the sort field => bisect the sorted array
+    if sort_field in ranges and keys is not None:
+        low, high = ranges.pop(sort_field)
+        if descending:
+            low, high = (-high if high is not None else None), (-low if low is not None else None)
+        start = bisect_left(keys, low) if low is not None else 0
+        end = bisect_right(keys, high) if high is not None else len(keys)
+
+    allowed = None
+    for field in ('club', 'city'):
+        value = args.get(field)
+        if value is not None:
+            ids = field_index(snapshot, division, field).get(value.strip().lower(), set())
+            allowed = ids if allowed is None else allowed & ids
+
+    pro_status = args.get('pro_status')
+    if pro_status is not None:
+        if pro_status.lower() not in ('true', 'false', '1', '0'):
+            raise QueryError("'pro_status' must be true or false.")
+        pro_status = pro_status.lower() in ('true', '1')
+
+    def matches(p):
+        if allowed is not None and snapshot.record_id(p) not in allowed:
+            return False
+        if pro_status is not None and p['pro_status'] != pro_status:
+            return False
+        for field, (low, high) in ranges.items():
+            value = p.get(field)
+            if value is None or (low is not None and value < low) or (high is not None and value > high):
+                return False
+        return True
+
+    candidates = players[start:end]
+    if allowed is not None or pro_status is not None or ranges:
+        candidates = [p for p in candidates if matches(p)]
+
+    page = list(candidates[offset:offset + limit])
+    if fields:
+        page = [{f: p.get(f) for f in fields} for p in page]
+
+    next_offset = offset + limit
+    return {
+        'total': len(candidates),
+        'offset': offset,
+        'limit': limit,
+        'next_cursor': encode_cursor(snapshot.generation, next_offset) if next_offset < len(candidates) else None,
+        'generation': snapshot.generation,
+        'players': page
+    }
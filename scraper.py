@@ -1,10 +1,23 @@
-import requests
-from bs4 import BeautifulSoup
+import argparse
+import hashlib
 import json
-import re
 import os
+import time
 
-def scrape_players(url, division_label):
+from http_client import get_client
+from player_diff import diff_players, is_empty
+import ranking_parser
+from snapshot_format import SNAPSHOT_FILENAME, write_snapshot
+import timeseries
+
+DEFAULT_BASE_URL = "https://playerzone.roundnetgermany.de"
+DIVISIONS = [
+    # (label, ranking path, output file)
+    ("Open", "/ranking/rg-index/1", "men_players.json"),
+    ("Women", "/ranking/rg-index/2", "women_players.json"),
+]
+
+def scrape_players(url, division_label, backend=None):
     """
     Scrape player data from the given URL (Open or Women) and return a list of dicts.
     Each dict includes:
@@ -18,137 +31,226 @@ def scrape_players(url, division_label):
         - trend_90_days
         - pro_status
     """
-    headers = {
-        'User-Agent': ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                       'AppleWebKit/537.36 (KHTML, like Gecko) '
-                       'Chrome/91.0.4472.124 Safari/537.36')
-    }
-    response = requests.get(url, headers=headers)
-    soup = BeautifulSoup(response.text, 'html.parser')
-    
-    # Find the main table
-    table = soup.find('table', {'id': 'rgx-main-table'})
-    tbody = table.find('tbody')
-    rows = tbody.find_all('tr')
-    
-    players = []
-    for row in rows:
-        # ----- Rank -----
-        # e.g. <td class="bebas bold pos-col">1.</td>
-        rank_td = row.find('td', class_='bebas bold pos-col')
-        rank_text = rank_td.get_text(strip=True) if rank_td else ""
-        # Remove trailing '.' if present (e.g. '1.' -> '1')
-        rank_str = rank_text.replace('.', '')
-        
-        # ----- Name & ID -----
-        # <a href="#elo-history" class="modal-trigger bebas" onclick="show_history(265, 1)">Paul Siemer</a>
-        name_div = row.find('div', class_='player-name')
-        if not name_div or not name_div.a:
-            # If there's no <a>, skip this row
-            continue
-        name = name_div.a.get_text(strip=True)
-        
-        # Extract the player ID from the onclick attribute
-        # e.g. show_history(265, 1) -> we want '265'
-        onclick_val = name_div.a.get('onclick', '')
-        # A quick regex to match show_history(265, or show_history(190,
-        match = re.search(r'show_history\((\d+),', onclick_val)
-        player_id = int(match.group(1)) if match else None
-        
-        # ----- Club -----
-        # <span class="player-club hide-on-med-and-down">1. Roundnet Club Köln</span>
-        club_span = row.find('span', class_='player-club hide-on-med-and-down')
-        club = club_span.get_text(strip=True) if club_span else ""
-
-        # ----- City -----
-        city_span = row.find('span', class_='player-club hide-on-large-only')
-        city = city_span.get_text(strip=True) if city_span else ""
-        
-        # ----- Number of Games -----
-        # <td class="bebas games-col hide-on-small-only"> 267 </td>
-        games_td = row.find('td', class_='bebas games-col hide-on-small-only')
-        games_text = games_td.get_text(strip=True) if games_td else "0"
+    if (backend or ranking_parser.default_backend()) == 'stream':
+        # Rows are parsed while the page is still downloading
+        response = get_client().get(url, stream=True)
         try:
-            games = int(games_text)
-        except ValueError:
-            games = 0
-        
-        # ----- ELO Rating & Trend -----
-        rgx_badge_div = row.find('div', class_='rgx-badge')
-        pro_status = 'pro-div' in rgx_badge_div.get('class', [])
+            response.raise_for_status()
+            if response.encoding is None:
+                response.encoding = 'utf-8'
+            chunks = response.iter_content(chunk_size=65536, decode_unicode=True)
+            return list(ranking_parser.iter_players_stream(chunks, division_label))
+        finally:
+            response.close()
+
+    response = get_client().get(url)
+    response.raise_for_status()
+    return parse_players(response.text, division_label, backend)
+
+
+def parse_players(html, division_label, backend=None):
+    """
+    Parse the ranking table of a downloaded ranking page into player dicts
+    (see scrape_players for the fields). `backend` picks the parser, see
+    ranking_parser (default: lxml if installed, else the streaming parser).
+    """
+    return ranking_parser.parse_players(html, division_label, backend)
+
+
+class EmptyRosterError(RuntimeError):
+    """A scrape parsed no players where the saved roster has some."""
+
+
+def check_not_emptied(label, players, path):
+    """
+    Refuse to replace the non-empty roster at `path` with an empty one: a
+    ranking table without rows is far more likely a broken page than a
+    division that lost every player.
+    """
+    if not players and load_json(path, []):
+        raise EmptyRosterError(f"Parsed 0 {label} players; keeping the existing {os.path.basename(path)}")
+
+
+def mark_both_divisions(men_players, women_players):
+    """Set "exists_in_both_divisions" on every player of both lists."""
+    # We'll do this by matching player_id (or name). If either ID or name matches, we consider them "in both".
+    # A robust approach is to check by ID, since it's unique on the site.
+    men_ids = set(p["player_id"] for p in men_players if p["player_id"])
+    women_ids = set(p["player_id"] for p in women_players if p["player_id"])
+    both_ids = men_ids.intersection(women_ids)
+
+    for p in men_players:
+        p["exists_in_both_divisions"] = (p["player_id"] in both_ids)
+    for p in women_players:
+        p["exists_in_both_divisions"] = (p["player_id"] in both_ids)
+
+
+def write_json_tmp(path, data, indent=4):
+    """Write JSON to a temp file next to `path`; returns the temp file's path."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    return tmp_path
+
+
+def write_json_atomic(path, data, indent=4):
+    """Write JSON to a temp file next to `path` and rename it over `path`."""
+    os.replace(write_json_tmp(path, data, indent), path)
+
+
+def write_rosters(data_dir, men_players, women_players, divisions=("Open", "Women")):
+    """
+    Write the JSON exports of `divisions` and players.pzc as one update.
+
+    The JSON exports are written to temp files first, then players.pzc is
+    written and renamed into place, then the exports. players.pzc is the
+    first file to change and stays newer than the exports, so a PlayerStore
+    in 'auto' mode reloads once, from players.pzc, instead of once per file.
+    """
+    rosters = {"Open": men_players, "Women": women_players}
+    renames = [(write_json_tmp(os.path.join(data_dir, filename), rosters[label]), os.path.join(data_dir, filename))
+               for label, _, filename in DIVISIONS if label in divisions]
+    write_snapshot(os.path.join(data_dir, SNAPSHOT_FILENAME),
+                   {'men_players': men_players, 'women_players': women_players})
+    for tmp_path, path in renames:
+        os.replace(tmp_path, path)
+
+
+def record_timeseries(data_dir, men_players, women_players, taken_at=None):
+    """Append the scrape to the time series database (see timeseries.py)."""
+    timeseries.record_scrape(timeseries.default_path(data_dir), men_players, women_players, taken_at)
+
+
+def load_json(path, default):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
 
-        rgx_value_span = rgx_badge_div.find('span', class_='rgx-value')
-        elo_text = rgx_value_span.get_text(strip=True) if rgx_value_span else "0"
+# ----------------------------------------------------------------------------
+# Incremental mode
+# ----------------------------------------------------------------------------
+def fetch_if_changed(url, page_state):
+    """
+    Conditional GET of a ranking page. `page_state` holds the previous
+    etag / last_modified / content_hash of this URL and is updated in place.
+    Returns the HTML, or None if the page did not change.
+    """
+    headers = {}
+    if page_state.get('etag'):
+        headers['If-None-Match'] = page_state['etag']
+    if page_state.get('last_modified'):
+        headers['If-Modified-Since'] = page_state['last_modified']
 
-        # Extract just the number from something like "1972"
-        elo_match = re.search(r'\d+', elo_text)
-        elo_rating = int(elo_match.group(0)) if elo_match else 0
+    response = get_client().get(url, headers=headers)
+    if response.status_code == 304:
+        return None
+    response.raise_for_status()
 
-        # Trend is stored in the nested <span class="hint" data-content="+26 Punkte in den letzten 90 Tagen">
-        hint_span = rgx_value_span.find('span', class_='hint') if rgx_value_span else None
-        trend_text = hint_span.get('data-content', '') if hint_span else ""
+    content_hash = hashlib.sha256(response.content).hexdigest()
+    unchanged = content_hash == page_state.get('content_hash')
+    page_state['etag'] = response.headers.get('ETag')
+    page_state['last_modified'] = response.headers.get('Last-Modified')
+    page_state['content_hash'] = content_hash
+    return None if unchanged else response.text
 
-        # Check for "Keine Veränderung" to set trend to 0
-        if "Keine Veränderung" in trend_text or "No change" in trend_text:
-            trend_90_days = 0
+
+def scrape_incremental(data_dir, base_url, backend=None):
+    """
+    Re-scrape only ranking pages that changed since the last run, diff the
+    parsed players against the previous snapshot and append the differences
+    to player_deltas.jsonl. Snapshot files are only rewritten (atomically),
+    and the scrape only appended to the time series, if players actually
+    changed. Returns the list of per-division deltas.
+    """
+    state_path = os.path.join(data_dir, 'scrape_state.json')
+    state = load_json(state_path, {})
+
+    previous = {}
+    current = {}
+    changed_divisions = []
+    for label, path, filename in DIVISIONS:
+        previous[label] = load_json(os.path.join(data_dir, filename), [])
+        url = base_url + path
+        html = fetch_if_changed(url, state.setdefault(url, {}))
+        if html is None:
+            print(f"{label} ranking unchanged upstream.")
+            # Copies, so re-marking both-division flags can't alter `previous`
+            current[label] = [dict(p) for p in previous[label]]
         else:
-            # Extract numerical trend: +26, -10, or 0
-            trend_match = re.search(r'([+-]?\d+)', trend_text)
-            trend_90_days = int(trend_match.group(1)) if trend_match else 0
+            print(f"Parsing changed {label} ranking...")
+            current[label] = parse_players(html, label, backend)
+            check_not_emptied(label, current[label], os.path.join(data_dir, filename))
+            changed_divisions.append(label)
+
+    deltas = []
+    if changed_divisions:
+        mark_both_divisions(current["Open"], current["Women"])
+        timestamp = time.time()
+        for label, _, filename in DIVISIONS:
+            diff = diff_players(previous[label], current[label])
+            if not is_empty(diff):
+                deltas.append({'timestamp': timestamp, 'division': label, **diff})
+
+        if deltas:
+            write_rosters(data_dir, current["Open"], current["Women"], [delta['division'] for delta in deltas])
+            record_timeseries(data_dir, current["Open"], current["Women"], timestamp)
+            with open(os.path.join(data_dir, 'player_deltas.jsonl'), 'a', encoding='utf-8') as f:
+                for delta in deltas:
+                    f.write(json.dumps(delta, ensure_ascii=False) + "\n")
+
+    write_json_atomic(state_path, state, indent=2)
+    return deltas
 
-        
-        # ----- Append data -----
-        # Store all your relevant data
-        players.append({
-            "name": name,
-            "player_id": player_id,
-            "rank": int(rank_str) if rank_str.isdigit() else None,
-            "club": club,
-            "city": city,
-            "games": games,
-            "elo_rating": elo_rating,
-            "division": division_label,  # "Open" or "Women"
-            "trend_90_days": trend_90_days,
-            "pro_status": pro_status,
-        })
-    
-    return players
 
 def main():
-    # URLs for men's (Open) and women's rankings
-    men_url = "https://playerzone.roundnetgermany.de/ranking/rg-index/1"
-    women_url = "https://playerzone.roundnetgermany.de/ranking/rg-index/2"
-    
+    parser = argparse.ArgumentParser(description="Scrape the playerzone RGX rankings.")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Skip unchanged pages, write only changed snapshots and log per-player deltas")
+    parser.add_argument('--base-url', default=os.environ.get('PLAYERZONE_BASE_URL', DEFAULT_BASE_URL),
+                        help="playerzone base URL (default: $PLAYERZONE_BASE_URL or the live site)")
+    parser.add_argument('--parser', choices=sorted(ranking_parser.BACKENDS), default=None,
+                        help=f"HTML parser backend (default: {ranking_parser.default_backend()})")
+    args = parser.parse_args()
+    base_url = args.base_url.rstrip('/')
+    current_dir = os.environ.get('PLAYERZONE_DATA_DIR', os.path.dirname(os.path.abspath(__file__)))
+
     try:
+        if args.incremental:
+            deltas = scrape_incremental(current_dir, base_url, args.parser)
+            if not deltas:
+                print("No player changes.")
+            for delta in deltas:
+                print(f"{delta['division']}: {len(delta['added'])} added, {len(delta['removed'])} removed, "
+                      f"{len(delta['changed'])} changed.")
+            return
+
+        # URLs for men's (Open) and women's rankings
+        men_url = base_url + DIVISIONS[0][1]
+        women_url = base_url + DIVISIONS[1][1]
+
         print("Scraping Open (Men's) rankings...")
-        men_players = scrape_players(men_url, "Open")
+        men_players = scrape_players(men_url, "Open", args.parser)
         
         print("Scraping Women rankings...")
-        women_players = scrape_players(women_url, "Women")
+        women_players = scrape_players(women_url, "Women", args.parser)
 
         # Detect players that exist in both divisions
-        # We'll do this by matching player_id (or name). If either ID or name matches, we consider them "in both".
-        # A robust approach is to check by ID, since it's unique on the site.
-        men_ids = set(p["player_id"] for p in men_players if p["player_id"])
-        women_ids = set(p["player_id"] for p in women_players if p["player_id"])
-        both_ids = men_ids.intersection(women_ids)
-        
-        # Mark them as "exists_in_both_divisions"
-        for p in men_players:
-            p["exists_in_both_divisions"] = (p["player_id"] in both_ids)
-        for p in women_players:
-            p["exists_in_both_divisions"] = (p["player_id"] in both_ids)
-
-        # Save to JSON files
-        current_dir = os.path.dirname(os.path.abspath(__file__))
+        mark_both_divisions(men_players, women_players)
+
+        # Save the JSON exports and players.pzc (temp files + rename, so readers never
+        # see half-written files, and the API reloads once; see write_rosters)
         men_path = os.path.join(current_dir, 'men_players.json')
         women_path = os.path.join(current_dir, 'women_players.json')
-        
-        with open(men_path, 'w', encoding='utf-8') as f:
-            json.dump(men_players, f, ensure_ascii=False, indent=4)
-        
-        with open(women_path, 'w', encoding='utf-8') as f:
-            json.dump(women_players, f, ensure_ascii=False, indent=4)
+        check_not_emptied("Open", men_players, men_path)
+        check_not_emptied("Women", women_players, women_path)
+
+        write_rosters(current_dir, men_players, women_players)
+        record_timeseries(current_dir, men_players, women_players)
         
         print(f"Successfully scraped {len(men_players)} Open players and {len(women_players)} Women players.")
         
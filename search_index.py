@@ -0,0 +1,228 @@
+from bisect import bisect_left
+from collections import Counter
+import re
+
+from fuzzywuzzy import fuzz as baseline_fuzz
+from fuzzywuzzy.utils import full_process
+
+try:
+    from rapidfuzz import fuzz, process
+    from rapidfuzz.utils import default_process
+    HAVE_RAPIDFUZZ = True
+except ImportError:  # pragma: no cover - fallback when rapidfuzz is missing
+    default_process = full_process
+    HAVE_RAPIDFUZZ = False
+
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _trigrams(processed):
+    """Character trigrams of a processed name, padded so short names still yield some."""
+    padded = f"  {_WHITESPACE.sub(' ', processed)} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _process(name):
+    """
+    The string process.extractOne(query, names) scores: the default processor,
+    then WRatio's ASCII-only processing ('Schäfer' => 'schfer').
+    """
+    return full_process(full_process(name), force_ascii=True)
+
+
+def _score(query, choice):
+    """fuzzywuzzy's WRatio on already processed strings, the score extractOne returns."""
+    return baseline_fuzz.WRatio(query, choice, full_process=False)
+
+
+# ----------------------------------------------------------------------------
+# NameSearchIndex - fuzzy name matching built once per player snapshot
+# ----------------------------------------------------------------------------
+class NameSearchIndex:
+    """
+    Drop-in replacement for `process.extractOne(query, names)`, returning the
+    same (name, score) including which name wins a tie (the first one).
+
+    Lookup:
+      1) A name processing to the same string as the query scores 100 and
+         nothing can beat it, so the first such name is returned right away
+      2) Candidates are pruned with a trigram inverted index: the names
+         sharing the most trigrams with the query form a shortlist, which is
+         scored with fuzzywuzzy's WRatio
+      3) rapidfuzz's WRatio (C implementation, when installed) never scores a
+         pair more than one point below fuzzywuzzy's: its ratios use the
+         longest common subsequence, which is at least as long as the matches
+         difflib finds. So only names whose rapidfuzz score comes within a
+         point of the best score so far can still beat it or win the tie, and
+         only those are scored with fuzzywuzzy. Without rapidfuzz every name
+         is scored.
+    """
+
+    def __init__(self, names, shortlist_size=64, max_posting_ratio=0.2):
+        self.shortlist_size = shortlist_size
+
+        # Deduplicate spellings; keep first-seen order so ties resolve like extractOne
+        self.names = list(dict.fromkeys(names))
+        self.processed = [_process(name) for name in self.names]
+
+        self.first_by_processed = {}
+        postings = {}
+        for idx, processed in enumerate(self.processed):
+            self.first_by_processed.setdefault(processed, idx)
+            for gram in _trigrams(processed):
+                postings.setdefault(gram, []).append(idx)
+
+        # Trigrams shared by a large part of the roster ("  j", "er ") barely
+        # discriminate but dominate counting cost, so they are left out.
+        max_postings = max(shortlist_size, int(len(self.names) * max_posting_ratio))
+        self.postings = {gram: ids for gram, ids in postings.items() if len(ids) <= max_postings}
+
+    def __len__(self):
+        return len(self.names)
+
+    def shortlist(self, processed_query, size=None):
+        """Indices of the names sharing most trigrams with the query, ascending."""
+        size = size or self.shortlist_size
+        counts = Counter()
+        for gram in _trigrams(processed_query):
+            ids = self.postings.get(gram)
+            if ids:
+                counts.update(ids)
+        return sorted(idx for idx, _ in counts.most_common(size))
+
+    def extract_one(self, query):
+        """
+        Returns (name, score) of the best match, or None for an empty index.
+        Same result as fuzzywuzzy's process.extractOne with default scorer.
+        """
+        if not self.names:
+            return None
+
+        processed_query = _process(query)
+        if not processed_query:
+            # extractOne scores everything 0 and returns the first choice
+            return self.names[0], 0
+
+        # difflib's ratio only rounds to 100 from 0.995 on, which a pair of
+        # different strings shorter than 100 characters cannot reach.
+        exact_idx = self.first_by_processed.get(processed_query)
+        if exact_idx is not None and len(processed_query) < 100:
+            return self.names[exact_idx], 100
+
+        # The shortlist usually holds the best name, which makes the cutoff
+        # for the pass over all names tight.
+        scored = set()
+        best = self._best_of(processed_query, self._bounds(processed_query, self.shortlist(processed_query)),
+                             (None, -1), scored)
+        best = self._best_of(processed_query, self._bounds(processed_query, score_cutoff=best[1]), best, scored)
+        best_idx, best_score = best
+        return self.names[best_idx], best_score
+
+    def extract(self, query, limit=10):
+        """
+        Top `limit` (name, score) pairs among the trigram shortlist, best first.
+        Meant for suggestions, so unlike extract_one it never scans everything.
+        """
+        processed_query = _process(query)
+        if not processed_query:
+            return []
+        scored = [
+            (self.names[idx], _score(processed_query, self.processed[idx]))
+            for idx in self.shortlist(processed_query)
+        ]
+        scored.sort(key=lambda item: -item[1])
+        return scored[:limit]
+
+    def _bounds(self, processed_query, indices=None, score_cutoff=0):
+        """
+        (index, highest possible score) of the names at `indices` (default:
+        all) that may score at least score_cutoff, highest bound first.
+        """
+        if not HAVE_RAPIDFUZZ:
+            return [(idx, 100) for idx in (range(len(self.names)) if indices is None else indices)]
+        if indices is None:
+            results = process.extract(
+                processed_query, self.processed, scorer=fuzz.WRatio, processor=None,
+                score_cutoff=max(score_cutoff - 1, 0), limit=None
+            )
+            bounds = [(idx, int(score) + 1) for _, score, idx in results]
+        else:
+            bounds = [(idx, int(fuzz.WRatio(processed_query, self.processed[idx])) + 1) for idx in indices]
+        bounds.sort(key=lambda item: -item[1])
+        return bounds
+
+    def _best_of(self, processed_query, bounds, best, scored):
+        """
+        Scores the names in `bounds` that can still beat `best` = (index,
+        score), or tie it from an earlier index, and returns the new best.
+        """
+        best_idx, best_score = best
+        for idx, bound in bounds:
+            if bound < best_score:
+                break
+            if idx in scored or (bound == best_score and idx > best_idx):
+                continue
+            scored.add(idx)
+            score = _score(processed_query, self.processed[idx])
+            if score > best_score or (score == best_score and idx < best_idx):
+                best_idx, best_score = idx, score
+        return best_idx, best_score
+
+
+# ----------------------------------------------------------------------------
+# SuggestIndex - prefix autocomplete over player records
+# ----------------------------------------------------------------------------
+class SuggestIndex:
+    """
+    Sorted prefix array for autocomplete. Every player is reachable by the
+    start of their full name, of any later name part ("sie" => Paul Siemer)
+    and of their player ID. Lookups are a bisect plus a short forward scan.
+    """
+
+    # Forward scan budget per lookup, keeps one-letter queries cheap
+    MAX_SCAN = 500
+
+    def __init__(self, players):
+        self.players = players
+        entries = []
+        for idx, player in enumerate(players):
+            processed = _WHITESPACE.sub(' ', default_process(player['name']))
+            if processed:
+                entries.append((processed, 0, idx))
+                for pos, char in enumerate(processed):
+                    if char == ' ':
+                        entries.append((processed[pos + 1:], 1, idx))
+            if player.get('player_id') is not None:
+                entries.append((str(player['player_id']), 0, idx))
+        entries.sort()
+        self.keys = [key for key, _, _ in entries]
+        self.entries = [(kind, idx) for _, kind, idx in entries]
+
+    def prefix(self, query, limit=10, division=None):
+        """
+        Players whose name, name part or ID starts with `query`.
+        Returns player dicts; full-name prefixes rank before name-part hits,
+        then better ranked players first.
+        """
+        processed_query = _WHITESPACE.sub(' ', default_process(query))
+        if not processed_query:
+            return []
+
+        division = division.lower() if division else None
+        best_kind = {}
+        pos = bisect_left(self.keys, processed_query)
+        end = min(len(self.keys), pos + self.MAX_SCAN)
+        while pos < end and self.keys[pos].startswith(processed_query):
+            kind, idx = self.entries[pos]
+            player = self.players[idx]
+            if division is None or player['division'].lower() == division:
+                if kind < best_kind.get(idx, 2):
+                    best_kind[idx] = kind
+            pos += 1
+
+        def sort_key(idx):
+            rank = self.players[idx].get('rank')
+            return best_kind[idx], rank if rank is not None else float('inf'), idx
+
+        return [self.players[idx] for idx in sorted(best_kind, key=sort_key)[:limit]]
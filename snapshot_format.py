@@ -0,0 +1,476 @@
+"""
+Columnar binary snapshot of both division rosters (players.pzc).
+
+Layout (little endian, every section 8-byte aligned):
+
+    magic    8 bytes  b'PZCOL\\x00\\x01\\x00'
+    u32      length of the JSON header
+    u32      reserved (0)
+    header   UTF-8 JSON: generation, row count, roster ranges, schema and
+             all sections as {name: {'offset', 'length'}}
+    strings  u32 offsets (count + 1) followed by one UTF-8 blob. Every
+             string value (names, clubs, cities, divisions) is stored once.
+    columns  'int'  int32 per row, INT_NULL for None
+             'bool' uint8 per row, 0/1, BOOL_NULL for None
+             'str'  uint32 index into the string table, STR_NULL for None
+    indexes  id / name lookup tables and presorted row orders, see
+             _index_sections()
+
+ColumnarSnapshot copies the file into Python arrays; MappedColumns maps it
+read-only, so every process reading the same file shares its pages.
+
+The JSON division files stay the export format; `python snapshot_format.py
+export` writes them back from a columnar snapshot.
+"""
+import argparse
+from array import array
+from bisect import bisect_left, bisect_right
+import json
+import os
+import mmap
+import struct
+import sys
+import time
+
+from names import normalize_name
+
+MAGIC = b'PZCOL\x00\x01\x00'
+SNAPSHOT_FILENAME = 'players.pzc'
+ROSTERS = ('men_players', 'women_players')
+
+INT_NULL = -2 ** 31
+BOOL_NULL = 2
+STR_NULL = 2 ** 32 - 1
+
+# Player fields in the order the scraper builds them
+SCHEMA = (
+    ('name', 'str'),
+    ('player_id', 'int'),
+    ('rank', 'int'),
+    ('club', 'str'),
+    ('city', 'str'),
+    ('games', 'int'),
+    ('elo_rating', 'int'),
+    ('division', 'str'),
+    ('trend_90_days', 'int'),
+    ('pro_status', 'bool'),
+    ('exists_in_both_divisions', 'bool'),
+)
+TYPECODES = {'int': 'i', 'bool': 'B', 'str': 'I'}
+ALIGN = 8
+
+# Presorted row orders stored for /players queries: scope => roster (None = all rows)
+ORDER_SCOPES = (('all', None), ('open', 'men_players'), ('women', 'women_players'))
+ORDER_FIELDS = ('rank', 'elo_rating')
+
+_PREAMBLE = struct.Struct('<8sII')
+
+
+class SnapshotFormatError(ValueError):
+    """The file is not a (supported) columnar snapshot."""
+
+
+def _pad(length):
+    return -length % ALIGN
+
+
+def _to_bytes(arr):
+    if sys.byteorder == 'big':
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _from_bytes(typecode, data):
+    arr = array(typecode)
+    arr.frombytes(data)
+    if sys.byteorder == 'big':
+        arr.byteswap()
+    return arr
+
+
+# ----------------------------------------------------------------------------
+# Writing
+# ----------------------------------------------------------------------------
+def _index_sections(players, ranges, intern):
+    """
+    Lookup structures stored after the columns so mapped readers need no
+    per-process index building:
+      - index_id_keys / index_id_rows       player_id => rows, sorted by id
+      - index_name_keys / index_name_rows   normalized name (string id) => rows
+      - order_<scope>_<field>_<asc|desc>    rows of a scope sorted by field,
+                                            rows without a value last
+    """
+    sections = []
+    with_id = sorted((p['player_id'], row) for row, p in enumerate(players) if p.get('player_id') is not None)
+    sections.append(('index_id_keys', array('i', [key for key, _ in with_id])))
+    sections.append(('index_id_rows', array('I', [row for _, row in with_id])))
+
+    by_name = sorted((normalize_name(p['name']), row) for row, p in enumerate(players) if p.get('name') is not None)
+    sections.append(('index_name_keys', array('I', [intern(key) for key, _ in by_name])))
+    sections.append(('index_name_rows', array('I', [row for _, row in by_name])))
+
+    orders = {}
+    for scope, roster in ORDER_SCOPES:
+        roster_range = range(*ranges[roster]) if roster else range(len(players))
+        for field in ORDER_FIELDS:
+            with_value = [row for row in roster_range if players[row].get(field) is not None]
+            without_value = [row for row in roster_range if players[row].get(field) is None]
+            ascending = sorted(with_value, key=lambda row: players[row][field])
+            # Like list.sort(reverse=True): descending, ties keep roster order
+            descending = sorted(with_value, key=lambda row: -players[row][field])
+            for direction, rows in (('asc', ascending), ('desc', descending)):
+                name = order_section(scope, field, direction == 'desc')
+                sections.append((name, array('I', rows + without_value)))
+                orders[name] = len(rows)
+    return sections, orders
+
+
+def order_section(scope, field, descending):
+    return f"order_{scope}_{field}_{'desc' if descending else 'asc'}"
+
+
+def encode_snapshot(rosters, generation=None):
+    """
+    Encode {'men_players': [...], 'women_players': [...]} (player dicts in
+    the scraper's schema) into the columnar format. Returns bytes.
+    `generation` identifies the data version across processes (default: the
+    current time in microseconds).
+    """
+    players = []
+    ranges = {}
+    for roster in ROSTERS:
+        start = len(players)
+        players.extend(rosters.get(roster, []))
+        ranges[roster] = [start, len(players)]
+
+    strings = []
+    string_ids = {}
+
+    def intern(value):
+        if value is None:
+            return STR_NULL
+        index = string_ids.get(value)
+        if index is None:
+            index = string_ids[value] = len(strings)
+            strings.append(value)
+        return index
+
+    columns = []
+    for field, kind in SCHEMA:
+        values = [p.get(field) for p in players]
+        if kind == 'int':
+            data = array('i', [INT_NULL if v is None else v for v in values])
+        elif kind == 'bool':
+            data = array('B', [BOOL_NULL if v is None else int(bool(v)) for v in values])
+        else:
+            data = array('I', [intern(v) for v in values])
+        columns.append((field, data))
+    indexes, orders = _index_sections(players, ranges, intern)
+
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = array('I', [0])
+    for blob in encoded:
+        offsets.append(offsets[-1] + len(blob))
+    sections = [('string_offsets', _to_bytes(offsets)), ('string_data', b''.join(encoded))]
+    sections += [(name, _to_bytes(data)) for name, data in columns + indexes]
+
+    # Offsets depend on the header length, which depends on the offsets:
+    # lay out relative to the header end and fix up in a second pass.
+    def layout(base):
+        offset = base
+        placed = {}
+        for name, data in sections:
+            placed[name] = {'offset': offset, 'length': len(data)}
+            offset += len(data) + _pad(len(data))
+        return placed
+
+    header = {
+        'version': 1,
+        'generation': generation if generation is not None else time.time_ns() // 1000,
+        'count': len(players),
+        'rosters': ranges,
+        'string_count': len(strings),
+        'schema': [list(item) for item in SCHEMA],
+        'orders': orders,
+    }
+    base = 0
+    while True:
+        header['sections'] = layout(base)
+        header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+        new_base = _PREAMBLE.size + len(header_bytes) + _pad(_PREAMBLE.size + len(header_bytes))
+        if new_base == base:
+            break
+        base = new_base
+
+    out = [_PREAMBLE.pack(MAGIC, len(header_bytes), 0), header_bytes, b'\0' * _pad(_PREAMBLE.size + len(header_bytes))]
+    for _, data in sections:
+        out.append(data)
+        out.append(b'\0' * _pad(len(data)))
+    return b''.join(out)
+
+
+def write_snapshot(path, rosters, generation=None):
+    """encode_snapshot() into a temp file next to `path`, then rename it over `path`."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(encode_snapshot(rosters, generation))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+# ----------------------------------------------------------------------------
+# Reading
+# ----------------------------------------------------------------------------
+def _parse_header(view):
+    if len(view) < _PREAMBLE.size:
+        raise SnapshotFormatError("Truncated snapshot file")
+    magic, header_len, _ = _PREAMBLE.unpack_from(view)
+    if magic != MAGIC:
+        raise SnapshotFormatError("Not a columnar player snapshot")
+    try:
+        header = json.loads(bytes(view[_PREAMBLE.size:_PREAMBLE.size + header_len]))
+    except ValueError as e:
+        raise SnapshotFormatError(f"Corrupt snapshot header: {e}")
+    if header.get('version') != 1:
+        raise SnapshotFormatError(f"Unsupported snapshot version {header.get('version')}")
+    return header
+
+
+def _section(view, header, name):
+    try:
+        placed = header['sections'][name]
+    except KeyError:
+        raise SnapshotFormatError(f"Snapshot has no '{name}' section; rebuild it with the current scraper")
+    start, end = placed['offset'], placed['offset'] + placed['length']
+    if end > len(view):
+        raise SnapshotFormatError("Truncated snapshot file")
+    return view[start:end]
+
+
+class ColumnarSnapshot:
+    """
+    Decoded view of a columnar snapshot: `columns` maps field => array
+    (int32 / uint8 / uint32 string ids), `strings` is the string table.
+    """
+
+    def __init__(self, buffer):
+        view = memoryview(buffer)
+        header = _parse_header(view)
+        self.header = header
+        self.generation = header.get('generation')
+        self.count = header['count']
+        self.rosters = {name: tuple(bounds) for name, bounds in header['rosters'].items()}
+        self.schema = [tuple(item) for item in header['schema']]
+
+        def section(name):
+            return _section(view, header, name)
+
+        offsets = _from_bytes('I', section('string_offsets'))
+        blob = bytes(section('string_data'))
+        self.strings = [
+            blob[offsets[i]:offsets[i + 1]].decode('utf-8')
+            for i in range(header['string_count'])
+        ]
+        self.columns = {
+            field: _from_bytes(TYPECODES[kind], section(field))
+            for field, kind in self.schema
+        }
+
+    def __len__(self):
+        return self.count
+
+    def values(self, field):
+        """Column `field` as a list of Python values (None for nulls)."""
+        kind = dict(self.schema)[field]
+        column = self.columns[field]
+        if kind == 'int':
+            return [None if v == INT_NULL else v for v in column.tolist()]
+        if kind == 'bool':
+            return [None if v == BOOL_NULL else bool(v) for v in column.tolist()]
+        strings = self.strings
+        return [None if v == STR_NULL else strings[v] for v in column.tolist()]
+
+    def to_players(self):
+        """{roster: [player dict, ...]} like the JSON division files."""
+        fields = [field for field, _ in self.schema]
+        rows = list(zip(*(self.values(field) for field in fields)))
+        return {
+            roster: [dict(zip(fields, row)) for row in rows[start:end]]
+            for roster, (start, end) in self.rosters.items()
+        }
+
+
+def _decode(offsets, data, index):
+    return str(data[offsets[index]:offsets[index + 1]], 'utf-8')
+
+
+class _StringKeys:
+    """Read-only sequence decoding string ids on access, so bisect works on mapped keys."""
+
+    # Holds the string table rather than the MappedColumns: a reference back
+    # would be a cycle, and the mapping would outlive its last reader until
+    # the next garbage collection.
+    def __init__(self, offsets, data, ids):
+        self.offsets = offsets
+        self.data = data
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        return _decode(self.offsets, self.data, self.ids[i])
+
+
+class MappedColumns:
+    """
+    Zero-copy, read-only view of a snapshot file. Columns and indexes are
+    memoryviews into an mmap of the file, strings are decoded on access.
+
+    The mapping stays valid after the file is replaced (the old inode lives
+    until the last mapping is gone), so a reader keeps a consistent view while
+    a new snapshot is swapped in with os.replace().
+
+    The file is unmapped by close(), or once the last reference is gone.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        self._views = [view]
+        header = _parse_header(view)
+        self.header = header
+        self.generation = header.get('generation')
+        self.count = header['count']
+        self.rosters = {name: tuple(bounds) for name, bounds in header['rosters'].items()}
+        self.schema = [tuple(item) for item in header['schema']]
+        self.fields = [field for field, _ in self.schema]
+        self.orders = header.get('orders', {})
+
+        def section(name, typecode):
+            data = _section(view, header, name)
+            self._views.append(data)
+            if sys.byteorder == 'big':
+                # Mapped arrays are little endian; big endian hosts get a copy
+                return _from_bytes(typecode, data)
+            self._views.append(data.cast(typecode))
+            return self._views[-1]
+
+        self._string_offsets = section('string_offsets', 'I')
+        self._string_data = _section(view, header, 'string_data')
+        self._views.append(self._string_data)
+        self.columns = {field: section(field, TYPECODES[kind]) for field, kind in self.schema}
+        self._kinds = dict(self.schema)
+        self._id_keys = section('index_id_keys', 'i')
+        self._id_rows = section('index_id_rows', 'I')
+        self._name_keys = _StringKeys(self._string_offsets, self._string_data, section('index_name_keys', 'I'))
+        self._name_rows = section('index_name_rows', 'I')
+        self._orders = {name: section(name, 'I') for name in self.orders}
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def closed(self):
+        return self._mmap.closed
+
+    def close(self):
+        """
+        Release the views and unmap the file. Views sliced from this object
+        and still held elsewhere keep the mapping alive until they go.
+        """
+        for view in self._views:
+            view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+
+    def string(self, index):
+        return _decode(self._string_offsets, self._string_data, index)
+
+    def value(self, field, row):
+        v = self.columns[field][row]
+        kind = self._kinds[field]
+        if kind == 'int':
+            return None if v == INT_NULL else v
+        if kind == 'bool':
+            return None if v == BOOL_NULL else bool(v)
+        return None if v == STR_NULL else self.string(v)
+
+    def record(self, row):
+        """The player dict of `row`, as it appears in the JSON files."""
+        return {field: self.value(field, row) for field in self.fields}
+
+    def rows_for_id(self, player_id):
+        """Rows with `player_id`, in roster order."""
+        start = bisect_left(self._id_keys, player_id)
+        end = bisect_right(self._id_keys, player_id, start)
+        return sorted(self._id_rows[start:end])
+
+    def rows_for_name(self, normalized):
+        """Rows whose normalized name is `normalized`, in roster order."""
+        start = bisect_left(self._name_keys, normalized)
+        end = bisect_right(self._name_keys, normalized, start)
+        return list(self._name_rows[start:end])
+
+    def order(self, scope, field, descending=False):
+        """
+        (rows, count_with_value) of the stored sort order, or None if that
+        order is not stored. Rows without a value follow the first
+        count_with_value rows.
+        """
+        name = order_section(scope, field, descending)
+        if name not in self._orders:
+            return None
+        return self._orders[name], self.orders[name]
+
+
+def read_snapshot(path):
+    with open(path, 'rb') as f:
+        return ColumnarSnapshot(f.read())
+
+
+def load_rosters(path):
+    """(men_players, women_players) from a columnar snapshot file."""
+    rosters = read_snapshot(path).to_players()
+    return rosters.get('men_players', []), rosters.get('women_players', [])
+
+
+# ----------------------------------------------------------------------------
+# Command line: convert JSON <-> columnar
+# ----------------------------------------------------------------------------
+def _load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert player snapshots between JSON and the columnar format.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help="Write <data-dir>/players.pzc from the JSON division files")
+    build.add_argument('data_dir')
+    export = sub.add_parser('export', help="Write men_players.json / women_players.json from a columnar snapshot")
+    export.add_argument('snapshot')
+    export.add_argument('output_dir')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        rosters = {roster: _load_json(os.path.join(args.data_dir, f'{roster}.json')) for roster in ROSTERS}
+        path = os.path.join(args.data_dir, SNAPSHOT_FILENAME)
+        write_snapshot(path, rosters)
+        print(f"Wrote {path} ({os.path.getsize(path)} bytes).")
+    else:
+        rosters = read_snapshot(args.snapshot).to_players()
+        for roster, players in rosters.items():
+            path = os.path.join(args.output_dir, f'{roster}.json')
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(players, f, ensure_ascii=False, indent=4)
+            print(f"Wrote {len(players)} players to {path}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import admission
+from admission import ClientRateLimiter, ConcurrencyLimit, PriorityGate, Rejected
+
+
+def test_token_bucket_allows_a_burst_then_429():
+    limiter = ClientRateLimiter(rate=0.5, burst=2)
+    limiter.take('a')
+    limiter.take('a')
+    with pytest.raises(Rejected) as refused:
+        limiter.take('a')
+    assert (refused.value.status, refused.value.retry_after) == (429, 2)
+    # Other clients have their own bucket
+    limiter.take('b')
+
+
+def test_token_bucket_refills():
+    limiter = ClientRateLimiter(rate=1000, burst=1)
+    limiter.take('a')
+    time.sleep(0.01)
+    limiter.take('a')
+
+
+def test_disabled_rate_limit_admits_everything():
+    limiter = ClientRateLimiter(rate=0, burst=1)
+    for _ in range(100):
+        limiter.take('a')
+
+
+def test_least_recent_clients_are_forgotten():
+    limiter = ClientRateLimiter(rate=0.001, burst=1, max_clients=2)
+    for client in ('a', 'b', 'c'):
+        limiter.take(client)
+    # 'a' was dropped and starts with a full bucket again
+    limiter.take('a')
+    with pytest.raises(Rejected):
+        limiter.take('c')
+
+
+def test_client_key_prefers_the_configured_header():
+    environ = {'REMOTE_ADDR': '10.0.0.1', 'HTTP_X_FORWARDED_FOR': '203.0.113.9, 10.0.0.1'}
+    assert admission.client_key(environ) == '10.0.0.1'
+    assert admission.client_key(environ, 'X-Forwarded-For') == '203.0.113.9'
+
+
+def test_concurrency_limit_rejects_after_its_timeout():
+    limit = ConcurrencyLimit(1, timeout=0.01)
+    with limit:
+        assert limit.active == 1
+        with pytest.raises(Rejected) as refused:
+            limit.acquire()
+        assert refused.value.status == 503
+    assert limit.active == 0
+    with limit:
+        pass
+
+
+def test_async_holders_share_the_slots():
+    limit = ConcurrencyLimit(1, timeout=0.05)
+
+    async def main():
+        async with limit:
+            started = time.monotonic()
+            with pytest.raises(Rejected):
+                await limit.acquire_async()
+            assert time.monotonic() - started < 1
+            # A thread cannot get in meanwhile either
+            with pytest.raises(Rejected):
+                await asyncio.get_running_loop().run_in_executor(None, limit.acquire)
+
+        async def release_soon():
+            await asyncio.sleep(0.01)
+            limit.release()
+
+        limit.acquire()
+        asyncio.ensure_future(release_soon())
+        await limit.acquire_async()
+        limit.release()
+
+    asyncio.run(main())
+    assert limit.active == 0
+
+
+def enter_in_thread(gate, priority, results):
+    def run():
+        try:
+            gate.enter(priority)
+            results.append(('admitted', priority))
+        except Rejected as e:
+            results.append((e.reason, priority))
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def wait_until(condition):
+    deadline = time.monotonic() + 2
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_gate_admits_waiters_by_priority():
+    gate = PriorityGate(1, max_queue=4, max_wait=2)
+    gate.enter(0)
+    results = []
+    threads = []
+    for priority in (2, 1):
+        threads.append(enter_in_thread(gate, priority, results))
+        wait_until(lambda: gate.queued == len(threads))
+    gate.leave()
+    wait_until(lambda: results)
+    gate.leave()
+    for thread in threads:
+        thread.join()
+    assert results == [('admitted', 1), ('admitted', 2)]
+
+
+def test_full_gate_sheds_the_least_important_waiter():
+    gate = PriorityGate(1, max_queue=1, max_wait=2)
+    gate.enter(0)
+    results = []
+    low = enter_in_thread(gate, 2, results)
+    wait_until(lambda: gate.queued == 1)
+    with pytest.raises(Rejected) as refused:
+        gate.enter(2)
+    assert refused.value.reason == 'queue_full'
+    high = enter_in_thread(gate, 0, results)
+    low.join()
+    assert results == [('shed', 2)]
+    gate.leave()
+    high.join()
+    assert results[-1] == ('admitted', 0)
+
+
+def test_gate_queue_times_out():
+    gate = PriorityGate(1, max_queue=1, max_wait=0.01)
+    gate.enter(0)
+    with pytest.raises(Rejected) as refused:
+        gate.enter(0)
+    assert refused.value.reason == 'queue_timeout' and gate.queued == 0
@@ -0,0 +1,50 @@
+import random
+
+from aggregates import AggregateTables
+
+CLUBS = ['Roundnet Köln', 'roundnet köln ', 'Spikeball Berlin', 'RC Hamburg', 'Munich Spikers', '', None]
+CITIES = ['Köln', 'Berlin', 'Hamburg', 'München', None]
+
+
+def random_player(rng, player_id, division):
+    return {
+        'name': f'Player {player_id}', 'player_id': player_id, 'division': division,
+        'rank': rng.choice([None, rng.randint(1, 300)]), 'club': rng.choice(CLUBS), 'city': rng.choice(CITIES),
+        'games': rng.randint(0, 200), 'elo_rating': rng.choice([None, rng.randint(900, 2100)]),
+        'trend_90_days': rng.choice([None, rng.randint(-80, 80)]), 'pro_status': rng.random() < 0.2,
+    }
+
+
+def mutate(rng, players, next_id):
+    players = [dict(p) for p in players]
+    for player in rng.sample(players, min(len(players), rng.randint(0, 40))):
+        field = rng.choice(['elo_rating', 'rank', 'club', 'city', 'trend_90_days', 'pro_status'])
+        player[field] = random_player(rng, 0, 'Open')[field]
+    for _ in range(rng.randint(0, 5)):
+        if players:
+            players.pop(rng.randrange(len(players)))
+    for _ in range(rng.randint(0, 80 if rng.random() < 0.2 else 5)):
+        players.append(random_player(rng, next(next_id), rng.choice(['Open', 'Women'])))
+    return players
+
+
+def test_incremental_build_equals_a_full_rebuild():
+    rng = random.Random(17)
+    ids = iter(range(1, 10 ** 6))
+    players = [random_player(rng, next(ids), rng.choice(['Open', 'Women'])) for _ in range(300)]
+    tables = AggregateTables.build(players)
+    for _ in range(30):
+        players = mutate(rng, players, ids)
+        tables = AggregateTables.build(players, tables)
+        full = AggregateTables.build(players)
+        assert tables.entries == full.entries
+        assert tables.members == full.members
+        assert tables.groups == full.groups
+        assert tables.trends == full.trends
+
+
+def test_unchanged_scrape_reuses_the_tables():
+    rng = random.Random(1)
+    players = [random_player(rng, i, 'Open') for i in range(1, 50)]
+    tables = AggregateTables.build(players)
+    assert AggregateTables.build([dict(p) for p in players], tables) is tables
@@ -0,0 +1,77 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip('httpx')
+
+import admission
+import asgi_app
+import flask_app
+
+
+def call(path, client=('203.0.113.9', 5000)):
+    """Run one GET through the ASGI app; returns (status, headers, body)."""
+    scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'', 'headers': [], 'client': client}
+    messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.sleep(60)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi_app.app(scope, receive, send))
+    start = sent[0]
+    body = b''.join(message.get('body', b'') for message in sent[1:])
+    return start['status'], dict((k.decode(), v.decode()) for k, v in start['headers']), body
+
+
+@pytest.fixture
+def prefetches(monkeypatch):
+    calls = []
+
+    async def prefetch(player_query, environ):
+        calls.append(player_query)
+        return None
+
+    monkeypatch.setattr(asgi_app, '_prefetch_history', prefetch)
+    return calls
+
+
+def test_history_is_rate_limited_before_going_upstream(monkeypatch, prefetches):
+    monkeypatch.setattr(flask_app, 'request_rate_limiter', admission.ClientRateLimiter(rate=0.1, burst=1))
+    call('/history/265')
+    status, headers, body = call('/history/265')
+    assert status == 429 and headers['retry-after'] == '10'
+    assert 'Too many requests' in json.loads(body)['error']
+    assert prefetches == ['265']
+
+
+def test_history_waits_for_the_gate_before_going_upstream(monkeypatch, prefetches):
+    gate = admission.PriorityGate(1, max_queue=0, max_wait=0)
+    monkeypatch.setattr(flask_app, 'request_gate', gate)
+    gate.enter(0)
+    status, headers, _ = call('/history/265')
+    assert status == 503 and 'retry-after' in headers
+    assert prefetches == []
+    gate.leave()
+    call('/history/265')
+    assert prefetches == ['265'] and gate.active == 0
+
+
+def test_async_fetches_obey_the_upstream_cap(monkeypatch):
+    limit = admission.ConcurrencyLimit(1, timeout=0.01)
+    monkeypatch.setattr(flask_app, 'upstream_limit', limit)
+
+    async def main():
+        async with limit:
+            with pytest.raises(admission.Rejected) as refused:
+                await flask_app.fetch_history_admitted_async(265, 1)
+        return refused.value
+
+    refused = asyncio.run(main())
+    assert (refused.status, refused.reason) == (503, 'upstream_busy')
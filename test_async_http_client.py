@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+import requests
+
+httpx = pytest.importorskip('httpx')
+
+from async_http_client import AsyncHttpClient
+from history import HistoryError, fetch_history_async
+
+URL = 'http://upstream.test/page'
+
+
+def client_with(outcomes, **kwargs):
+    """An AsyncHttpClient whose transport answers with / raises `outcomes` in order."""
+    calls = iter(outcomes)
+
+    async def handler(request):
+        outcome = next(calls)
+        if callable(outcome):
+            outcome = await outcome(request)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    return AsyncHttpClient(backoff=0, transport=httpx.MockTransport(handler), **kwargs)
+
+
+def open_breaker(client):
+    breaker = client.breaker(URL)
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    assert breaker.state == 'half-open'
+    return breaker
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_retries_5xx_then_returns_the_success():
+    async def main():
+        client = client_with([httpx.Response(503), httpx.Response(200, text='ok')])
+        response = await client.get(URL)
+        return response.text, client.metrics['retries'], client.metrics['status']
+
+    assert run(main()) == ('ok', 1, {503: 1, 200: 1})
+
+
+def test_transport_errors_are_raised_as_requests_errors():
+    async def main():
+        client = client_with([httpx.ConnectError('refused')], retries=0)
+        await client.get(URL)
+
+    with pytest.raises(requests.ConnectionError):
+        run(main())
+
+
+@pytest.mark.parametrize('error, expected', [
+    (httpx.TooManyRedirects('loop'), requests.TooManyRedirects),
+    (httpx.DecodingError('bad gzip'), requests.exceptions.ContentDecodingError),
+])
+def test_other_httpx_errors_settle_the_trial_call(error, expected):
+    async def main():
+        client = client_with([error, httpx.Response(200)], reset_timeout=0)
+        breaker = open_breaker(client)
+        with pytest.raises(expected):
+            await client.get(URL)
+        assert breaker.allow() == 'trial'
+        breaker.abandon_trial()
+        response = await client.get(URL)
+        return response.status_code, breaker.state
+
+    assert run(main()) == (200, 'closed')
+
+
+def test_cancelled_trial_call_is_abandoned():
+    async def hang(request):
+        await asyncio.sleep(60)
+
+    async def main():
+        client = client_with([hang, httpx.Response(200)], reset_timeout=0)
+        open_breaker(client)
+        task = asyncio.ensure_future(client.get(URL))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return (await client.get(URL)).status_code
+
+    assert run(main()) == 200
+
+
+def test_fetch_history_async_maps_upstream_errors():
+    async def main():
+        client = client_with([httpx.DecodingError('bad gzip')])
+        await fetch_history_async(265, 1, base_url='http://upstream.test', client=client)
+
+    with pytest.raises(HistoryError):
+        run(main())
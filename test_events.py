@@ -0,0 +1,131 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+import admission
+import asgi_app
+from events import ChangeFeed, EventFilter, EventsError, snapshot_changes
+import flask_app
+from player_store import Snapshot
+
+
+def player(player_id, elo, rank, club='Club', division='Open', trend=0):
+    return {'name': f'Player {player_id}', 'player_id': player_id, 'rank': rank, 'club': club, 'city': '',
+            'games': 10, 'elo_rating': elo, 'division': division, 'trend_90_days': trend, 'pro_status': False}
+
+
+def snapshot(generation, men, women=()):
+    return Snapshot(list(men), list(women), generation)
+
+
+BASE = snapshot(1, [player(1, 1600, 1), player(2, 1500, 2, club='Other')], [player(3, 1400, 1, division='Women')])
+MOVED = snapshot(2, [player(2, 1650, 1, club='Other'), player(1, 1580, 2), player(4, 1000, 3)],
+                 [player(3, 1400, 1, division='Women')])
+
+
+def frame_data(frame):
+    return json.loads(frame.split('data: ', 1)[1])
+
+
+def test_snapshot_changes_lists_deltas_additions_and_removals():
+    entries = {(e['type'], e['player_id']): e for e in snapshot_changes(BASE, MOVED)}
+    assert set(entries) == {('changed', 1), ('changed', 2), ('added', 4)}
+    assert entries[('changed', 2)]['delta'] == {'elo_rating': 150, 'rank': -1}
+    assert entries[('changed', 1)]['elo_rating'] == 1580
+
+    removed = snapshot_changes(MOVED, snapshot(3, MOVED.men_players[:2], MOVED.women_players))
+    assert [(e['type'], e['player_id']) for e in removed] == [('removed', 4)]
+
+
+def test_filters():
+    with pytest.raises(EventsError):
+        EventFilter.from_args({'player': 'abc'})
+    with pytest.raises(EventsError):
+        EventFilter.from_args({'division': 'mixed'})
+
+    feed = ChangeFeed()
+    feed.publish(None, BASE)
+    by_club = feed.subscribe(EventFilter(clubs=['other']))
+    by_player = feed.subscribe(EventFilter(players=[3]))
+    feed.publish(BASE, MOVED)
+    assert [p['player_id'] for p in frame_data(by_club.pending())['players']] == [2]
+    # Player 3 did not move: nothing to send
+    assert by_player.pending() == ''
+
+
+def test_reconnecting_clients_resume_or_reset():
+    feed = ChangeFeed(history=2)
+    feed.publish(None, BASE)
+    feed.publish(BASE, MOVED)
+    opening = feed.subscribe(last_event_id=1).opening()
+    assert '\nevent: hello\n' in opening
+    # What happened since generation 1 is replayed
+    assert frame_data(opening.split('event: players', 1)[1])['generation'] == 2
+    assert 'event: players' not in feed.subscribe(last_event_id=2).opening()
+
+    third = snapshot(3, MOVED.men_players, MOVED.women_players)
+    fourth = snapshot(4, BASE.men_players, BASE.women_players)
+    feed.publish(MOVED, third)
+    feed.publish(third, fourth)
+    # Generation 1 fell out of the history of 2 events
+    assert '\nevent: reset\n' in feed.subscribe(last_event_id=1).opening()
+    assert '\nevent: reset\n' in feed.subscribe(last_event_id='garbage').opening()
+
+
+def test_wait_async_wakes_up_on_publish():
+    feed = ChangeFeed()
+    feed.publish(None, BASE)
+
+    async def main():
+        sequence = feed.sequence
+        waiting = asyncio.ensure_future(feed.wait_async(sequence, 5))
+        await asyncio.sleep(0.01)
+        threading.Thread(target=feed.publish, args=(BASE, MOVED)).start()
+        return await waiting
+
+    assert asyncio.run(main()) is True
+    assert asyncio.run(feed.wait_async(feed.sequence, 0.01)) is False
+
+
+def test_closing_a_subscription_is_idempotent():
+    feed = ChangeFeed()
+    subscription = feed.subscribe()
+    subscription.close()
+    subscription.close()
+    assert feed.subscribers == 0
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    monkeypatch.setattr(flask_app, 'events_limit', admission.ConcurrencyLimit(5, timeout=0, reason='subscribers'))
+    monkeypatch.setattr(flask_app, 'wsgi_events_limit', admission.ConcurrencyLimit(1, timeout=0, reason='subscribers'))
+    monkeypatch.setattr(flask_app.player_store, 'get_snapshot', lambda: BASE)
+    return flask_app.events_limit, flask_app.wsgi_events_limit
+
+
+def test_wsgi_streams_are_capped(limits):
+    client = flask_app.app.test_client()
+    first = client.get('/events', buffered=False)
+    assert first.status_code == 200
+    refused = client.get('/events')
+    assert refused.status_code == 503 and 'Retry-After' in refused.headers
+    first.close()
+    assert [limit.active for limit in limits] == [0, 0]
+
+
+def test_asgi_stream_failing_to_start_releases_its_slot(limits):
+    scope = {'type': 'http', 'method': 'GET', 'path': '/events', 'query_string': b'', 'headers': [],
+             'client': ('203.0.113.9', 5000)}
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        raise OSError('connection reset')
+
+    subscribers = flask_app.change_feed.subscribers
+    asyncio.run(asgi_app.app(scope, receive, send))
+    assert [limit.active for limit in limits] == [0, 0]
+    assert flask_app.change_feed.subscribers == subscribers
@@ -0,0 +1,226 @@
+import json
+
+import pytest
+
+import flask_app
+from player_store import PlayerStore
+
+
+def player(name, player_id, rank, elo_rating, division='Open', **fields):
+    record = {'name': name, 'player_id': player_id, 'rank': rank, 'club': 'Club', 'city': 'Köln', 'games': 10,
+              'elo_rating': elo_rating, 'division': division, 'trend_90_days': 0, 'pro_status': False,
+              'exists_in_both_divisions': False}
+    record.update(fields)
+    return record
+
+
+def write_rosters(data_dir, men, women):
+    (data_dir / 'men_players.json').write_text(json.dumps(men), encoding='utf-8')
+    (data_dir / 'women_players.json').write_text(json.dumps(women), encoding='utf-8')
+
+
+MEN = [player('Paul Siemer', 265, 1, 1900), player('Jonas Hoffmann', 301, 2, 1750), player('Lukas Weber', 302, 3, 1600),
+       player('Max Becker', 303, 4, 1450, club='Roundnet Berlin', city='Berlin')]
+WOMEN = [player('Lena Koch', 401, 1, 1700, 'Women'), player('Anna Wolf', 402, 2, 1550, 'Women')]
+
+
+@pytest.fixture
+def client():
+    return flask_app.app.test_client()
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    write_rosters(tmp_path, MEN, WOMEN)
+    monkeypatch.setattr(flask_app, 'player_store', PlayerStore(str(tmp_path), snapshot_format='json'))
+    return tmp_path
+
+
+@pytest.mark.parametrize('method, path', [('POST', '/admin/reload'), ('GET', '/admin/profile'), ('POST', '/admin/profile')])
+def test_admin_endpoints_are_off_without_a_token(client, monkeypatch, method, path):
+    monkeypatch.delenv('PLAYERZONE_ADMIN_TOKEN', raising=False)
+    assert client.open(path, method=method, json={'enabled': True}).status_code == 403
+    assert not flask_app.profiler.enabled
+
+
+def test_admin_endpoints_require_the_token(client, monkeypatch):
+    monkeypatch.setenv('PLAYERZONE_ADMIN_TOKEN', 's3cret')
+    assert client.get('/admin/profile').status_code == 401
+    assert client.get('/admin/profile', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get('/admin/profile', headers={'Authorization': 'Bearer s3crét'}).status_code == 401
+    response = client.get('/admin/profile', headers={'Authorization': 'Bearer s3cret'})
+    assert response.status_code == 200
+    assert response.get_json()['enabled'] is False
+
+
+def test_admin_reload_picks_up_new_files(client, data_dir, monkeypatch):
+    monkeypatch.setenv('PLAYERZONE_ADMIN_TOKEN', 's3cret')
+    assert client.get('/elo/302').get_json()['name'] == 'Lukas Weber'
+    write_rosters(data_dir, MEN[:2], WOMEN)
+
+    assert client.post('/admin/reload', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    response = client.post('/admin/reload', headers={'Authorization': 'Bearer s3cret'})
+    assert response.status_code == 200
+    assert response.get_json() == {'generation': 2, 'players': 4}
+    assert client.get('/elo/302').get_json()['name'] != 'Lukas Weber'
+
+
+def test_rate_limited_requests_get_429_with_retry_after(client, monkeypatch):
+    monkeypatch.setattr(flask_app, 'request_rate_limiter', flask_app.admission.ClientRateLimiter(rate=0.1, burst=1))
+    client.get('/metrics')  # ungated
+    first = client.get('/elo/nobody')
+    assert first.status_code != 429
+    refused = client.get('/elo/nobody')
+    assert refused.status_code == 429
+    assert refused.headers['Retry-After'] == '10'
+
+
+def test_full_gate_answers_503(client, monkeypatch):
+    gate = flask_app.admission.PriorityGate(1, max_queue=0, max_wait=0)
+    monkeypatch.setattr(flask_app, 'request_gate', gate)
+    gate.enter(0)
+    refused = client.get('/elo/nobody')
+    assert refused.status_code == 503 and 'Retry-After' in refused.headers
+    gate.leave()
+    assert client.get('/elo/nobody').status_code != 503
+    assert gate.active == 0
+
+
+def test_two_team_tournament_follows_the_expected_score(client, data_dir):
+    pytest.importorskip('numpy')
+    import rgx
+
+    response = client.post('/tournament/simulate', json={
+        'teams': [{'name': 'Favorites', 'players': ['265', 'Lena Koch']}, ['301', 402]],
+        'simulations': 20000, 'seed': 3,
+    })
+    assert response.status_code == 200
+    favorites, underdogs = response.get_json()['teams']
+    assert (favorites['name'], underdogs['name']) == ('Favorites', 'Team 2')
+    e1 = rgx.expected_score(1900 + 1700, 1750 + 1550)
+    assert favorites['placement_probabilities']['1'] == pytest.approx(e1, abs=0.015)
+    assert underdogs['placement_probabilities']['1'] == pytest.approx(1 - e1, abs=0.015)
+
+
+@pytest.mark.parametrize('changes', [
+    {'seed': -1}, {'seed': True}, {'seed': 1.5}, {'simulations': True}, {'simulations': 0}, {'b': True},
+    {'teams': [{'name': 5, 'players': ['265', '401']}, ['301', '402']]},
+    {'teams': [['265', True], ['301', '402']]},
+])
+def test_tournament_rejects_invalid_parameters(client, data_dir, changes):
+    pytest.importorskip('numpy')
+    body = {'teams': [['265', '401'], ['301', '402']], 'simulations': 100}
+    body.update(changes)
+    response = client.post('/tournament/simulate', json=body)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_matchmaking_uses_every_player_once(client, data_dir):
+    identifiers = ['265', 'Jonas Hoffmann', '302', '303', '(1650)', '(1500)', 'Lena Koch', '402', '(1200)']
+    response = client.post('/matchmaking', json={'players': identifiers})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert len(body['games']) == 2 and len(body['sitting_out']) == 1
+    used = [p['identifier'] for game in body['games'] for p in game['team1_players'] + game['team2_players']]
+    used += [p['identifier'] for p in body['sitting_out']]
+    assert sorted(used) == sorted(identifiers)
+    assert body['search']['exact'] is True
+
+
+@pytest.mark.parametrize('body', [
+    {'players': ['265', 'Paul Siemer', '301', '302']},
+    {'players': ['265', '301', '302', '303', '303']},
+    {'players': ['265', '301', '302', '303'], 'time_limit_ms': True},
+    {'players': ['265', '301', '302']},
+])
+def test_matchmaking_rejects_invalid_pools(client, data_dir, body):
+    assert client.post('/matchmaking', json=body).status_code == 400
+
+
+@pytest.mark.parametrize('with_numpy', [True, False])
+def test_match_batch_equals_match(client, data_dir, monkeypatch, with_numpy):
+    import random
+
+    import rgx
+
+    if with_numpy:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(rgx, 'np', None)
+    rng = random.Random(14)
+    players = MEN + WOMEN
+    pool = [str(p['player_id']) for p in players] + [p['name'] for p in players] + ['Jonas Hofman', 'Lena Koch (o)']
+
+    def identifier():
+        kind = rng.random()
+        if kind < 0.3:
+            return f'({rng.randrange(0, 3000)})'
+        if kind < 0.4:
+            return str(rng.randrange(500, 2500))
+        return rng.choice(pool)
+
+    pairings = [{'team1': [identifier(), identifier()], 'team2': [identifier(), identifier()]} for _ in range(300)]
+    response = client.post('/match/batch', json={'pairings': pairings})
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line.pop('index') for line in lines] == list(range(300))
+
+    for pairing, line in zip(pairings, lines):
+        assert line == client.post('/match', json=pairing).get_json(), pairing
+
+
+def test_search_fills_prefix_matches_with_fuzzy_ones(client, data_dir):
+    body = client.get('/search?q=hof').get_json()
+    assert [(r['name'], r['match']) for r in body['results']][0] == ('Jonas Hoffmann', 'prefix')
+
+    results = client.get('/search?q=hofman&limit=3').get_json()['results']
+    assert (results[0]['name'], results[0]['match']) == ('Jonas Hoffmann', 'fuzzy')
+    assert results[0]['match_score'] == 75
+
+    results = client.get('/search?q=a&division=women').get_json()['results']
+    assert {r['division'] for r in results} == {'Women'}
+    assert client.get('/search?q=301').get_json()['results'][0]['player_id'] == 301
+    assert client.get('/search').status_code == 400
+    assert client.get('/search?q=a&limit=x').status_code == 400
+
+
+def test_players_body_is_cached_per_snapshot(client, data_dir, monkeypatch):
+    first = client.get('/players')
+    assert first.get_json() == MEN + WOMEN
+    assert client.get('/players', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    write_rosters(data_dir, MEN[:1], WOMEN)
+    flask_app.player_store.reload()
+    second = client.get('/players', headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200 and second.get_json() == MEN[:1] + WOMEN
+    assert second.headers['ETag'] != first.headers['ETag']
+
+
+def test_elo_batch_equals_elo(client, data_dir):
+    from urllib.parse import quote
+
+    queries = ['265', 265, 'paul_siemer', 'PAUL SIEMER', 'Paul Siemer (o)', 'Lena Koch (1)', 'lena koch', 'Jonas Hofman',
+               '999', '401', 'anna wolf', 'Anna-Wolf', 'weber']
+    response = client.post('/elo/batch', json={'players': queries + [True, None, ['265']]})
+    assert response.status_code == 200
+    body = response.get_json()
+    results = body['results']
+
+    for query, result in zip(queries, results):
+        assert result.pop('query') == query
+        single = client.get('/elo/' + quote(str(query)))
+        if single.status_code == 200:
+            assert result == single.get_json(), query
+        else:
+            assert result == {'error': single.get_json()['error'], 'status': single.status_code}, query
+    assert [r['status'] for r in results[len(queries):]] == [400, 400, 400]
+    # '265' and 265, 'paul_siemer' and 'PAUL SIEMER', 'anna wolf' and 'Anna-Wolf' are resolved once each
+    assert body['unique'] == len(queries) - 3
+
+
+def test_elo_batch_limits(client, data_dir, monkeypatch):
+    monkeypatch.setattr(flask_app, 'ELO_BATCH_LIMIT', 2)
+    assert client.post('/elo/batch', json={'players': ['1', '2', '3']}).status_code == 413
+    assert client.post('/elo/batch', json={'players': []}).status_code == 400
+    assert client.post('/elo/batch', json=['265']).status_code == 200
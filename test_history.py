@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from history import HistoryCache, HistoryError, parse_history_html
+
+CHART = "new Chart(ctx, {data: {labels: ['01.01.2024', '01.02.2024', '01.03.2024'], " \
+        "datasets: [{data: [1500, 'x', 1532]}]}})"
+
+
+def test_parse_history_html():
+    assert parse_history_html(CHART) == [
+        {'date': '01.01.2024', 'points': 1500},
+        {'date': '01.02.2024', 'points': None},
+        {'date': '01.03.2024', 'points': 1532},
+    ]
+    with pytest.raises(HistoryError):
+        parse_history_html('<html>no chart</html>')
+
+
+def test_entries_expire_after_the_ttl():
+    cache = HistoryCache(ttl=0.05)
+    loads = []
+    load = lambda: loads.append(1) or len(loads)
+    assert cache.get_or_load('a', load) == 1
+    assert cache.get_or_load('a', load) == 1 and cache.cached('a')
+    time.sleep(0.06)
+    assert not cache.cached('a')
+    assert cache.get_or_load('a', load) == 2
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = HistoryCache(maxsize=2)
+    cache.get_or_load('a', lambda: 'A')
+    cache.get_or_load('b', lambda: 'B')
+    cache.get_or_load('a', lambda: 'unused')
+    cache.get_or_load('c', lambda: 'C')
+    assert cache.cached('a') and cache.cached('c') and not cache.cached('b')
+    assert len(cache) == 2
+
+
+def test_concurrent_misses_share_one_load():
+    cache = HistoryCache()
+    release = threading.Event()
+    loads = []
+
+    def load():
+        loads.append(1)
+        release.wait(2)
+        return 'value'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load('a', load))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert loads == [1] and results == ['value'] * 8
+
+
+def test_failures_reach_every_waiter_and_are_not_cached():
+    cache = HistoryCache()
+
+    def fail():
+        raise HistoryError('upstream down')
+
+    with pytest.raises(HistoryError):
+        cache.get_or_load('a', fail)
+    assert not cache.cached('a')
+    assert cache.get_or_load('a', lambda: 'value') == 'value'
+
+
+def test_clear_drops_entries_and_loads_in_flight():
+    cache = HistoryCache()
+    cache.get_or_load('a', lambda: 'old')
+
+    def load_during_clear():
+        cache.clear()
+        return 'stale'
+
+    assert cache.get_or_load('b', load_during_clear) == 'stale'
+    assert not cache.cached('a') and not cache.cached('b')
+
+
+def test_async_misses_share_one_load():
+    cache = HistoryCache()
+    loads = []
+
+    async def load():
+        loads.append(1)
+        await asyncio.sleep(0.01)
+        return 'value'
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_load_async('a', load) for _ in range(20)))
+
+    assert asyncio.run(main()) == ['value'] * 20
+    assert loads == [1] and cache.cached('a')
@@ -0,0 +1,82 @@
+import json
+import threading
+import time
+
+import history_crawler
+from history import HistoryStore, write_history_store
+
+CHART = "new Chart(ctx, {data: {labels: ['01.01.2024', '01.02.2024'], datasets: [{data: [1500, %d]}]}})"
+
+
+class Response:
+    def __init__(self, status_code, text=''):
+        self.status_code = status_code
+        self.text = text
+
+
+class FakeClient:
+    """Answers history pages after a short delay, recording when and how many at once."""
+
+    def __init__(self, delay=0.01, failing=()):
+        self.delay = delay
+        self.failing = set(failing)
+        self.started = []
+        self.active = self.max_active = 0
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        player_id = int(url.split('player_id=')[1].split('&')[0])
+        with self._lock:
+            self.started.append(time.monotonic())
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        if player_id in self.failing:
+            return Response(500)
+        return Response(200, CHART % (1500 + player_id))
+
+
+def test_rate_limiter_allows_a_burst_then_the_rate():
+    limiter = history_crawler.RateLimiter(rate=100, burst=5)
+    started = time.monotonic()
+    for _ in range(5):
+        limiter.acquire()
+    assert time.monotonic() - started < 0.05
+    for _ in range(20):
+        limiter.acquire()
+    assert time.monotonic() - started >= 0.19
+
+
+def test_crawl_respects_concurrency_and_rate():
+    client = FakeClient(failing={7})
+    targets = [(player_id, 1 + player_id % 2, f'Player {player_id}') for player_id in range(40)]
+
+    started = time.monotonic()
+    histories, failures = history_crawler.crawl_histories(targets, base_url='http://upstream.test',
+                                                          concurrency=4, rate=200, client=client)
+    elapsed = time.monotonic() - started
+
+    assert len(client.started) == 40
+    assert client.max_active <= 4
+    # A burst of `concurrency` requests, then at most `rate` per second
+    assert elapsed >= (40 - 4) / 200
+    assert [(player_id, name) for player_id, _, name, _ in failures] == [(7, 'Player 7')]
+    assert len(histories) == 39
+    assert histories['12:1'] == [{'date': '01.01.2024', 'points': 1500}, {'date': '01.02.2024', 'points': 1512}]
+
+
+def test_load_players_and_store_round_trip(tmp_path):
+    men = [{'name': 'Paul Siemer', 'player_id': 265, 'division': 'Open'}, {'name': 'No Id', 'player_id': None,
+                                                                          'division': 'Open'}]
+    women = [{'name': 'Lena Koch', 'player_id': 401, 'division': 'Women'}]
+    (tmp_path / 'men_players.json').write_text(json.dumps(men), encoding='utf-8')
+    (tmp_path / 'women_players.json').write_text(json.dumps(women), encoding='utf-8')
+    assert history_crawler.load_players(str(tmp_path)) == [(265, 1, 'Paul Siemer'), (401, 2, 'Lena Koch')]
+
+    path = str(tmp_path / 'histories.json.gz')
+    write_history_store(path, {'265:1': [{'date': '01.01.2024', 'points': 1500}]}, crawled_at=0)
+    store = HistoryStore(path, check_interval=0)
+    assert store.get(265, 1) == [{'date': '01.01.2024', 'points': 1500}]
+    assert store.get(401, 2) is None and len(store) == 1
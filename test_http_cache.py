@@ -0,0 +1,76 @@
+import gzip
+import json
+
+import pytest
+from flask import Flask
+
+import http_cache
+
+PAYLOAD = [{'name': 'Paul Siemer', 'player_id': 265, 'city': 'Köln'}] * 50
+LAST_MODIFIED = 1700000000.5
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    with app.app_context():
+        cached = http_cache.cached_json_body(PAYLOAD, LAST_MODIFIED)
+
+    @app.route('/players')
+    def players():
+        return http_cache.cached_response(cached)
+
+    return app.test_client()
+
+
+def test_body_matches_jsonify(client):
+    response = client.get('/players')
+    assert response.status_code == 200
+    assert response.get_json() == PAYLOAD
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert response.headers['Cache-Control'] == 'public, max-age=60'
+
+
+def test_gzip_is_negotiated(client):
+    response = client.get('/players', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(response.get_data())) == PAYLOAD
+    assert response.headers['ETag'].endswith('-gzip"')
+    # Compressed once, then reused byte for byte
+    assert client.get('/players', headers={'Accept-Encoding': 'gzip'}).get_data() == response.get_data()
+
+
+def test_brotli_is_preferred_when_installed(client):
+    brotli = pytest.importorskip('brotli')
+    response = client.get('/players', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert json.loads(brotli.decompress(response.get_data())) == PAYLOAD
+    response = client.get('/players', headers={'Accept-Encoding': 'gzip;q=1.0, br;q=0.5'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+
+
+def test_identity_when_nothing_acceptable(client):
+    response = client.get('/players', headers={'Accept-Encoding': 'gzip;q=0'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_json() == PAYLOAD
+
+
+def test_conditional_requests_get_304(client):
+    first = client.get('/players')
+    etag = first.headers['ETag']
+    gzip_etag = client.get('/players', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+
+    for validator in (etag, gzip_etag, f'W/{etag}', f'"other", {etag}'):
+        response = client.get('/players', headers={'If-None-Match': validator})
+        assert response.status_code == 304 and response.get_data() == b''
+        assert response.headers['ETag'] == etag
+    assert client.get('/players', headers={'If-None-Match': '"other"'}).status_code == 200
+
+    last_modified = first.headers['Last-Modified']
+    assert client.get('/players', headers={'If-Modified-Since': last_modified}).status_code == 304
+    older = 'Tue, 14 Nov 2023 22:13:19 GMT'
+    assert client.get('/players', headers={'If-Modified-Since': older}).status_code == 200
+    # If-None-Match wins over If-Modified-Since
+    response = client.get('/players', headers={'If-None-Match': '"other"', 'If-Modified-Since': last_modified})
+    assert response.status_code == 200
@@ -0,0 +1,103 @@
+import pytest
+import requests
+
+from http_client import CircuitBreaker, CircuitOpenError, HttpClient
+import scraper
+
+URL = 'http://upstream.test/page'
+
+
+class FakeResponse:
+    def __init__(self, status_code, text='', headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f'{self.status_code} Error', response=self)
+
+
+def client_with(outcomes, **kwargs):
+    """An HttpClient whose session returns / raises `outcomes` in order."""
+    client = HttpClient(backoff=0, **kwargs)
+    calls = iter(outcomes)
+
+    def request(method, url, **kw):
+        outcome = next(calls)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    client.session.request = request
+    return client
+
+
+def open_breaker(client):
+    """Open the breaker of URL's host; with reset_timeout=0 it is half-open at once."""
+    breaker = client.breaker(URL)
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    assert breaker.state == 'half-open'
+    return breaker
+
+
+def test_retries_5xx_then_returns_the_success():
+    client = client_with([FakeResponse(503), FakeResponse(502), FakeResponse(200, 'ok')])
+    assert client.get(URL).text == 'ok'
+    assert client.metrics['retries'] == 2
+    assert client.breaker(URL).state == 'closed'
+
+
+def test_returns_the_last_5xx_once_retries_are_exhausted():
+    client = client_with([FakeResponse(503)] * 3, retries=2)
+    assert client.get(URL).status_code == 503
+
+
+def test_breaker_opens_after_consecutive_failures():
+    client = client_with([requests.ConnectionError('down')] * 2, retries=1, failure_threshold=2, reset_timeout=60)
+    with pytest.raises(requests.ConnectionError):
+        client.get(URL)
+    with pytest.raises(CircuitOpenError):
+        client.get(URL)
+
+
+@pytest.mark.parametrize('error', [
+    requests.TooManyRedirects('loop'),
+    requests.exceptions.ContentDecodingError('bad gzip'),
+    requests.exceptions.ChunkedEncodingError('cut off'),
+])
+def test_other_request_errors_settle_the_trial_call(error):
+    client = client_with([error, FakeResponse(200)], reset_timeout=0)
+    breaker = open_breaker(client)
+    with pytest.raises(type(error)):
+        client.get(URL)
+    # Failed trial: re-opened, and with reset_timeout=0 the next trial may go out
+    assert breaker.allow() == 'trial'
+    breaker.abandon_trial()
+    assert client.get(URL).status_code == 200
+    assert breaker.state == 'closed'
+
+
+def test_interrupted_trial_call_is_abandoned():
+    client = client_with([KeyboardInterrupt(), FakeResponse(200)], reset_timeout=0)
+    open_breaker(client)
+    with pytest.raises(KeyboardInterrupt):
+        client.get(URL)
+    assert client.get(URL).status_code == 200
+
+
+def test_breaker_allows_one_trial_at_a_time():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow() == 'trial'
+    assert breaker.allow() is False
+    breaker.record_success()
+    assert breaker.allow() is True
+
+
+def test_scrape_players_raises_on_a_final_error_status(monkeypatch):
+    client = client_with([FakeResponse(503, '<html>Service Unavailable</html>')], retries=0)
+    monkeypatch.setattr(scraper, 'get_client', lambda: client)
+    with pytest.raises(requests.HTTPError):
+        scraper.scrape_players(URL, 'Open')
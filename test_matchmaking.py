@@ -0,0 +1,52 @@
+import itertools
+import random
+
+import pytest
+
+import matchmaking
+
+
+def total_cost(ratings, result):
+    return sum(diff * diff for _, _, diff in result['games'])
+
+
+def brute_force_cost(ratings):
+    """Lowest summed squared difference over every seating order of the pool."""
+    best = None
+    for order in itertools.permutations(range(len(ratings))):
+        cost = 0
+        for g in range(len(ratings) // 4):
+            diff = matchmaking.best_split([ratings[p] for p in order[4 * g:4 * g + 4]])[0]
+            cost += diff * diff
+        best = cost if best is None else min(best, cost)
+    return best
+
+
+@pytest.mark.parametrize('count', range(4, 21))
+def test_every_player_plays_once_or_sits_out(count):
+    rng = random.Random(count)
+    ratings = [rng.randrange(800, 2200) for _ in range(count)]
+    result = matchmaking.suggest_games(ratings, time_limit=0.5)
+
+    assert len(result['games']) == count // 4
+    assert len(result['sitting_out']) == count % 4
+    used = [p for team1, team2, _ in result['games'] for p in team1 + team2] + list(result['sitting_out'])
+    assert sorted(used) == list(range(count))
+    for team1, team2, diff in result['games']:
+        r1, r2 = (sum(ratings[p] for p in team) for team in (team1, team2))
+        assert diff == r1 - r2 >= 0
+    assert [diff for _, _, diff in result['games']] == sorted(diff for _, _, diff in result['games'])
+    assert result['exact'] == (count <= 12)
+
+
+@pytest.mark.parametrize('count', range(4, 9))
+def test_small_pools_are_solved_exactly(count):
+    rng = random.Random(100 + count)
+    ratings = [rng.randrange(800, 2200) for _ in range(count)]
+    result = matchmaking.suggest_games(ratings)
+    assert result['exact'] and result['converged']
+    assert total_cost(ratings, result) == brute_force_cost(ratings)
+
+
+def test_best_split_pairs_strongest_with_weakest():
+    assert matchmaking.best_split([1900, 1700, 1500, 1400]) == (100, (0, 3), (1, 2))
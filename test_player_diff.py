@@ -0,0 +1,25 @@
+from player_diff import diff_players, is_empty
+
+
+def player(player_id, division='Open', **fields):
+    record = {'player_id': player_id, 'division': division, 'name': f'Player {player_id}', 'rank': player_id,
+              'elo_rating': 1500}
+    record.update(fields)
+    return record
+
+
+def test_players_are_matched_per_division():
+    old = [player(1), player(2), player(3, 'Women')]
+    new = [player(1, elo_rating=1520, rank=2), player(3, 'Open'), player(3, 'Women')]
+    diff = diff_players(old, new)
+    assert diff['added'] == [player(3, 'Open')]
+    assert diff['removed'] == [player(2)]
+    assert diff['changed'] == [{'player_id': 1, 'division': 'Open', 'name': 'Player 1',
+                                'changes': {'rank': [1, 2], 'elo_rating': [1500, 1520]}}]
+    assert not is_empty(diff)
+
+
+def test_unchanged_rosters_give_an_empty_diff():
+    # Fields outside DIFF_FIELDS are ignored
+    diff = diff_players([player(1)], [player(1, url='https://example.test')])
+    assert is_empty(diff)
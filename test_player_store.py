@@ -0,0 +1,49 @@
+import pytest
+
+import flask_app
+from player_store import Snapshot, pick_division_record
+
+
+def player(name, player_id, division, rating=1500):
+    return {'name': name, 'player_id': player_id, 'division': division, 'elo_rating': rating}
+
+
+@pytest.fixture
+def snapshot():
+    men = [player('Paul Siemer', 265, 'Open', 1900), player('Sam Both', 300, 'Open', 1700),
+           player('Jonas Müller', 301, 'Open'), player('jonas-muller', 302, 'Open')]
+    women = [player('Sam Both', 300, 'Women', 1600), player('Lena Koch', 401, 'Women')]
+    return Snapshot(men, women, generation=1)
+
+
+def test_ids_map_to_every_division_record(snapshot):
+    assert [p['division'] for p in snapshot.find_by_id(300)] == ['Open', 'Women']
+    assert snapshot.find_by_id(265) == [snapshot.players[0]]
+    assert snapshot.find_by_id(999) == []
+
+
+def test_exact_names_are_normalized(snapshot):
+    assert snapshot.find_by_exact_name('  paul SIEMER! ') == [snapshot.players[0]]
+    assert [p['division'] for p in snapshot.find_by_exact_name('sam both')] == ['Open', 'Women']
+    # 'Jonas Müller' and 'jonas-muller' differ after normalization
+    assert [p['player_id'] for p in snapshot.find_by_exact_name('JONAS MULLER')] == [302]
+    assert snapshot.find_by_exact_name('') == []
+    assert snapshot.find_by_matched_name('jonas-muller') == [snapshot.players[3]]
+    assert snapshot.find_by_matched_name('Jonas Muller') == []
+
+
+def test_division_tie_break():
+    open_record, women_record = player('Sam Both', 300, 'Open'), player('Sam Both', 300, 'Women')
+    assert pick_division_record([open_record, women_record]) is women_record
+    assert pick_division_record([open_record, women_record], wants_open=True) is open_record
+    assert pick_division_record([women_record], wants_open=True) is women_record
+
+
+def test_lookups_resolve_ids_and_names(snapshot):
+    assert flask_app.get_matched_player('300', snapshot) == (snapshot.players[4], None, True)
+    record, score, exact = flask_app.get_matched_player('Sam Both (o)', snapshot)
+    assert (record['division'], score, exact) == ('Open', 100, True)
+    assert flask_app.resolve_player_info('300', snapshot) == (1600, 'Sam Both')
+    assert flask_app.resolve_player_info('Sam Both (1)', snapshot) == (1700, 'Sam Both')
+    assert flask_app.resolve_player_info('1234', snapshot) == (1234, 'Direct RGX 1234')
+    assert flask_app.resolve_player_info('(1650)', snapshot) == (1650, 'Direct RGX 1650')
@@ -0,0 +1,29 @@
+import os
+
+from profiler import SamplingProfiler
+
+
+def dump(profiler, label):
+    profile = profiler.start_request(label)
+    profile.samples['flask_app.py:handler'] += 1
+    return profiler.end_request(profile)
+
+
+def test_only_the_newest_profiles_are_kept(tmp_path):
+    (tmp_path / 'earlier-run.folded').write_text('a 1\n')
+    profiler = SamplingProfiler(str(tmp_path), keep=3)
+    profiler.configure(True)
+    try:
+        paths = [dump(profiler, f'GET /players {i}') for i in range(4)]
+    finally:
+        profiler.configure(False)
+
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(path) for path in paths[1:])
+    assert profiler.status()['profiles_written'] == 4
+    assert profiler.status()['profiles_kept'] == 3
+
+
+def test_short_requests_leave_no_profile(tmp_path):
+    profiler = SamplingProfiler(str(tmp_path), min_duration=60)
+    assert dump(profiler, 'GET /players') is None
+    assert os.listdir(tmp_path) == []
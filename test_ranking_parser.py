@@ -0,0 +1,63 @@
+import json
+import os
+
+import pytest
+
+import ranking_parser
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+BACKENDS = [name for name in ranking_parser.BACKENDS if name != 'lxml' or ranking_parser.lxml is not None]
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def golden(name):
+    return json.loads(fixture(name))
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('page', ['ranking_sample', 'ranking_edge_cases'])
+def test_backends_match_the_golden_output(backend, page):
+    # ranking_sample.json is the output of the original bs4 parser
+    assert ranking_parser.parse_players(fixture(page + '.html'), 'Open', backend) == golden(page + '.json')
+
+
+@pytest.mark.parametrize('chunk_size', [1, 13, 4096])
+def test_stream_backend_is_independent_of_chunking(chunk_size):
+    html = fixture('ranking_sample.html')
+    assert ranking_parser.parse_players_stream(html, 'Open', chunk_size=chunk_size) == golden('ranking_sample.json')
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_page_without_ranking_table_raises(backend):
+    with pytest.raises(ranking_parser.RankingPageError):
+        ranking_parser.parse_players(fixture('error_page.html'), 'Open', backend)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_table_without_body_raises(backend):
+    html = '<table id="rgx-main-table"><tr><td>1.</td></tr></table>'
+    with pytest.raises(ranking_parser.RankingPageError):
+        ranking_parser.parse_players(html, 'Open', backend)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_table_without_rows_is_empty(backend):
+    assert ranking_parser.parse_players(fixture('ranking_empty.html'), 'Women', backend) == []
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_row_without_badge_falls_back_to_defaults(backend):
+    players = ranking_parser.parse_players(fixture('ranking_edge_cases.html'), 'Open', backend)
+    no_badge = players[0]
+    assert (no_badge['name'], no_badge['elo_rating'], no_badge['pro_status']) == ('No Badge', 0, False)
+    # The row without a player link is skipped
+    assert 'Without link' not in [p['name'] for p in players]
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        ranking_parser.parse_players('', 'Open', 'regex')
@@ -0,0 +1,94 @@
+import random
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import rating_engine
+from rating_engine import RatingEngine, RatingEngineError
+
+
+def random_games(count, players=40, seed=3):
+    rng = random.Random(seed)
+    games = []
+    for _ in range(count):
+        four = rng.sample(range(players), 4)
+        games.append(([f'p{four[0]}', f'p{four[1]}'], [f'p{four[2]}', f'p{four[3]}'],
+                      rng.choice([0.5, 1.0, 1.5]), rng.random()))
+    return games
+
+
+def test_bulk_replay_equals_applying_games_one_by_one():
+    games = random_games(2000)
+    bulk, sequential = RatingEngine(), RatingEngine()
+    x1 = bulk.replay(games)
+    changes = [sequential.apply(*game) for game in games]
+
+    assert bulk.keys == sequential.keys
+    np.testing.assert_allclose(bulk.ratings, sequential.ratings, rtol=0, atol=1e-9)
+    np.testing.assert_allclose(x1, changes, rtol=0, atol=1e-9)
+    history, expected = bulk.history('p7'), sequential.history('p7')
+    assert len(history) == len(expected)
+    for got, want in zip(history, expected):
+        assert got == pytest.approx(want, abs=1e-9)
+
+
+def test_history_chains_ratings():
+    engine = RatingEngine()
+    engine.replay(random_games(300))
+    entries = engine.history('p3')
+    assert entries[0]['rating_before'] == engine.default_rating
+    for previous, entry in zip(entries, entries[1:]):
+        assert entry['rating_before'] == pytest.approx(previous['rating_after'])
+    assert entries[-1]['rating_after'] == pytest.approx(engine.rating('p3'))
+
+
+@pytest.mark.parametrize('team1, team2', [
+    (['a', 'b'], ['c']),
+    (['a', 'b'], ['c', 'a']),
+    ([['a'], 'b'], ['c', 'd']),
+    (['a', {'id': 1}], ['c', 'd']),
+    (['a', True], ['c', 'd']),
+])
+def test_invalid_teams_are_rejected(team1, team2):
+    engine = RatingEngine()
+    with pytest.raises(RatingEngineError):
+        engine.apply(team1, team2, 1, 0.5)
+    with pytest.raises(RatingEngineError):
+        engine.replay([(['w', 'x'], ['y', 'z'], 1, 0.5), (team1, team2, 1, 0.5)])
+    assert len(engine) == 0 and engine.games_played == 0
+
+
+def test_project_leaves_the_engine_unchanged():
+    engine = RatingEngine()
+    engine.replay(random_games(100, players=10))
+    ratings, played = engine.ratings.copy(), engine.games_played
+
+    projected, _, _ = engine.project([(['p1', 'p2'], ['newcomer', 'p4'], 1, 1)])
+    assert projected['p1'][1] > projected['p1'][0]
+    assert projected['newcomer'][2] == 1
+    assert 'newcomer' not in engine.index
+    np.testing.assert_array_equal(engine.ratings, ratings)
+    assert engine.games_played == played
+
+
+def test_state_round_trip(tmp_path):
+    engine = RatingEngine(1200)
+    engine.replay(random_games(50, players=8))
+    path = str(tmp_path / 'state.npz')
+    engine.save(path)
+    loaded = RatingEngine.load(path)
+    assert loaded.keys == engine.keys and loaded.default_rating == 1200
+    np.testing.assert_array_equal(loaded.ratings, engine.ratings)
+    assert loaded.history('p1') == engine.history('p1')
+
+
+def test_replay_rejects_data_dir_with_existing_state(tmp_path, monkeypatch):
+    state = tmp_path / 'state.npz'
+    RatingEngine().save(str(state))
+    games = tmp_path / 'games.jsonl'
+    games.write_text('{"team1": ["a", "b"], "team2": ["c", "d"], "p": 1}\n', encoding='utf-8')
+    monkeypatch.setattr('sys.argv', ['rating_engine.py', 'replay', str(games), '--state', str(state),
+                                     '--data-dir', str(tmp_path)])
+    with pytest.raises(SystemExit):
+        rating_engine.main()
@@ -0,0 +1,125 @@
+import random
+
+import pytest
+
+from player_store import MappedSnapshot, Snapshot
+from roster_query import QueryError, encode_cursor, query_players
+from snapshot_format import SNAPSHOT_FILENAME, write_snapshot
+
+CLUBS = ['Roundnet Berlin', 'Spikeball Köln', 'RN Hamburg', None]
+
+
+def rosters(seed=4):
+    rng = random.Random(seed)
+    divisions = {'Open': [], 'Women': []}
+    for division, count in (('Open', 120), ('Women', 60)):
+        for rank in range(1, count + 1):
+            divisions[division].append({
+                'name': f'{rng.choice("ABCDEFGH")}{rng.choice("aeiou")} {division} {rank}',
+                'player_id': len(divisions['Open']) + len(divisions['Women']) + 1,
+                'rank': rank if rng.random() > 0.05 else None,
+                'club': rng.choice(CLUBS), 'city': rng.choice(['Köln', 'Berlin', None]),
+                'games': rng.randrange(0, 80),
+                'elo_rating': rng.randrange(900, 2100) if rng.random() > 0.05 else None,
+                'division': division, 'trend_90_days': rng.randrange(-50, 50),
+                'pro_status': rng.random() < 0.2, 'exists_in_both_divisions': False,
+            })
+    return divisions['Open'], divisions['Women']
+
+
+def reference(snapshot, query):
+    """The query answered by filtering and sorting the whole roster."""
+    division = query.get('division', '').lower() or None
+    players = {None: snapshot.players, 'open': snapshot.men_players, 'women': snapshot.women_players}[division]
+    bounds = {k: int(v) for k, v in query.items() if k.startswith(('min_', 'max_'))}
+    ranges = {'rank': (bounds.get('min_rank'), bounds.get('max_rank')),
+              'elo_rating': (bounds.get('min_elo'), bounds.get('max_elo'))}
+
+    def matches(p):
+        for field in ('club', 'city'):
+            if field in query and (p[field] or '').lower() != query[field].strip().lower():
+                return False
+        if 'pro_status' in query and p['pro_status'] != (query['pro_status'] == 'true'):
+            return False
+        for field, (low, high) in ranges.items():
+            if low is None and high is None:
+                continue
+            if p[field] is None or (low is not None and p[field] < low) or (high is not None and p[field] > high):
+                return False
+        return True
+
+    sort = query.get('sort', 'rank')
+    field = {'elo': 'elo_rating'}.get(sort.lstrip('-'), sort.lstrip('-'))
+    key = (lambda p: p['name'].lower()) if field == 'name' else (lambda p: p[field])
+    selected = [p for p in players if matches(p)]
+    with_value = sorted((p for p in selected if p[field] is not None), key=key, reverse=sort.startswith('-'))
+    return with_value + [p for p in selected if p[field] is None]
+
+
+def random_query(rng):
+    query = {}
+    if rng.random() < 0.5:
+        query['division'] = rng.choice(['open', 'women', 'Women'])
+    if rng.random() < 0.3:
+        query['club'] = rng.choice(['roundnet berlin', ' Spikeball Köln ', 'nobody'])
+    if rng.random() < 0.2:
+        query['city'] = rng.choice(['köln', 'Berlin'])
+    if rng.random() < 0.3:
+        query['pro_status'] = rng.choice(['true', 'false'])
+    for low, high, lo_bound, hi_bound in (('min_rank', 'max_rank', 1, 120), ('min_elo', 'max_elo', 900, 2100)):
+        if rng.random() < 0.3:
+            query[low] = str(rng.randrange(lo_bound, hi_bound))
+        if rng.random() < 0.3:
+            query[high] = str(rng.randrange(lo_bound, hi_bound))
+    query['sort'] = rng.choice(['rank', '-rank', 'elo', '-elo_rating', 'games', '-trend_90_days', 'name', '-name'])
+    return query
+
+
+@pytest.fixture(params=['json', 'mapped'])
+def snapshot(request, tmp_path):
+    men, women = rosters()
+    if request.param == 'json':
+        return Snapshot(men, women, generation=3)
+    path = tmp_path / SNAPSHOT_FILENAME
+    write_snapshot(str(path), {'men_players': men, 'women_players': women}, generation=3)
+    return MappedSnapshot(str(path))
+
+
+def fetch_all(snapshot, query, limit):
+    """Follow next_cursor through every page of a query."""
+    page = query_players(snapshot, dict(query, limit=str(limit)))
+    players, total = list(page['players']), page['total']
+    while page['next_cursor']:
+        page = query_players(snapshot, dict(query, limit=str(limit), cursor=page['next_cursor']))
+        assert page['total'] == total
+        players += page['players']
+    return players, total
+
+
+def test_queries_match_a_full_filter_and_sort(snapshot):
+    rng = random.Random(6)
+    for _ in range(150):
+        query = random_query(rng)
+        expected = reference(snapshot, query)
+        players, total = fetch_all(snapshot, query, rng.choice([1, 7, 50, 1000]))
+        assert total == len(expected), query
+        assert [p['player_id'] for p in players] == [p['player_id'] for p in expected], query
+
+
+def test_offset_limit_and_projection(snapshot):
+    page = query_players(snapshot, {'division': 'open', 'offset': '10', 'limit': '5', 'fields': 'name,rank'})
+    assert (page['total'], page['offset'], page['limit'], page['generation']) == (120, 10, 5, 3)
+    assert [set(p) for p in page['players']] == [{'name', 'rank'}] * 5
+    assert page['next_cursor'] == encode_cursor(3, 15)
+    last = query_players(snapshot, {'division': 'open', 'offset': '118', 'limit': '5'})
+    assert len(last['players']) == 2 and last['next_cursor'] is None
+    assert query_players(snapshot, {'limit': '5000'})['limit'] == 1000
+
+
+@pytest.mark.parametrize('args', [
+    {'division': 'mixed'}, {'sort': 'club'}, {'fields': 'name,secret'}, {'limit': 'ten'},
+    {'min_elo': '1.5'}, {'pro_status': 'maybe'}, {'cursor': '!!!'}, {'cursor': encode_cursor(2, 10)},
+])
+def test_invalid_parameters_are_rejected(snapshot, args):
+    with pytest.raises(QueryError):
+        query_players(snapshot, args)
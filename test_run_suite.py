@@ -0,0 +1,137 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+
+import history  # noqa: E402
+import ranking_parser  # noqa: E402
+import run_suite  # noqa: E402
+from stub_server import StubSite, start_in_thread  # noqa: E402
+from synthetic import synthetic_history  # noqa: E402
+
+RUN_SUITE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks', 'run_suite.py')
+ROSTER_FIELDS = ('name', 'player_id', 'rank', 'games', 'elo_rating', 'division', 'trend_90_days', 'pro_status')
+
+
+@pytest.fixture(scope='module')
+def stub():
+    site = StubSite(players=50, history_points=12, seed=3)
+    server, base_url = start_in_thread(site)
+    yield site, base_url
+    server.shutdown()
+
+
+@pytest.mark.parametrize('backend', ranking_parser.BACKENDS)
+def test_stub_ranking_pages_scrape_back_to_the_synthetic_rosters(stub, backend):
+    if backend == 'lxml' and ranking_parser.lxml is None:
+        pytest.skip('lxml is not installed')
+    import scraper
+
+    site, base_url = stub
+    for label, path, _ in scraper.DIVISIONS:
+        ranking_id = int(path.rsplit('/', 1)[1])
+        scraped = scraper.scrape_players(base_url + path, label, backend)
+        expected = site.rosters[ranking_id]
+        assert [{k: p[k] for k in ROSTER_FIELDS} for p in scraped] == \
+            [{k: p[k] for k in ROSTER_FIELDS} for p in expected]
+
+
+def test_stub_answers_conditional_requests_and_unknown_pages(stub):
+    site, base_url = stub
+    response = requests.get(base_url + '/ranking/rg-index/1')
+    etag = response.headers['ETag']
+    assert response.status_code == 200 and etag == site.ranking_page(1)[1]
+    assert requests.get(base_url + '/ranking/rg-index/1', headers={'If-None-Match': etag}).status_code == 304
+    assert requests.get(base_url + '/ranking/rg-index/1', headers={'If-None-Match': '"old"'}).status_code == 200
+    for path in ('/ranking/rg-index/3', '/ranking/rg-index/x', '/ranking/rg-rating/history?player_id=1&ranking_id=9',
+                 '/ranking/rg-rating/history?player_id=x&ranking_id=1', '/nope'):
+        assert requests.get(base_url + path).status_code == 404
+
+
+def test_stub_history_is_the_seeded_walk(stub):
+    _, base_url = stub
+    expected = [{'date': day, 'points': rating} for day, rating in synthetic_history('2-7', 12, seed=3)]
+    assert history.fetch_history(7, 2, base_url) == expected
+    assert history.fetch_history(7, 2, base_url) == expected
+    assert history.fetch_history(7, 1, base_url) != expected
+    with pytest.raises(history.HistoryError):
+        history.fetch_history(7, 9, base_url)
+
+
+def test_percentiles_use_the_nearest_rank():
+    values = list(range(1, 101))
+    assert run_suite.percentile([], 0.5) is None
+    assert [run_suite.percentile(values, f) for f in (0, 0.5, 0.9, 0.99, 1)] == [1, 50, 90, 99, 100]
+    assert run_suite.summarize([0.003, 0.001, 0.002], 1e3) == \
+        {'mean': 2.0, 'p50': 2.0, 'p90': 3.0, 'p99': 3.0, 'max': 3.0}
+    assert run_suite.summarize([], 1e3)['p50'] is None
+
+
+def test_every_api_route_has_a_load_scenario_or_is_excluded(stub):
+    import flask_app
+
+    site, _ = stub
+    rng = run_suite.random.Random(0)
+    scenarios = run_suite.scenarios(site.rosters[1], site.rosters[2], rng)
+    rules = {rule.rule for rule in flask_app.app.url_map.iter_rules()}
+    covered = {rule for _, rule, _, _ in scenarios}
+    assert covered <= rules
+    assert rules - covered == run_suite.UNTESTED_ROUTES
+    assert len({name for name, _, _, _ in scenarios}) == len(scenarios)
+
+
+def write_result(path, micro_ops, load_rps, load_p99):
+    path.write_text(json.dumps({
+        'micro': {'parse': {'ops_per_s': micro_ops, 'p99_us': 10.0}},
+        'load': {'elo_id': {'requests_per_s': load_rps, 'p50_ms': 1.0, 'p99_ms': load_p99}},
+    }), encoding='utf-8')
+    return str(path)
+
+
+def compare(*argv):
+    return subprocess.run([sys.executable, RUN_SUITE, 'compare', *argv], capture_output=True, text=True)
+
+
+def test_compare_flags_regressions_beyond_the_threshold(tmp_path):
+    baseline = write_result(tmp_path / 'baseline.json', 1000.0, 500.0, 4.0)
+    slower = write_result(tmp_path / 'slower.json', 800.0, 490.0, 6.0)
+
+    result = compare(baseline, slower, '--fail-above', '10')
+    assert result.returncode == 1
+    regressions = [line.split()[1:3] for line in result.stdout.splitlines() if line.endswith('REGRESSION')]
+    assert regressions == [['parse', 'ops_per_s'], ['elo_id', 'p99_ms']]
+    assert '2 metric(s) worse by more than 10%.' in result.stdout
+
+    assert compare(baseline, slower, '--fail-above', '60').returncode == 0
+    assert compare(baseline, slower).returncode == 0
+    faster = write_result(tmp_path / 'faster.json', 2000.0, 900.0, 1.0)
+    assert compare(baseline, faster, '--fail-above', '0').returncode == 0
+
+
+def test_run_writes_a_complete_report(tmp_path):
+    output = tmp_path / 'results.json'
+    subprocess.run([sys.executable, RUN_SUITE, 'run', '--players', '40', '--history-points', '10',
+                    '--min-time', '0.01', '--duration', '0.05', '--concurrency', '2', '--output', str(output)],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    report = json.loads(output.read_text(encoding='utf-8'))
+
+    assert report['arguments']['players'] == 40
+    assert report['environment']['python']
+    assert report['uncovered_routes'] == []
+    assert {'parse_ranking_stream', 'parse_history', 'fetch_history_http', 'match_player_fuzzy_name',
+            'match_batch_outcomes_1000'} <= set(report['micro'])
+    for name, result in report['micro'].items():
+        assert result['iterations'] >= 3 and result['ops_per_s'] > 0, name
+        assert result['p50_us'] <= result['p90_us'] <= result['p99_us'] <= result['max_us'], name
+
+    rng = run_suite.random.Random(0)
+    assert set(report['load']) == {name for name, _, _, _ in run_suite.scenarios([], [], rng)}
+    for name, result in report['load'].items():
+        assert result['requests'] > 0 and result['errors'] == 0, (name, result['statuses'])
+        assert sum(result['statuses'].values()) == result['requests'], name
+        assert result['p50_ms'] <= result['p99_ms'] <= result['max_ms'], name
@@ -0,0 +1,177 @@
+import json
+import os
+
+import pytest
+
+import scraper
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+PLAYER = {'name': 'Paul Siemer', 'player_id': 265, 'rank': 1, 'club': '', 'city': '', 'games': 1,
+          'elo_rating': 1972, 'division': 'Open', 'trend_90_days': 0, 'pro_status': True,
+          'exists_in_both_divisions': False}
+
+
+class StreamedResponse:
+    """Just enough of requests.Response for a streamed download."""
+
+    def __init__(self, html, chunk_size):
+        self.html = html
+        self.chunk_size = chunk_size
+        self.status_code = 200
+        self.encoding = None
+        self.closed = False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size, decode_unicode):
+        assert decode_unicode and self.encoding == 'utf-8'
+        return (self.html[i:i + self.chunk_size] for i in range(0, len(self.html), self.chunk_size))
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClient:
+    def __init__(self, response):
+        self.response = response
+        self.calls = []
+
+    def get(self, url, **kwargs):
+        self.calls.append(kwargs)
+        return self.response
+
+
+def test_stream_backend_parses_the_response_as_it_arrives(monkeypatch):
+    with open(os.path.join(FIXTURES, 'ranking_sample.html'), 'r', encoding='utf-8') as f:
+        response = StreamedResponse(f.read(), chunk_size=97)
+    with open(os.path.join(FIXTURES, 'ranking_sample.json'), 'r', encoding='utf-8') as f:
+        expected = json.load(f)
+    client = FakeClient(response)
+    monkeypatch.setattr(scraper, 'get_client', lambda: client)
+
+    assert scraper.scrape_players('http://upstream.test/ranking', 'Open', 'stream') == expected
+    assert client.calls == [{'stream': True}]
+    assert response.closed
+
+
+def run_main(monkeypatch, tmp_path, rosters):
+    monkeypatch.setenv('PLAYERZONE_DATA_DIR', str(tmp_path))
+    monkeypatch.setattr('sys.argv', ['scraper.py', '--base-url', 'http://upstream.test'])
+    monkeypatch.setattr(scraper, 'scrape_players', lambda url, label, backend=None: rosters[label])
+    scraper.main()
+
+
+def test_empty_scrape_keeps_the_existing_rosters(monkeypatch, tmp_path, capsys):
+    for filename in ('men_players.json', 'women_players.json'):
+        (tmp_path / filename).write_text(json.dumps([PLAYER]), encoding='utf-8')
+    run_main(monkeypatch, tmp_path, {'Open': [], 'Women': []})
+
+    assert 'Parsed 0 Open players' in capsys.readouterr().out
+    for filename in ('men_players.json', 'women_players.json'):
+        assert json.loads((tmp_path / filename).read_text(encoding='utf-8')) == [PLAYER]
+    assert not (tmp_path / 'players.pzc').exists()
+
+
+def test_first_scrape_may_be_empty(monkeypatch, tmp_path):
+    run_main(monkeypatch, tmp_path, {'Open': [dict(PLAYER)], 'Women': []})
+    assert json.loads((tmp_path / 'women_players.json').read_text(encoding='utf-8')) == []
+
+
+def test_incremental_scrape_refuses_an_emptied_division(monkeypatch, tmp_path):
+    (tmp_path / 'men_players.json').write_text(json.dumps([PLAYER]), encoding='utf-8')
+    (tmp_path / 'women_players.json').write_text('[]', encoding='utf-8')
+    with open(os.path.join(FIXTURES, 'ranking_empty.html'), 'r', encoding='utf-8') as f:
+        empty_page = f.read()
+    monkeypatch.setattr(scraper, 'fetch_if_changed', lambda url, state: empty_page)
+
+    with pytest.raises(scraper.EmptyRosterError):
+        scraper.scrape_incremental(str(tmp_path), 'http://upstream.test')
+    assert json.loads((tmp_path / 'men_players.json').read_text(encoding='utf-8')) == [PLAYER]
+
+
+def test_a_scrape_is_loaded_as_one_generation(monkeypatch, tmp_path):
+    from player_store import PlayerStore
+
+    women = dict(PLAYER, name='Lena Koch', player_id=401, division='Women')
+    scraper.write_rosters(str(tmp_path), [PLAYER], [women])
+    store = PlayerStore(str(tmp_path), check_interval=0)
+    assert store.get_snapshot().generation == 1
+
+    # The store checks the files after every rename the scraper makes
+    seen = []
+    replace = os.replace
+
+    def replace_and_check(src, dst):
+        replace(src, dst)
+        snapshot = store.get_snapshot()
+        seen.append((snapshot.generation, [p['elo_rating'] for p in snapshot.players]))
+
+    monkeypatch.setattr(os, 'replace', replace_and_check)
+    run_main(monkeypatch, tmp_path, {'Open': [dict(PLAYER, elo_rating=2000)], 'Women': [dict(women, elo_rating=1800)]})
+
+    # players.pzc, then both JSON exports
+    assert seen == [(2, [2000, 1800])] * 3
+
+
+class PageResponse:
+    def __init__(self, status_code, text='', headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.content = text.encode('utf-8')
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        assert self.status_code < 400
+
+
+def test_fetch_if_changed_sends_validators_and_skips_unchanged_pages(monkeypatch):
+    client = FakeClient(PageResponse(200, '<html>v1</html>', {'ETag': '"a"', 'Last-Modified': 'Mon, 01 Jan 2024'}))
+    monkeypatch.setattr(scraper, 'get_client', lambda: client)
+    state = {}
+
+    assert scraper.fetch_if_changed('http://upstream.test/1', state) == '<html>v1</html>'
+    assert client.calls[-1] == {'headers': {}}
+    # Same bytes without a 304: the content hash catches it
+    assert scraper.fetch_if_changed('http://upstream.test/1', state) is None
+    assert client.calls[-1] == {'headers': {'If-None-Match': '"a"', 'If-Modified-Since': 'Mon, 01 Jan 2024'}}
+
+    client.response = PageResponse(304)
+    assert scraper.fetch_if_changed('http://upstream.test/1', state) is None
+    client.response = PageResponse(200, '<html>v2</html>')
+    assert scraper.fetch_if_changed('http://upstream.test/1', state) == '<html>v2</html>'
+    assert state['etag'] is None and state['content_hash']
+
+
+def test_incremental_scrape_writes_only_changes(monkeypatch, tmp_path):
+    women = dict(PLAYER, name='Lena Koch', player_id=401, division='Women')
+    pages = {'/ranking/rg-index/1': 'open v1', '/ranking/rg-index/2': 'women v1'}
+    rosters = {'open v1': [dict(PLAYER)], 'open v2': [dict(PLAYER, elo_rating=2000)], 'women v1': [dict(women)]}
+    served = {}
+
+    def fetch(url, page_state):
+        html = pages[url.replace('http://upstream.test', '')]
+        unchanged = served.get(url) == html
+        served[url] = html
+        return None if unchanged else html
+
+    monkeypatch.setattr(scraper, 'fetch_if_changed', fetch)
+    monkeypatch.setattr(scraper, 'parse_players', lambda html, label, backend=None: [dict(p) for p in rosters[html]])
+
+    first = scraper.scrape_incremental(str(tmp_path), 'http://upstream.test')
+    assert [(d['division'], len(d['added'])) for d in first] == [('Open', 1), ('Women', 1)]
+    women_mtime = (tmp_path / 'women_players.json').stat().st_mtime_ns
+
+    assert scraper.scrape_incremental(str(tmp_path), 'http://upstream.test') == []
+
+    pages['/ranking/rg-index/1'] = 'open v2'
+    (delta,) = scraper.scrape_incremental(str(tmp_path), 'http://upstream.test')
+    assert (delta['division'], delta['added'], delta['removed']) == ('Open', [], [])
+    assert delta['changed'] == [{'player_id': 265, 'division': 'Open', 'name': 'Paul Siemer',
+                                 'changes': {'elo_rating': [1972, 2000]}}]
+
+    assert json.loads((tmp_path / 'men_players.json').read_text(encoding='utf-8'))[0]['elo_rating'] == 2000
+    assert (tmp_path / 'women_players.json').stat().st_mtime_ns == women_mtime
+    logged = [json.loads(line) for line in (tmp_path / 'player_deltas.jsonl').read_text(encoding='utf-8').splitlines()]
+    assert [d['division'] for d in logged] == ['Open', 'Women', 'Open']
+    assert 'http://upstream.test/ranking/rg-index/1' in json.loads((tmp_path / 'scrape_state.json').read_text())
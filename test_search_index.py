@@ -0,0 +1,104 @@
+import random
+import string
+import warnings
+
+import pytest
+
+from search_index import NameSearchIndex, SuggestIndex
+
+with warnings.catch_warnings():
+    warnings.simplefilter('ignore')
+    from fuzzywuzzy import process
+
+FIRST = ['Paul', 'Jonas', 'Lena', 'Anna', 'Lukas', 'Marie', 'Felix', 'Sophie', 'Max', 'Zoë', 'Jürgen', 'Ole']
+LAST = ['Siemer', 'Hoffmann', 'Müller', 'Schmidt', 'Schneider', 'Fischer', 'Weber', 'Meyer', 'Wagner', 'Becker',
+        'Schulz', 'Koch', 'Richter', 'Klein', 'Wolf', 'Neumann', 'Schwarz', 'Zimmermann', 'Braun', 'Krüger']
+
+
+def roster(count=1500, seed=11):
+    rng = random.Random(seed)
+    names = []
+    for _ in range(count):
+        suffix = ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(0, 4)))
+        names.append(f'{rng.choice(FIRST)} {rng.choice(LAST)}{suffix}')
+    return names
+
+
+def typo(name, rng):
+    chars = list(name)
+    for _ in range(rng.randint(0, 2)):
+        i = rng.randrange(len(chars))
+        operation = rng.choice(('drop', 'swap', 'replace'))
+        if operation == 'drop' and len(chars) > 3:
+            del chars[i]
+        elif operation == 'swap' and i + 1 < len(chars):
+            chars[i], chars[i + 1] = chars[i + 1], chars[i]
+        else:
+            chars[i] = rng.choice(string.ascii_lowercase)
+    return ''.join(chars)
+
+
+def test_matches_are_identical_to_extract_one():
+    # extractOne scores with difflib in pure Python, so the roster stays small
+    names = roster(150) + ['Finn Schäfer', 'Anna Schäfer-Köhler', 'Lena Schulz-Schröder', 'Finn Schfer', 'Jo Hn']
+    index = NameSearchIndex(names)
+    rng = random.Random(5)
+    queries = [typo(rng.choice(names), rng) for _ in range(60)]
+    queries += [rng.choice(LAST).lower() for _ in range(10)]
+    queries += [''.join(rng.choice(string.ascii_lowercase + ' ') for _ in range(rng.randint(2, 12))) for _ in range(20)]
+    queries += ['Finn Schfäer', 'Schäfer-Köhler', 'Schulz-Schröder', 'hn', 'Jürgen', 'zoe muller', '!!!']
+
+    for query in queries:
+        assert index.extract_one(query) == process.extractOne(query, names), query
+
+
+def test_exact_names_and_edge_cases():
+    names = roster(200)
+    index = NameSearchIndex(names + names[:10])
+    assert len(index) == len(set(names))
+    assert index.extract_one(names[42]) == (names[42], 100)
+    assert index.extract_one('!!!') == (index.names[0], 0)
+    assert NameSearchIndex([]).extract_one('Paul') is None
+
+
+def test_suggestions_put_prefix_matches_first():
+    players = [{'name': name, 'player_id': i, 'elo_rating': 1000 + i, 'division': 'Open'}
+               for i, name in enumerate(['Paul Siemer', 'Paula Weber', 'Jonas Paulsen', 'Anna Koch'])]
+    suggestions = SuggestIndex(players).prefix('pau')
+    assert {p['name'] for p in suggestions} >= {'Paul Siemer', 'Paula Weber'}
+    assert 'Anna Koch' not in {p['name'] for p in suggestions}
+
+
+def test_get_matched_player_matches_the_extract_one_baseline():
+    import flask_app
+    from player_store import Snapshot
+
+    names = roster(120, seed=3) + ['Finn Schäfer', 'Finn Schfer', 'Anna Schäfer-Köhler']
+    men = [{'name': name, 'player_id': i, 'division': 'Open'} for i, name in enumerate(names)]
+    women = [{'name': name, 'player_id': 1000 + i, 'division': 'Women'} for i, name in enumerate(names[::7])]
+    snapshot = Snapshot(men, women, generation=1)
+    all_names = [p['name'] for p in men + women]
+    rng = random.Random(8)
+
+    for query in [typo(rng.choice(names), rng) for _ in range(25)] + ['Finn Schäfer', 'finn schfäer', 'Köhler']:
+        player, score, exact = flask_app.get_matched_player(query, snapshot)
+        best, best_score = process.extractOne(query, all_names)
+        assert (player['name'], score, exact) == (best, best_score, best_score == 100), query
+
+
+def test_suggestions_match_name_parts_and_ids_in_rank_order():
+    players = [
+        {'name': 'Jonas Paulsen', 'player_id': 7, 'rank': 2, 'division': 'Open'},
+        {'name': 'Paul Siemer', 'player_id': 265, 'rank': 5, 'division': 'Open'},
+        {'name': 'Paula Weber', 'player_id': 266, 'rank': 1, 'division': 'Women'},
+        {'name': 'Anna-Paula Koch', 'player_id': 12, 'rank': None, 'division': 'Women'},
+    ]
+    index = SuggestIndex(players)
+
+    # Full-name prefixes first, by rank; then name-part prefixes
+    assert [p['name'] for p in index.prefix('Pau')] == ['Paula Weber', 'Paul Siemer', 'Jonas Paulsen',
+                                                        'Anna-Paula Koch']
+    assert [p['name'] for p in index.prefix('pau', division='women')] == ['Paula Weber', 'Anna-Paula Koch']
+    assert [p['name'] for p in index.prefix('pau', limit=1)] == ['Paula Weber']
+    assert [p['player_id'] for p in index.prefix('26')] == [266, 265]
+    assert index.prefix('  ') == [] and index.prefix('xyz') == []
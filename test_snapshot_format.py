@@ -0,0 +1,98 @@
+import gc
+import json
+import random
+
+import pytest
+
+from player_store import MappedSnapshot, PlayerStore, Snapshot
+from snapshot_format import SNAPSHOT_FILENAME, MappedColumns, read_snapshot, write_snapshot
+
+
+def player(name, player_id, rank, division='Open', **fields):
+    record = {'name': name, 'player_id': player_id, 'rank': rank, 'club': 'Club', 'city': 'Köln', 'games': 10,
+              'elo_rating': 1500 + rank, 'division': division, 'trend_90_days': 0, 'pro_status': False,
+              'exists_in_both_divisions': False}
+    record.update(fields)
+    return record
+
+
+def rosters():
+    rng = random.Random(7)
+    men = [player(f'Player {i}', i, i, elo_rating=rng.randrange(1000, 2000)) for i in range(1, 40)]
+    women = [player(f'Spielerin {i}', 100 + i, i, 'Women', elo_rating=rng.randrange(1000, 2000)) for i in range(1, 20)]
+    men += [
+        player('Zoë Müller', 200, 40, club=None, city=None, elo_rating=None),
+        # Same normalized name, different spelling
+        player('zoe-muller', 201, 41),
+        player('Both Divisions', 202, 42, exists_in_both_divisions=True, pro_status=True),
+    ]
+    women.append(player('Both Divisions', 202, 20, 'Women', exists_in_both_divisions=True, pro_status=True))
+    return {'men_players': men, 'women_players': women}
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    data = rosters()
+    for roster, players in data.items():
+        (tmp_path / f'{roster}.json').write_text(json.dumps(players), encoding='utf-8')
+    write_snapshot(str(tmp_path / SNAPSHOT_FILENAME), data, generation=1)
+    return tmp_path
+
+
+def mappings(path):
+    with open('/proc/self/maps') as f:
+        return sum(str(path) in line for line in f)
+
+
+def test_round_trip(data_dir):
+    assert read_snapshot(str(data_dir / SNAPSHOT_FILENAME)).to_players() == rosters()
+
+
+def test_mapped_lookups_match_the_json_snapshot(data_dir):
+    data = rosters()
+    plain = Snapshot(data['men_players'], data['women_players'], generation=1)
+    mapped = MappedSnapshot(str(data_dir / SNAPSHOT_FILENAME))
+
+    assert list(mapped.players) == plain.players
+    for player_id in (1, 105, 202, 999):
+        assert mapped.find_by_id(player_id) == plain.find_by_id(player_id)
+    for name in ('Player 7', 'player 7', 'Zoë Müller', 'zoe-muller', 'Both Divisions', '', 'nobody'):
+        assert mapped.find_by_exact_name(name) == plain.find_by_exact_name(name)
+        assert mapped.find_by_matched_name(name) == plain.find_by_matched_name(name)
+
+
+def test_presorted_orders_put_missing_values_last(data_dir):
+    mapped = MappedSnapshot(str(data_dir / SNAPSHOT_FILENAME))
+    players, keys = mapped.presorted('open', 'elo_rating', descending=True)
+    ratings = [p['elo_rating'] for p in players]
+    assert ratings[-1] is None
+    assert ratings[:-1] == sorted(ratings[:-1], reverse=True)
+    assert list(keys) == [-r for r in ratings[:-1]]
+
+
+def test_close_unmaps_the_file(data_dir):
+    path = data_dir / SNAPSHOT_FILENAME
+    columns = MappedColumns(str(path))
+    assert mappings(path) == 1
+    columns.close()
+    assert columns.closed and mappings(path) == 0
+
+
+def test_replaced_snapshots_are_unmapped_once_released(data_dir):
+    path = data_dir / SNAPSHOT_FILENAME
+    store = PlayerStore(str(data_dir), snapshot_format='mapped')
+    gc.disable()
+    try:
+        held = store.reload()
+        held.search_index
+        for generation in range(2, 6):
+            write_snapshot(str(path), rosters(), generation=generation)
+            store.reload().find_by_exact_name('Player 1')
+        # The current snapshot and the one a request still holds
+        assert mappings(path) == 2
+        assert held.players[0]['name'] == 'Player 1'
+        columns = held.columns
+        del held
+        assert columns.closed and mappings(path) == 1
+    finally:
+        gc.enable()
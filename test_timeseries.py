@@ -0,0 +1,56 @@
+import pytest
+
+from timeseries import TimeSeriesError, TimeSeriesStore, parse_moment, record_scrape
+
+DAY = 86400
+START = parse_moment('2024-03-01', 'date', end_of_day=False)
+
+
+def player(player_id, rank, elo, name=None, division='Open'):
+    return {'player_id': player_id, 'rank': rank, 'elo_rating': elo, 'games': rank * 10, 'trend_90_days': 0,
+            'division': division, 'name': name or f'Player {player_id}', 'club': 'Club', 'city': 'Köln'}
+
+
+@pytest.fixture
+def store(tmp_path):
+    path = str(tmp_path / 'timeseries.sqlite3')
+    record_scrape(path, [player(1, 1, 1800), player(2, 2, 1700), player(3, 3, 1600)],
+                  [player(9, 1, 1500, division='Women')], taken_at=START)
+    record_scrape(path, [player(3, 1, 1850, name='Player Three'), player(1, 2, 1790), player(2, 3, 1650)],
+                  [player(9, 1, 1510, division='Women')], taken_at=START + DAY)
+    return TimeSeriesStore(path)
+
+
+def test_player_series(store):
+    series = store.player_series(3, 'open')
+    assert [(s['date'], s['rank'], s['elo_rating']) for s in series] == [
+        ('2024-03-01T00:00:00Z', 3, 1600), ('2024-03-02T00:00:00Z', 1, 1850)
+    ]
+    assert store.player_series(3, 'open', start=START + 1) == series[1:]
+    assert store.player_series(3, 'women') == []
+
+
+def test_leaderboard_as_of_a_moment(store):
+    before = store.leaderboard(START + DAY / 2, 'open', limit=2)
+    assert [p['player_id'] for p in before['players']] == [1, 2] and before['total'] == 3
+    latest = store.leaderboard(parse_moment('2024-03-02', 'date'), 'open', limit=2, offset=1)
+    assert [(p['rank'], p['player_id']) for p in latest['players']] == [(2, 1), (3, 2)]
+    assert store.leaderboard(START - 1, 'open', limit=10) is None
+
+
+def test_movers(store):
+    by_rank = store.movers(START, START + DAY, 'open')
+    assert [(m['player_id'], m['change']) for m in by_rank['risers']] == [(3, 2)]
+    assert [(m['player_id'], m['change']) for m in by_rank['fallers']] == [(1, -1), (2, -1)]
+    by_elo = store.movers(START, START + DAY, 'open', field='elo_rating')
+    assert by_elo['risers'][0]['name'] == 'Player Three'
+    with pytest.raises(TimeSeriesError):
+        store.movers(START, START + DAY, 'open', field='games')
+
+
+def test_invalid_input():
+    with pytest.raises(TimeSeriesError):
+        parse_moment('yesterday', 'from')
+    assert parse_moment('2024-03-01T12:00:00+01:00', 'at') == START + 11 * 3600
+    with pytest.raises(FileNotFoundError):
+        TimeSeriesStore('/nonexistent/timeseries.sqlite3').latest_scrape()
@@ -0,0 +1,281 @@
+"""
+Time series of ranking scrapes in SQLite.
+
+Every scrape appends one row per ranked player; the snapshot files only ever
+hold the latest scrape. Tables:
+
+  scrapes   (scrape_id, taken_at)                       one row per scrape
+  players   (player_id, division, name, club, city)     latest known values
+  rankings  (scrape_id, division, player_id, rank, elo_rating, games, trend_90_days)
+
+`rankings` is a WITHOUT ROWID table clustered on (scrape_id, division,
+player_id), so one scrape of one division is a contiguous range. Two
+secondary indexes cover the other access paths:
+
+  rankings_by_player  (player_id, division, scrape_id, rank, elo_rating, games)
+                      a player's series, read from the index alone
+  rankings_by_rank    (scrape_id, division, rank)
+                      a leaderboard page of one scrape in rank order
+
+"As of" a moment means the newest scrape taken at or before it, found
+through the index on scrapes.taken_at. The biggest movers between two
+moments join the two scrapes' ranges on the primary key.
+
+    python timeseries.py record <data_dir>     # append the current JSON files
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+TIMESERIES_FILENAME = 'timeseries.sqlite3'
+DIVISIONS = ('open', 'women')
+MOVER_FIELDS = ('rank', 'elo_rating')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scrapes (
+    scrape_id INTEGER PRIMARY KEY,
+    taken_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scrapes_by_time ON scrapes (taken_at);
+
+CREATE TABLE IF NOT EXISTS players (
+    player_id INTEGER NOT NULL,
+    division TEXT NOT NULL,
+    name TEXT,
+    club TEXT,
+    city TEXT,
+    PRIMARY KEY (player_id, division)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS rankings (
+    scrape_id INTEGER NOT NULL,
+    division TEXT NOT NULL,
+    player_id INTEGER NOT NULL,
+    rank INTEGER,
+    elo_rating INTEGER,
+    games INTEGER,
+    trend_90_days INTEGER,
+    PRIMARY KEY (scrape_id, division, player_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS rankings_by_player
+    ON rankings (player_id, division, scrape_id, rank, elo_rating, games);
+CREATE INDEX IF NOT EXISTS rankings_by_rank ON rankings (scrape_id, division, rank);
+"""
+
+
+def default_path(data_dir):
+    """$PLAYERZONE_TIMESERIES_DB, else timeseries.sqlite3 in the data directory."""
+    return os.environ.get('PLAYERZONE_TIMESERIES_DB', os.path.join(data_dir, TIMESERIES_FILENAME))
+
+
+class TimeSeriesError(ValueError):
+    """Invalid time series query, reported to the client as HTTP 400."""
+
+
+def parse_moment(value, name, end_of_day=True):
+    """
+    Unix seconds for a query parameter: an ISO date (the end of that day,
+    UTC, or its start with end_of_day=False) or an ISO date-time (UTC unless
+    it carries an offset).
+    """
+    try:
+        if len(value) == 10:
+            day = datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+            if not end_of_day:
+                return day.timestamp()
+            return (day + timedelta(days=1)).timestamp() - 1e-6
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise TimeSeriesError(f"'{name}' must be an ISO date (YYYY-MM-DD) or date-time.")
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def format_moment(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _division(label):
+    division = (label or '').lower()
+    if division not in DIVISIONS:
+        raise TimeSeriesError("'division' must be 'open' or 'women'.")
+    return division
+
+
+# ----------------------------------------------------------------------------
+# Write side (scraper)
+# ----------------------------------------------------------------------------
+def record_scrape(path, men_players, women_players, taken_at=None):
+    """Append one scrape of both divisions; returns its scrape_id."""
+    taken_at = time.time() if taken_at is None else taken_at
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(SCHEMA)
+        with conn:
+            scrape_id = conn.execute('INSERT INTO scrapes (taken_at) VALUES (?)', (taken_at,)).lastrowid
+            for players in (men_players, women_players):
+                ranked = [p for p in players if p.get('player_id') is not None]
+                conn.executemany(
+                    'INSERT OR REPLACE INTO players (player_id, division, name, club, city) VALUES (?, ?, ?, ?, ?)',
+                    [(p['player_id'], p['division'].lower(), p.get('name'), p.get('club'), p.get('city'))
+                     for p in ranked]
+                )
+                conn.executemany(
+                    'INSERT OR REPLACE INTO rankings '
+                    '(scrape_id, division, player_id, rank, elo_rating, games, trend_90_days) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    [(scrape_id, p['division'].lower(), p['player_id'], p.get('rank'), p.get('elo_rating'),
+                      p.get('games'), p.get('trend_90_days'))
+                     for p in ranked]
+                )
+        return scrape_id
+    finally:
+        conn.close()
+
+
+# ----------------------------------------------------------------------------
+# Read side (API)
+# ----------------------------------------------------------------------------
+class TimeSeriesStore:
+    """
+    Read-only queries against the database written by record_scrape().
+    Every thread gets its own connection, opened on first use.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if not os.path.exists(self.path):
+                raise FileNotFoundError(f"No time series recorded at {self.path}")
+            conn = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def scrape_at(self, timestamp):
+        """(scrape_id, taken_at) of the newest scrape at or before `timestamp`, or None."""
+        return self._connection().execute(
+            'SELECT scrape_id, taken_at FROM scrapes WHERE taken_at <= ? ORDER BY taken_at DESC LIMIT 1',
+            (timestamp,)
+        ).fetchone()
+
+    def latest_scrape(self):
+        return self.scrape_at(float('inf'))
+
+    def scrape_count(self):
+        return self._connection().execute('SELECT count(*) FROM scrapes').fetchone()[0]
+
+    def player_series(self, player_id, division, start=None, end=None):
+        """[{'date', 'rank', 'elo_rating', 'games'}, ...] of one player, oldest first."""
+        rows = self._connection().execute(
+            'SELECT s.taken_at, r.rank, r.elo_rating, r.games '
+            'FROM rankings r INDEXED BY rankings_by_player JOIN scrapes s ON s.scrape_id = r.scrape_id '
+            'WHERE r.player_id = ? AND r.division = ? AND s.taken_at >= ? AND s.taken_at <= ? '
+            'ORDER BY r.scrape_id',
+            (player_id, _division(division),
+             float('-inf') if start is None else start, float('inf') if end is None else end)
+        )
+        return [{'date': format_moment(taken_at), 'rank': rank, 'elo_rating': elo, 'games': games}
+                for taken_at, rank, elo, games in rows]
+
+    def leaderboard(self, timestamp, division, limit, offset=0):
+        """The ranking of `division` as of `timestamp`, or None if nothing was recorded by then."""
+        scrape = self.scrape_at(timestamp)
+        if scrape is None:
+            return None
+        scrape_id, taken_at = scrape
+        division = _division(division)
+        conn = self._connection()
+        total = conn.execute(
+            'SELECT count(*) FROM rankings WHERE scrape_id = ? AND division = ?', (scrape_id, division)
+        ).fetchone()[0]
+        rows = conn.execute(
+            'SELECT r.rank, r.player_id, p.name, p.club, r.elo_rating, r.games, r.trend_90_days '
+            'FROM rankings r INDEXED BY rankings_by_rank '
+            'JOIN players p ON p.player_id = r.player_id AND p.division = r.division '
+            'WHERE r.scrape_id = ? AND r.division = ? AND r.rank IS NOT NULL '
+            'ORDER BY r.rank, r.player_id LIMIT ? OFFSET ?',
+            (scrape_id, division, limit, offset)
+        )
+        return {
+            'scrape_date': format_moment(taken_at),
+            'total': total,
+            'players': [
+                {'rank': rank, 'player_id': pid, 'name': name, 'club': club, 'elo_rating': elo,
+                 'games': games, 'trend_90_days': trend}
+                for rank, pid, name, club, elo, games, trend in rows
+            ],
+        }
+
+    def movers(self, start, end, division, field='rank', limit=10):
+        """
+        Biggest rises and falls in `field` between the scrapes as of `start`
+        and `end`, among players ranked in both. Rank improvements are drops
+        in the rank number. Returns None if no scrape precedes `start`.
+        """
+        if field not in MOVER_FIELDS:
+            raise TimeSeriesError(f"'by' must be one of {', '.join(MOVER_FIELDS)}.")
+        first, last = self.scrape_at(start), self.scrape_at(end)
+        if first is None or last is None:
+            return None
+        division = _division(division)
+        # A positive gain is always good: fewer rank places, more rating
+        gain = f'a.{field} - b.{field}' if field == 'rank' else f'b.{field} - a.{field}'
+        query = (
+            f'SELECT {gain} AS gain, b.player_id, p.name, a.{field}, b.{field} '
+            'FROM rankings a '
+            'JOIN rankings b ON b.scrape_id = ? AND b.division = a.division AND b.player_id = a.player_id '
+            'JOIN players p ON p.player_id = b.player_id AND p.division = b.division '
+            f'WHERE a.scrape_id = ? AND a.division = ? AND a.{field} IS NOT NULL AND b.{field} IS NOT NULL '
+            'ORDER BY gain {order}, b.player_id LIMIT ?'
+        )
+        conn = self._connection()
+        params = (last[0], first[0], division, limit)
+
+        def run(order):
+            return [
+                {'player_id': pid, 'name': name, 'from': before, 'to': after, 'change': change}
+                for change, pid, name, before, after in conn.execute(query.format(order=order), params)
+            ]
+
+        return {
+            'from_date': format_moment(first[1]),
+            'to_date': format_moment(last[1]),
+            'by': field,
+            'risers': [m for m in run('DESC') if m['change'] > 0],
+            'fallers': [m for m in run('ASC') if m['change'] < 0],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time series of ranking scrapes.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    record = sub.add_parser('record', help="Append the current men/women JSON files as one scrape")
+    record.add_argument('data_dir')
+    record.add_argument('--db', help=f"Database path (default: $PLAYERZONE_TIMESERIES_DB or <data_dir>/{TIMESERIES_FILENAME})")
+    record.add_argument('--taken-at', help="Scrape time as ISO date-time (default: the JSON files' mtime)")
+    args = parser.parse_args()
+
+    men_path = os.path.join(args.data_dir, 'men_players.json')
+    women_path = os.path.join(args.data_dir, 'women_players.json')
+    with open(men_path, encoding='utf-8') as f:
+        men = json.load(f)
+    with open(women_path, encoding='utf-8') as f:
+        women = json.load(f)
+    taken_at = (parse_moment(args.taken_at, 'taken-at') if args.taken_at
+                else max(os.stat(men_path).st_mtime, os.stat(women_path).st_mtime))
+    scrape_id = record_scrape(args.db or default_path(args.data_dir), men, women, taken_at)
+    print(f"Recorded scrape {scrape_id} ({len(men)} Open, {len(women)} Women players).")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,314 @@
+"""
+Monte Carlo simulation of a tournament with the RGX win expectation.
+
+Every game is won by team 1 with probability e1 = rgx.expected_score(r1, r2)
+(ratings stay at their pre-event values) and moves team 1 by
+b * K * (p - e1), p = 1 for a win and 0 for a loss; both players of a team
+get the team's change. The expected change of a single game is zero by
+construction, so the projected change of a team is mostly about its spread
+and about how many games it gets to play.
+
+Formats:
+  - 'pool'    round robin, every team plays every other team once; places by
+              wins, ties broken at random
+  - 'single'  single elimination
+  - 'double'  double elimination, including a grand final reset
+
+Brackets are seeded 1 vs. N, 2 vs. N-1, ... in the usual bracket order, with
+byes for the top seeds when the team count is not a power of two.
+
+All simulations run side by side as NumPy arrays: one vector operation per
+game (pool play: per event) instead of a Python loop per simulated
+tournament.
+"""
+import numpy as np
+
+import rgx
+
+FORMATS = ('pool', 'single', 'double')
+MAX_TEAMS = 256
+# Simulations run in batches of at most this many games (bounds memory)
+BATCH_GAMES = 2000000
+
+
+class TournamentError(ValueError):
+    """Invalid tournament definition, reported to the client as HTTP 400."""
+
+
+# ----------------------------------------------------------------------------
+# Bracket structure
+# ----------------------------------------------------------------------------
+# A match side is ('seed', slot), ('winner', m), ('loser', m) or
+# ('reset', m): the loser of grand final m if the losers-bracket side won it.
+# Side value -1 means "nobody" (a bye). Every match records the stage in
+# which its loser is eliminated, or None if the loser drops to the losers
+# bracket.
+class Match:
+    __slots__ = ('side_a', 'side_b', 'elimination_stage', 'grand_final')
+
+    def __init__(self, side_a, side_b, elimination_stage, grand_final=False):
+        self.side_a = side_a
+        self.side_b = side_b
+        self.elimination_stage = elimination_stage
+        self.grand_final = grand_final
+
+
+def bracket_order(size):
+    """Seed numbers (1-based) in bracket slot order, e.g. 8 => 1 8 4 5 2 7 3 6."""
+    order = [1]
+    while len(order) < size:
+        order = [seed for s in order for seed in (s, 2 * len(order) + 1 - s)]
+    return order
+
+
+def _bracket_size(team_count):
+    size = 1
+    while size < team_count:
+        size *= 2
+    return size
+
+
+def single_elimination(team_count):
+    """Matches of a single elimination bracket; returns (matches, slot_count)."""
+    size = _bracket_size(team_count)
+    matches = []
+    current = [('seed', slot) for slot in range(size)]
+    stage = 0
+    while len(current) > 1:
+        stage += 1
+        next_round = []
+        for i in range(0, len(current), 2):
+            matches.append(Match(current[i], current[i + 1], stage))
+            next_round.append(('winner', len(matches) - 1))
+        current = next_round
+    return matches, size
+
+
+def double_elimination(team_count):
+    """Matches of a double elimination bracket; returns (matches, slot_count)."""
+    size = _bracket_size(team_count)
+    matches = []
+
+    def add(side_a, side_b, elimination_stage, grand_final=False):
+        matches.append(Match(side_a, side_b, elimination_stage, grand_final))
+        return len(matches) - 1
+
+    # Winners bracket; its losers drop down round by round
+    winners = [('seed', slot) for slot in range(size)]
+    dropped = []
+    while len(winners) > 1:
+        round_matches = [add(winners[i], winners[i + 1], None) for i in range(0, len(winners), 2)]
+        winners = [('winner', m) for m in round_matches]
+        dropped.append([('loser', m) for m in round_matches])
+
+    stage = 0
+    losers = []
+    for round_no, drop in enumerate(dropped):
+        if round_no == 0:
+            # First losers round: winners-bracket round 1 losers play each other
+            incoming = drop
+        else:
+            # Dropped teams meet the losers-bracket survivors; every other
+            # round in reverse order to delay rematches
+            if round_no % 2 == 1:
+                drop = drop[::-1]
+            stage += 1
+            losers = [('winner', add(survivor, dropper, stage)) for survivor, dropper in zip(losers, drop)]
+            incoming = losers
+        if len(incoming) > 1:
+            stage += 1
+            losers = [('winner', add(incoming[i], incoming[i + 1], stage)) for i in range(0, len(incoming), 2)]
+        else:
+            losers = incoming
+
+    if not losers:
+        # Two teams: the winners final loser goes straight to the grand final
+        losers = dropped[0]
+    stage += 1
+    final = add(winners[0], losers[0], stage, grand_final=True)
+    add(('winner', final), ('reset', final), stage)
+    return matches, size
+
+
+# ----------------------------------------------------------------------------
+# Simulation
+# ----------------------------------------------------------------------------
+def _expected_matrix(ratings):
+    r = np.asarray(ratings, dtype=np.int64)
+    return 1.0 / (1 + 10.0 ** ((r[np.newaxis, :] - r[:, np.newaxis]) / rgx.D))
+
+
+def _simulate_bracket(matches, slots, expected, b, n, rng):
+    """
+    Run `n` simulations of a bracket. `slots` maps bracket slot => team index
+    (-1 = bye). Returns (stage, change): stage[s, t] is the stage in which
+    team t was eliminated in simulation s (champion: last stage + 1),
+    change[s, t] its summed rating change.
+    """
+    team_count = expected.shape[0]
+    rows = np.arange(n)
+    winners = np.empty((len(matches), n), dtype=np.int64)
+    losers = np.empty((len(matches), n), dtype=np.int64)
+    b_won = np.zeros((len(matches), n), dtype=bool)
+    stage = np.zeros((n, team_count), dtype=np.int64)
+    change = np.zeros((n, team_count))
+
+    def side(source):
+        kind, ref = source
+        if kind == 'seed':
+            return np.full(n, slots[ref], dtype=np.int64)
+        if kind == 'winner':
+            return winners[ref]
+        if kind == 'loser':
+            return losers[ref]
+        return np.where(b_won[ref], losers[ref], -1)
+
+    for m, match in enumerate(matches):
+        a, bb = side(match.side_a), side(match.side_b)
+        played = (a >= 0) & (bb >= 0)
+        a_idx, b_idx = np.maximum(a, 0), np.maximum(bb, 0)
+        e1 = expected[a_idx, b_idx]
+        a_wins = rng.random(n) < e1
+        winners[m] = np.where(played, np.where(a_wins, a, bb), np.where(a >= 0, a, bb))
+        losers[m] = np.where(played, np.where(a_wins, bb, a), -1)
+        b_won[m] = played & ~a_wins
+
+        x1 = np.where(played, b * rgx.K * (a_wins - e1), 0.0)
+        change[rows, a_idx] += x1
+        change[rows, b_idx] -= x1
+
+        if match.elimination_stage is not None:
+            out = losers[m]
+            if match.grand_final:
+                # The winners-bracket side losing the first final gets a reset
+                out = np.where(b_won[m], -1, out)
+            hit = out >= 0
+            stage[rows[hit], out[hit]] = match.elimination_stage
+
+    champion_stage = max(m.elimination_stage or 0 for m in matches) + 1
+    stage[rows, winners[-1]] = champion_stage
+    return stage, change
+
+
+def _simulate_pool(expected, b, n, rng):
+    """Round robin; returns (place, change) with place[s, t] in 1..team_count."""
+    team_count = expected.shape[0]
+    pairs = [(i, j) for i in range(team_count) for j in range(i + 1, team_count)]
+    first = np.array([i for i, _ in pairs], dtype=np.int64)
+    second = np.array([j for _, j in pairs], dtype=np.int64)
+    e1 = expected[first, second]
+
+    wins_first = rng.random((n, len(pairs))) < e1
+    incidence = np.zeros((len(pairs), team_count))
+    incidence[np.arange(len(pairs)), first] = 1.0
+    incidence[np.arange(len(pairs)), second] = -1.0
+    change = (b * rgx.K * (wins_first - e1)) @ incidence
+
+    wins = wins_first @ (incidence > 0).astype(float) + (~wins_first) @ (incidence < 0).astype(float)
+    # Random tie-break: fractional noise below one win
+    order = np.argsort(-(wins + rng.random((n, team_count)) * 0.5), axis=1)
+    place = np.empty_like(order)
+    np.put_along_axis(place, order, np.arange(1, team_count + 1)[np.newaxis, :], axis=1)
+    return place, change
+
+
+def _placement_labels(stage_counts):
+    """stage => place label ('1', '3-4', ...) from the number of teams leaving per stage."""
+    labels = {}
+    better = 0
+    for stage in sorted(stage_counts, reverse=True):
+        count = stage_counts[stage]
+        labels[stage] = str(better + 1) if count == 1 else f"{better + 1}-{better + count}"
+        better += count
+    return labels
+
+
+def _change_summary(values):
+    p05, p50, p95 = np.percentile(values, [5, 50, 95])
+    return {
+        'mean': round(float(values.mean()), 2),
+        'std': round(float(values.std()), 2),
+        'p05': round(float(p05), 2),
+        'median': round(float(p50), 2),
+        'p95': round(float(p95), 2),
+    }
+
+
+def simulate(ratings, fmt='single', simulations=10000, b=1.0, seed=None, seeding=None):
+    """
+    Simulate a tournament of teams with the given summed ratings.
+
+    seeding: team indices in seed order (default: by rating, highest first).
+    Returns per team (in input order):
+      {'seed', 'placement_probabilities': {label: p}, 'expected_place',
+       'rgx_change': {'mean', 'std', 'p05', 'median', 'p95'}}
+    """
+    if fmt not in FORMATS:
+        raise TournamentError(f"'format' must be one of {', '.join(FORMATS)}.")
+    team_count = len(ratings)
+    if not 2 <= team_count <= MAX_TEAMS:
+        raise TournamentError(f"A tournament needs between 2 and {MAX_TEAMS} teams.")
+    if simulations < 1:
+        raise TournamentError("'simulations' must be positive.")
+    if b not in rgx.DESC_FOR_B:
+        raise TournamentError(f"'b' must be one of {', '.join(str(v) for v in rgx.DESC_FOR_B)}.")
+
+    if seeding is None:
+        seeding = sorted(range(team_count), key=lambda t: -ratings[t])
+    elif sorted(seeding) != list(range(team_count)):
+        raise TournamentError("'seeding' must list every team index exactly once.")
+    seed_of = {team: position + 1 for position, team in enumerate(seeding)}
+
+    rng = np.random.default_rng(seed)
+    expected = _expected_matrix(ratings)
+    if fmt == 'pool':
+        games = team_count * (team_count - 1) // 2
+    else:
+        matches, size = (single_elimination if fmt == 'single' else double_elimination)(team_count)
+        slots = [seeding[s - 1] if s <= team_count else -1 for s in bracket_order(size)]
+        games = len(matches)
+    batch_size = max(1, BATCH_GAMES // games)
+
+    outcomes, changes = [], []
+    for start in range(0, simulations, batch_size):
+        n = min(batch_size, simulations - start)
+        if fmt == 'pool':
+            outcome, change = _simulate_pool(expected, b, n, rng)
+        else:
+            outcome, change = _simulate_bracket(matches, slots, expected, b, n, rng)
+        outcomes.append(outcome)
+        changes.append(change)
+    outcome = np.concatenate(outcomes)
+    change = np.concatenate(changes)
+
+    if fmt == 'pool':
+        labels = {place: str(place) for place in range(1, team_count + 1)}
+        # Higher "stage" = better finish, like the brackets
+        outcome = team_count + 1 - outcome
+        labels = {team_count + 1 - place: label for place, label in labels.items()}
+    else:
+        # Every simulation eliminates the same number of teams per stage
+        stages, counts = np.unique(outcome[0], return_counts=True)
+        labels = _placement_labels(dict(zip(stages.tolist(), counts.tolist())))
+
+    # Mean finishing position of a stage = middle of its place range
+    mid_place = {}
+    for stage, label in labels.items():
+        low, _, high = label.partition('-')
+        mid_place[stage] = (int(low) + int(high or low)) / 2
+
+    results = []
+    for team in range(team_count):
+        stages, counts = np.unique(outcome[:, team], return_counts=True)
+        probabilities = {labels[s]: c / simulations for s, c in zip(stages.tolist(), counts.tolist())}
+        results.append({
+            'seed': seed_of[team],
+            'placement_probabilities': {
+                label: round(probabilities[label], 4)
+                for label in sorted(probabilities, key=lambda lb: int(lb.partition('-')[0]))
+            },
+            'expected_place': round(sum(mid_place[s] * c for s, c in zip(stages.tolist(), counts.tolist()))
+                                    / simulations, 2),
+            'rgx_change': _change_summary(change[:, team]),
+        })
+    return results